@@ -68,6 +68,21 @@ export const MainPlayground: React.FC<{ session: ChatSession | null; onArtifacts
     }
   }, [session]);
 
+  // Follow agent activity live while a session is open
+  useEffect(() => {
+    setAgentActions([]);
+    if (!session) return;
+    return apiClient.streamAgentLogs(session.id, (action, eventId) => {
+      setAgentActions(prev => [...prev.slice(-49), {
+        id: eventId,
+        agent: 'Academic Assistant',
+        action: action.action,
+        timestamp: action.timestamp,
+        details: action.details ? JSON.stringify(action.details) : undefined
+      }]);
+    });
+  }, [session?.id]);
+
   // Auto-scroll to bottom when new messages arrive
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -105,18 +120,6 @@ export const MainPlayground: React.FC<{ session: ChatSession | null; onArtifacts
 
       setMessages(prev => [...prev, aiMessage]);
 
-      // Update agent actions for activity stream
-      if (response.agent_actions) {
-        const mappedActions = response.agent_actions.map((action, index) => ({
-          id: `${Date.now()}-${index}`,
-          agent: 'Academic Assistant',
-          action: action.action,
-          timestamp: action.timestamp,
-          details: action.details ? JSON.stringify(action.details) : undefined
-        }));
-        setAgentActions(prev => [...prev, ...mappedActions]);
-      }
-
       // Notify that artifacts might have changed (notes, study plans, etc.)
       if (onArtifactsChanged) {
         onArtifactsChanged();
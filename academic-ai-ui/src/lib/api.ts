@@ -53,6 +53,21 @@ export interface ArtifactResponse {
   memory: any;
 }
 
+// Frames sent by the server on /ws/{session_id}
+export type ChatSocketFrame =
+  | { type: 'token'; id: string; text: string }
+  | { type: 'done'; id: string; response: string; timestamp: string; cached: boolean }
+  | { type: 'error'; id?: string; status: number; detail: string; retry_after?: number }
+  | { type: 'action'; event_id: number; action: AgentAction }
+  | { type: 'dropped'; count: number }
+  | { type: 'ping' | 'pong'; timestamp: string };
+
+export interface ChatSocket {
+  send(message: string, options?: { id?: string; parallel?: boolean }): string;
+  cancel(id?: string): void;
+  close(): void;
+}
+
 export interface CreateSessionRequest {
   title?: string;
   subject: string;
@@ -143,6 +158,40 @@ class ApiClient {
   async getAgentLogs(sessionId: string) {
     return this.request<{ logs: AgentAction[] }>(`/agent-logs/${sessionId}`);
   }
+
+  // Live agent activity over Server-Sent Events; returns a function that closes the stream
+  streamAgentLogs(sessionId: string, onAction: (action: AgentAction, eventId: string) => void) {
+    const source = new EventSource(`${this.baseUrl}/agent-logs/${sessionId}/stream`);
+    source.onmessage = (event) => onAction(JSON.parse(event.data), event.lastEventId);
+    return () => source.close();
+  }
+
+  // Persistent chat channel for a session: answer tokens, agent actions and replies on one socket
+  openChatSocket(sessionId: string, onFrame: (frame: ChatSocketFrame) => void): ChatSocket {
+    const socket = new WebSocket(`${this.baseUrl.replace(/^http/, 'ws')}/ws/${sessionId}`);
+    const pending: string[] = [];
+    let nextId = 0;
+    const post = (frame: object) => {
+      const data = JSON.stringify(frame);
+      if (socket.readyState === WebSocket.OPEN) socket.send(data);
+      else pending.push(data);
+    };
+    socket.onopen = () => pending.splice(0).forEach((data) => socket.send(data));
+    socket.onmessage = (event) => {
+      const frame: ChatSocketFrame = JSON.parse(event.data);
+      if (frame.type === 'ping') post({ type: 'pong' });
+      onFrame(frame);
+    };
+    return {
+      send: (message, options = {}) => {
+        const id = options.id ?? `m${++nextId}`;
+        post({ type: 'message', id, message, parallel: options.parallel ?? false });
+        return id;
+      },
+      cancel: (id) => post({ type: 'cancel', id }),
+      close: () => socket.close(),
+    };
+  }
 }
 
 // Export singleton instance
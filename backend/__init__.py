@@ -10,13 +10,20 @@ from .models import *
 from .storage import FileStorage
 from .cache import SimpleCache
 from .logger import AgentLogger
-from .agents import get_academic_crew, create_task_for_message
 
 __all__ = [
     "app",
     "FileStorage",
     "SimpleCache",
     "AgentLogger",
-    "get_academic_crew",
+    "get_academic_agent",
     "create_task_for_message",
-]
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    # Agent factories import CrewAI, so they load on first access rather than with the package
+    if name in ("get_academic_agent", "create_task_for_message"):
+        from . import agents
+        return getattr(agents, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -8,22 +8,53 @@ from crewai.tools import tool
 from pathlib import Path
 import json
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 try:
     from .storage import FileStorage
     from .logger import AgentLogger
+    from .retrieval import RetrievalService
+    from .metrics import instrument_tool
+    from .tool_memo import ToolMemo
+    from .run_control import guard_tool, check_cancelled
+    from .tracing import trace_tool
+    from .llm import build_llm
+    from .tools.search_tool import web_search, batch_web_search, SearchError
+    from .tools.memory_tool import load_memory
 except ImportError:
     # Handle case when run as standalone script
     from storage import FileStorage
     from logger import AgentLogger
+    from retrieval import RetrievalService
+    from metrics import instrument_tool
+    from tool_memo import ToolMemo
+    from run_control import guard_tool, check_cancelled
+    from tracing import trace_tool
+    from llm import build_llm
+    from tools.search_tool import web_search, batch_web_search, SearchError
+    from tools.memory_tool import load_memory
 
 # Initialize components
 storage = FileStorage()
 logger = AgentLogger()
+retrieval = RetrievalService()
 
-def get_academic_agent(session_id: str) -> Agent:
-    """Get or create a CrewAI agent for a specific session"""
+MESSAGE_EXPECTED_OUTPUT = "Helpful academic response. If you used any tools, explicitly mention what you created/saved."
+
+def session_tool(session_id: str, name: str, memo: Optional[ToolMemo] = None, writes: bool = False):
+    """CrewAI tool decorator adding per-call metrics and spans, memoized repeats within the run and a timeout"""
+    def decorator(func):
+        func = instrument_tool(session_id, name)(func)
+        if memo is not None:
+            func = memo.wrap(name, writes=writes)(func)
+        return tool(name)(trace_tool(session_id, name)(guard_tool(session_id, name, logger)(func)))
+    return decorator
+
+def get_academic_agent(session_id: str, model: str = "gemini/gemini-2.5-flash", max_iter: int = 5,
+                       memo: Optional[ToolMemo] = None, stream: bool = False) -> Agent:
+    """Get or create a CrewAI agent for a specific session, on the model tier picked by routing"""
+    # Fresh per agent, so the memo lasts one run; an agent kept across runs brings its own memo and resets it
+    memo = memo or ToolMemo(session_id, logger)
 
     # Get session data to determine subject
     session_data = storage.get_session(session_id)
@@ -33,7 +64,7 @@ def get_academic_agent(session_id: str) -> Agent:
     base_path = Path("subjects") / subject.replace(" ", "")
 
     # Enhanced tools with session awareness
-    @tool("Load Academic Content")
+    @session_tool(session_id, "Load Academic Content", memo)
     def load_academic_content(query: str = "") -> str:
         """Load extracted academic text for study planning."""
         logger.tool_used(session_id, "Load Academic Content", {"query": query})
@@ -42,15 +73,34 @@ def get_academic_agent(session_id: str) -> Agent:
         extracted_path = base_path / "extracted"
         if extracted_path.exists():
             for file in extracted_path.glob("*.txt"):
+                check_cancelled()
                 content = file.read_text(encoding="utf-8")
                 if query.lower() in content.lower() or not query:
                     texts.append(content)
 
+        # Fall back to semantic matches when the literal query is not in the text
+        if not texts and query:
+            texts = [hit["text"] for hit in retrieval.search(subject, query, k=3)]
+
         result = "\n".join(texts[:3]) if texts else "No relevant content found."
         logger.info(f"Loaded {len(texts)} content pieces for session {session_id}")
         return result
 
-    @tool("Update Progress")
+    @session_tool(session_id, "Search Subject Materials", memo)
+    def search_subject_materials(query: str, top_k: int = 5) -> str:
+        """Find the passages in the subject's course materials most related to a query."""
+        logger.tool_used(session_id, "Search Subject Materials", {"query": query, "top_k": top_k})
+
+        hits = retrieval.search(subject, query, k=top_k)
+        if not hits:
+            return "No relevant content found."
+
+        return "\n\n".join(
+            f"[{hit['source']} #{hit['chunk']} score={hit['score']}]\n{hit['text']}"
+            for hit in hits
+        )
+
+    @session_tool(session_id, "Update Progress", memo, writes=True)
     def update_progress(text: str) -> str:
         """Save study progress into subject memory."""
         logger.tool_used(session_id, "Update Progress", {"text": text})
@@ -59,7 +109,7 @@ def get_academic_agent(session_id: str) -> Agent:
         logger.memory_updated(session_id, "progress", "study_progress")
         return "Progress updated successfully."
 
-    @tool("Save Notes")
+    @session_tool(session_id, "Save Notes", memo, writes=True)
     def save_notes(content: str, title: str = "Notes") -> str:
         """Save generated study notes to subject notes folder."""
         logger.tool_used(session_id, "Save Notes", {"title": title})
@@ -68,7 +118,7 @@ def get_academic_agent(session_id: str) -> Agent:
         logger.content_generated(session_id, "notes", content)
         return "Notes saved successfully."
 
-    @tool("Generate Study Plan")
+    @session_tool(session_id, "Generate Study Plan", memo, writes=True)
     def generate_study_plan(topic: str, duration: str = "4 weeks") -> str:
         """Generate a comprehensive study plan for a topic."""
         logger.tool_used(session_id, "Generate Study Plan", {"topic": topic, "duration": duration})
@@ -255,17 +305,20 @@ Recommended Resources:
         # Return a summary message instead of the full content to avoid duplication
         return f"Study plan generated and saved: {plan_data['title']} ({duration_text})"
 
-    @tool("Search Academic Resources")
+    @session_tool(session_id, "Search Academic Resources", memo)
     def search_academic_resources(query: str) -> str:
         """Search for academic resources and information."""
         logger.tool_used(session_id, "Search Academic Resources", {"query": query})
         logger.search_performed(session_id, query)
 
-        # This would integrate with Perplexity API in a real implementation
-        # For now, return mock results
-        return f"Search results for '{query}': Found relevant academic resources and research papers."
+        # Shares the web search client and its result cache with the research agent
+        try:
+            return web_search(query)
+        except SearchError as e:
+            logger.warning(f"Academic resource search failed: {e}", session_id)
+            return f"Academic resource search unavailable: {e}"
 
-    @tool("Update Subject Memory")
+    @session_tool(session_id, "Update Subject Memory", memo, writes=True)
     def update_subject_memory(key: str, value: str) -> str:
         """Update long-term memory for the subject."""
         logger.tool_used(session_id, "Update Subject Memory", {"key": key})
@@ -278,7 +331,7 @@ Recommended Resources:
         logger.memory_updated(session_id, "subject_memory", key)
         return f"Subject memory updated: {key}"
 
-    @tool("Get Study Progress")
+    @session_tool(session_id, "Get Study Progress", memo)
     def get_study_progress() -> str:
         """Retrieve current study progress."""
         logger.tool_used(session_id, "Get Study Progress", {})
@@ -299,6 +352,7 @@ Recommended Resources:
         backstory=f"Expert academic tutor specializing in {subject} with advanced AI capabilities. I actively create and save study materials, notes, and track progress to help students succeed.",
         tools=[
             load_academic_content,
+            search_subject_materials,
             update_progress,
             save_notes,
             generate_study_plan,
@@ -306,17 +360,20 @@ Recommended Resources:
             update_subject_memory,
             get_study_progress
         ],
-        llm="gemini/gemini-2.5-flash",
-        max_iter=5,
+        llm=build_llm(model, session_id, stream=stream),
+        max_iter=max_iter,
         verbose=False,
         allow_delegation=False
     )
 
     return academic_agent
 
-def create_task_for_message(message: str, session_id: str) -> Task:
-    """Create a CrewAI task from a user message"""
-    enhanced_description = f"""
+def describe_message_task(message: str, context: str = "") -> str:
+    """Build the task description for a user message and optional conversation context"""
+    if context:
+        message = f"{context}\n\nCurrent message:\n{message}"
+
+    return f"""
     {message}
 
     CRITICAL INSTRUCTIONS:
@@ -324,34 +381,44 @@ def create_task_for_message(message: str, session_id: str) -> Task:
     - If asked to "create study plan" or "generate study plan": ALWAYS use the "Generate Study Plan" tool
     - If asked to "update progress" or "track progress": ALWAYS use the "Update Progress" tool
     - If asked to "load content" or "get academic content": ALWAYS use the "Load Academic Content" tool
+    - If asked about a concept from the course materials: use the "Search Subject Materials" tool
 
     IMPORTANT: After using any tool, mention in your response what you saved/created.
     """
 
+def create_task_for_message(message: str, session_id: str, context: str = "",
+                            agent: Optional[Agent] = None) -> Task:
+    """Create a CrewAI task from a user message and optional conversation context"""
     return Task(
-        description=enhanced_description,
-        expected_output="Helpful academic response. If you used any tools, explicitly mention what you created/saved.",
-        agent=get_academic_agent(session_id)
+        description=describe_message_task(message, context),
+        expected_output=MESSAGE_EXPECTED_OUTPUT,
+        agent=agent or get_academic_agent(session_id)
     )
 
 def get_memory_agent(session_id: str) -> Agent:
     """Get a memory-focused agent for the session"""
+    memo = ToolMemo(session_id, logger)
 
-    @tool("Retrieve Memory")
+    @session_tool(session_id, "Retrieve Memory", memo)
     def retrieve_memory(key: str) -> str:
-        """Retrieve specific information from memory."""
+        """Retrieve information from memory by key, partial key or description. Returns the best matches."""
         logger.tool_used(session_id, "Retrieve Memory", {"key": key})
 
         session_data = storage.get_session(session_id)
         subject = session_data.get("subject", "General") if session_data else "General"
 
-        subject_memory = storage.get_subject_memory(subject)
-        global_memory = storage.get_global_memory()
+        hits = storage.search_memory(key, subject=subject, k=5)
+        if not hits:
+            return f"No memory found for key: {key}"
+        if hits[0]["score"] == 1.0:
+            return str(hits[0]["value"])
 
-        result = subject_memory.get(key) or global_memory.get(key, f"No memory found for key: {key}")
-        return result
+        return "Closest memory entries:\n" + "\n".join(
+            f"- {hit['key']} ({hit['scope']}, score={hit['score']}): {str(hit['value'])[:300]}"
+            for hit in hits
+        )
 
-    @tool("Store Memory")
+    @session_tool(session_id, "Store Memory", memo, writes=True)
     def store_memory(key: str, value: str, scope: str = "subject") -> str:
         """Store information in memory."""
         logger.tool_used(session_id, "Store Memory", {"key": key, "scope": scope})
@@ -366,14 +433,61 @@ def get_memory_agent(session_id: str) -> Agent:
         logger.memory_updated(session_id, scope + "_memory", key)
         return f"Memory stored: {key}"
 
+    @session_tool(session_id, "Recall Recent History", memo)
+    def recall_recent_history(kind: str = "", limit: int = 10) -> str:
+        """Recall the most recent history entries, optionally only FAILURE or RECOVERY PLAN entries."""
+        logger.tool_used(session_id, "Recall Recent History", {"kind": kind, "limit": limit})
+
+        entries = load_memory(limit=min(limit, 50), kind=kind or None)
+        return "\n".join(entries) if entries else "No history entries found."
+
     memory_agent = Agent(
         role="Memory Manager",
         goal="Manage and retrieve academic knowledge and progress information",
         backstory="Specialized AI for organizing and retrieving academic information",
-        tools=[retrieve_memory, store_memory],
-        llm="gemini/gemini-2.5-flash",
+        tools=[retrieve_memory, store_memory, recall_recent_history],
+        llm=build_llm("gemini/gemini-2.5-flash", session_id),
+        max_iter=2,
+        verbose=False
+    )
+
+    return memory_agent
+
+def get_search_agent(session_id: str) -> Agent:
+    """Get a web research agent for the session"""
+    memo = ToolMemo(session_id, logger)
+
+    @session_tool(session_id, "Web Search", memo)
+    def search_web(query: str) -> str:
+        """Search the web and summarize the results for a query."""
+        logger.tool_used(session_id, "Web Search", {"query": query})
+        logger.search_performed(session_id, query)
+
+        try:
+            return web_search(query)
+        except SearchError as e:
+            logger.warning(f"Web search failed: {e}", session_id)
+            return f"Web search unavailable: {e}"
+
+    @session_tool(session_id, "Batch Web Search", memo)
+    def search_web_batch(queries: List[str]) -> str:
+        """Search the web for several queries at once and return a summary for each. Prefer this over repeated Web Search calls."""
+        if isinstance(queries, str):
+            queries = [query for query in queries.replace(";", "\n").splitlines() if query.strip()]
+        logger.tool_used(session_id, "Batch Web Search", {"queries": queries})
+        for query in queries:
+            logger.search_performed(session_id, query)
+
+        return batch_web_search(queries)
+
+    search_agent = Agent(
+        role="Researcher",
+        goal="Search the web and collect accurate information",
+        backstory="Expert online researcher",
+        tools=[search_web, search_web_batch],
+        llm=build_llm("gemini/gemini-2.5-flash", session_id),
         max_iter=2,
         verbose=False
     )
 
-    return memory_agent
\ No newline at end of file
+    return search_agent
@@ -8,9 +8,9 @@ def remember(text: str) -> str:
     return save_memory(text)
 
 @tool("Load Memory")
-def recall(_: str = "") -> str:
-    """Load information from memory."""
-    return str(load_memory())
+def recall(kind: str = "") -> str:
+    """Load recent memory entries, optionally only FAILURE or RECOVERY PLAN entries."""
+    return "\n".join(load_memory(limit=20, kind=kind or None)) or "No memory entries."
 
 memory_agent = Agent(
     role="Memory Keeper",
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+End-to-end chat load test for the Academic AI Assistant
+Runs the real backend against the local mock LLM server and fires concurrent chats
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def wait_until_ready(url: str, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready")
+
+
+async def run_load(base_url: str, sessions: int, requests: int, concurrency: int):
+    latencies, failures = [], 0
+    limit = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0) as client:
+        session_ids = []
+        for i in range(sessions):
+            response = await client.post("/session", json={"subject": "Object Detection", "title": f"load-{i}"})
+            session_ids.append(response.json()["id"])
+
+        async def one(i: int):
+            nonlocal failures
+            async with limit:
+                start = time.perf_counter()
+                response = await client.post("/chat", json={
+                    "session_id": session_ids[i % sessions],
+                    "message": f"Explain HOG features (request {i})",
+                })
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+
+        metrics_text = (await client.get("/metrics")).text
+
+    return latencies, failures, elapsed, metrics_text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--scenario", help="Mock LLM scenario JSON file")
+    parser.add_argument("--llm-port", type=int, default=8100)
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="academic-load-"))
+    (workdir / "subjects").symlink_to(BACKEND_DIR / "subjects")
+
+    env = {
+        **os.environ,
+        "MOCK_LLM_URL": f"http://127.0.0.1:{args.llm_port}/v1",
+        "RETRIEVAL_EMBEDDER": "hashing",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "OTEL_SDK_DISABLED": "true",
+    }
+    env.pop("GEMINI_API_KEY", None)
+    env.pop("GOOGLE_API_KEY", None)
+
+    llm_cmd = [sys.executable, str(BACKEND_DIR / "mock_llm.py"), "--port", str(args.llm_port)]
+    if args.scenario:
+        llm_cmd += ["--scenario", args.scenario]
+    app_cmd = [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(BACKEND_DIR),
+               "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"]
+
+    processes = [
+        subprocess.Popen(llm_cmd, cwd=workdir, env=env),
+        subprocess.Popen(app_cmd, cwd=workdir, env=env, stdout=subprocess.DEVNULL),
+    ]
+    try:
+        wait_until_ready(f"http://127.0.0.1:{args.llm_port}/v1/models")
+        wait_until_ready(f"http://127.0.0.1:{args.port}/health")
+
+        latencies, failures, elapsed, metrics_text = asyncio.run(run_load(
+            f"http://127.0.0.1:{args.port}", args.sessions, args.requests, args.concurrency
+        ))
+        stats = httpx.get(f"http://127.0.0.1:{args.llm_port}/stats").json()
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    print(f"Requests: {args.requests} (concurrency {args.concurrency}, workers {args.workers}), failures: {failures}")
+    print(f"Throughput: {args.requests / elapsed:.2f} req/s over {elapsed:.2f} s")
+    print(f"Latency: mean={statistics.mean(latencies) * 1000:.0f} ms "
+          f"p50={percentile(latencies, 50) * 1000:.0f} ms p95={percentile(latencies, 95) * 1000:.0f} ms")
+    print(f"Mock LLM: {stats}")
+    for line in metrics_text.splitlines():
+        if line.startswith(("academic_tool_duration_seconds_count", "academic_llm_call_duration_seconds_count")):
+            print(f"  {line}")
+    print(f"Working directory: {workdir}")
+
+
+if __name__ == "__main__":
+    main()
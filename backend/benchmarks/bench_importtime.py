@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the Academic AI Assistant
+Cold `import main` cost from `python -X importtime`, its heaviest imports and a per-release history
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+HISTORY_PATH = Path(__file__).resolve().parent / "importtime_history.jsonl"
+
+# Loaded on first agent use (warmup.py); importing main must not pull these in
+DEFERRED = ("crewai", "google.genai", "google.generativeai", "litellm", "chromadb")
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """(module, depth, self us, cumulative us) for every line of -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            rows.append((name, (len(indent) - 1) // 2, int(own), int(cumulative)))
+    return rows
+
+
+def measure(module: str) -> List[Tuple[str, int, int, int]]:
+    """One cold import of `module` in a fresh interpreter"""
+    env = {**os.environ, "PREWARM_AGENTS": "false", "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def summarize(rows: List[Tuple[str, int, int, int]], module: str) -> Dict[str, object]:
+    end = next(i for i, (name, depth, _, _) in enumerate(rows) if name == module and depth == 0)
+    start = max((i + 1 for i, row in enumerate(rows[:end]) if row[1] == 0), default=0)
+    total = rows[end][3]
+    # Output is post-order: the measured module's direct imports are the depth-1 rows just before it
+    children = sorted(((name, cumulative) for name, depth, _, cumulative in rows[start:end] if depth == 1),
+                      key=lambda item: item[1], reverse=True)
+    names = {name for name, *_ in rows}
+    return {
+        "total_ms": total / 1000,
+        "top": [[name, cumulative / 1000] for name, cumulative in children],
+        "deferred_loaded": [name for name in DEFERRED if name in names],
+    }
+
+
+def package_version() -> str:
+    match = re.search(r'__version__ = "([^"]+)"', (BACKEND_DIR / "__init__.py").read_text(encoding="utf-8"))
+    return match.group(1) if match else "unknown"
+
+
+def load_history(path: Path) -> List[dict]:
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5, help="Cold imports; the median run is reported")
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--record", action="store_true", help=f"Append the result to {HISTORY_PATH.name}")
+    parser.add_argument("--history", default=str(HISTORY_PATH))
+    args = parser.parse_args()
+
+    # The first run also fills the bytecode caches of site-packages, so it is not counted
+    measure(args.module)
+    runs = sorted((summarize(measure(args.module), args.module) for _ in range(args.runs)),
+                  key=lambda run: run["total_ms"])
+    result = runs[len(runs) // 2]
+    spread = statistics.pstdev(run["total_ms"] for run in runs)
+
+    print(f"import {args.module}: {result['total_ms']:.0f} ms median of {args.runs} (±{spread:.0f} ms)")
+    for name, ms in result["top"][:args.top]:
+        print(f"  {name:<40} {ms:8.1f} ms")
+    if result["deferred_loaded"]:
+        print(f"❌ imported at startup but meant to be lazy: {', '.join(result['deferred_loaded'])}")
+
+    history_path = Path(args.history)
+    history = load_history(history_path)
+    if history:
+        previous = history[-1]
+        delta = result["total_ms"] - previous["total_ms"]
+        print(f"vs {previous['version']} ({previous['date']}): {previous['total_ms']:.0f} ms -> "
+              f"{result['total_ms']:.0f} ms ({delta:+.0f} ms)")
+    if args.record:
+        entry = {
+            "version": package_version(),
+            "date": date.today().isoformat(),
+            "python": sys.version.split()[0],
+            "module": args.module,
+            "total_ms": round(result["total_ms"], 1),
+            "top": [[name, round(ms, 1)] for name, ms in result["top"][:args.top]],
+            "deferred_loaded": result["deferred_loaded"],
+        }
+        with history_path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        print(f"Recorded in {history_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Agent action logging benchmark for the Academic AI Assistant
+Compares an open-append-close write per action with the shared batched log writer
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("LOG_PRINT_SINK", "none")
+
+from logger import AgentLogger, log_writer
+
+
+def log_sync(log_dir: Path, session_id: str, action: str, details):
+    """The previous write path: one open/append/close per action"""
+    entry = {"timestamp": "", "action": action, "details": details, "session_id": session_id}
+    with open(log_dir / f"{session_id}_actions.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def measure(label: str, log, actions: int, sessions: int, drain=None):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(actions):
+        t0 = time.perf_counter()
+        log(f"bench-{i % sessions}", "TOOL_USED", {"tool": "Search Subject Materials", "i": i})
+        latencies.append(time.perf_counter() - t0)
+    caller = time.perf_counter() - start
+    if drain:
+        drain()
+    total = time.perf_counter() - start
+    latencies.sort()
+    print(f"{label:>14}: per action p50={statistics.median(latencies) * 1e6:6.1f} us  "
+          f"p99={latencies[int(len(latencies) * 0.99)] * 1e6:7.1f} us  "
+          f"caller={caller * 1000:6.0f} ms  on disk={total * 1000:6.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--actions", type=int, default=20000)
+    parser.add_argument("--sessions", type=int, default=100, help="Distinct session log files")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sync_dir = Path(tmp) / "sync"
+        sync_dir.mkdir()
+        measure("open/append", lambda *a: log_sync(sync_dir, *a), args.actions, args.sessions)
+
+        logger = AgentLogger(str(Path(tmp) / "batched"))
+        measure("batched writer", logger.log_action, args.actions, args.sessions,
+                drain=lambda: log_writer.flush(timeout=60))
+        log_writer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Sequential vs parallel orchestration benchmark for the Academic AI Assistant
+Runs the study task graph against the local mock LLM with one and several concurrent tasks
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def wait_until_ready(url: str, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency-ms", type=int, default=500, help="Fixed mock LLM latency per call")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--llm-port", type=int, default=8100)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="academic-orchestrator-"))
+    (workdir / "subjects").symlink_to(BACKEND_DIR / "subjects")
+    scenario = workdir / "scenario.json"
+    scenario.write_text(json.dumps({
+        "latency": {"distribution": "fixed", "ms": args.latency_ms},
+        "tokens_per_second": 0,
+        "script": [{"content": "Done."}],
+    }), encoding="utf-8")
+
+    os.environ.update({
+        "MOCK_LLM_URL": f"http://127.0.0.1:{args.llm_port}/v1",
+        "RETRIEVAL_EMBEDDER": "hashing",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "OTEL_SDK_DISABLED": "true",
+    })
+    server = subprocess.Popen(
+        [sys.executable, str(BACKEND_DIR / "mock_llm.py"), "--port", str(args.llm_port), "--scenario", str(scenario)],
+        cwd=workdir,
+    )
+    try:
+        wait_until_ready(f"http://127.0.0.1:{args.llm_port}/v1/models")
+        os.chdir(workdir)
+        sys.path.insert(0, str(BACKEND_DIR))
+        from orchestrator import ParallelOrchestrator, build_study_graph
+        from storage import FileStorage
+
+        storage = FileStorage()
+        storage.ensure_directories()
+        session_id = "bench-orchestrator"
+        storage.save_session({"id": session_id, "title": "bench", "subject": "Object Detection",
+                              "created_at": "", "messages": [], "artifacts": {}})
+
+        for label, concurrency in (("sequential", 1), ("parallel", 4)):
+            orchestrator = ParallelOrchestrator(max_concurrency=concurrency)
+            runs = [
+                asyncio.run(orchestrator.run(build_study_graph("Explain HOG features"), session_id))
+                for _ in range(args.rounds)
+            ]
+            wall = sorted(run["wall_time"] for run in runs)[len(runs) // 2]
+            total = sorted(sum(run["durations"].values()) for run in runs)[len(runs) // 2]
+            critical = sorted(run["critical_path"] for run in runs)[len(runs) // 2]
+            print(f"{label:>10}: wall={wall * 1000:.0f} ms  sum of tasks={total * 1000:.0f} ms  "
+                  f"critical path={critical * 1000:.0f} ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
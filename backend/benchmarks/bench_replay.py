@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Deterministic endpoint benchmark for the Academic AI Assistant
+Records a scenario's LLM exchanges to a cassette, replays them offline and compares to a baseline
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def fill(value, session_id: str):
+    """Substitute {session_id} placeholders in a scenario step"""
+    if isinstance(value, str):
+        return value.replace("{session_id}", session_id)
+    if isinstance(value, dict):
+        return {key: fill(item, session_id) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, session_id) for item in value]
+    return value
+
+
+def run_scenario(scenario: dict, rounds: int) -> dict:
+    """Run every step of the scenario in-process and collect timings and chat outputs"""
+    from fastapi.testclient import TestClient
+    from cassette import active_cassette
+    import main
+
+    timings = {step["name"]: [] for step in scenario["steps"]}
+    outputs = {}
+
+    with TestClient(main.app) as client:
+        for _ in range(rounds):
+            main.cache.clear()
+            if os.getenv("LLM_CASSETTE_MODE") == "replay":
+                active_cassette().rewind()
+            session_id = client.post("/session", json=scenario["session"]).json()["id"]
+            for step in scenario["steps"]:
+                start = time.perf_counter()
+                response = client.request(step["method"], fill(step["path"], session_id),
+                                          json=fill(step.get("json"), session_id))
+                timings[step["name"]].append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise RuntimeError(f"Step {step['name']} failed: {response.status_code} {response.text}")
+                if step["path"] == "/chat":
+                    outputs[step["name"]] = response.json()["response"]
+
+    return {
+        "steps": {name: round(statistics.median(samples) * 1000, 2) for name, samples in timings.items()},
+        "outputs": outputs,
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> bool:
+    """Print a comparison against the baseline and report whether it passed"""
+    passed = True
+    for name, ms in result["steps"].items():
+        base = baseline["steps"].get(name)
+        if base is None:
+            print(f"  {name}: {ms:.2f} ms (no baseline)")
+            continue
+        change = (ms - base) / base if base else 0.0
+        regressed = change > tolerance and ms - base > min_delta_ms
+        passed &= not regressed
+        print(f"  {name}: {ms:.2f} ms vs {base:.2f} ms ({change:+.1%}){'  REGRESSION' if regressed else ''}")
+
+    for name, output in result["outputs"].items():
+        if name in baseline.get("outputs", {}) and baseline["outputs"][name] != output:
+            passed = False
+            print(f"  {name}: response differs from baseline")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenario", default=str(BACKEND_DIR / "benchmarks" / "scenarios" / "study_session.json"))
+    parser.add_argument("--cassette", required=True, help="Cassette file to record to or replay from")
+    parser.add_argument("--mode", choices=["record", "replay"], default="replay")
+    parser.add_argument("--speed", type=float, default=0.0, help="Replay speed-up over recorded LLM latency (2 = twice as fast, 0 = instant)")
+    parser.add_argument("--rounds", type=int, default=3, help="Replay rounds per step (record always runs once)")
+    parser.add_argument("--baseline", help="Baseline results JSON to compare against")
+    parser.add_argument("--save-baseline", help="Write these results as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown per step")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    scenario = json.loads(Path(args.scenario).read_text(encoding="utf-8"))
+    cassette = Path(args.cassette).resolve()
+    baseline = Path(args.baseline).resolve() if args.baseline else None
+    save_baseline = Path(args.save_baseline).resolve() if args.save_baseline else None
+
+    os.environ.update({
+        "LLM_CASSETTE": str(cassette),
+        "LLM_CASSETTE_MODE": args.mode,
+        "LLM_REPLAY_SPEED": str(args.speed),
+        "LLM_CASSETTE_STRICT": "false",
+        "RETRIEVAL_EMBEDDER": "hashing",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "OTEL_SDK_DISABLED": "true",
+    })
+
+    # Run against a scratch data directory with the real subject materials
+    workdir = Path(tempfile.mkdtemp(prefix="academic-replay-"))
+    (workdir / "subjects").symlink_to(BACKEND_DIR / "subjects")
+    os.chdir(workdir)
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    result = run_scenario(scenario, 1 if args.mode == "record" else args.rounds)
+    print(f"{args.mode.title()} of {Path(args.scenario).name} ({cassette.name}):")
+    if args.mode == "replay":
+        from cassette import active_cassette
+        print(f"  cassette misses (served in recording order): {active_cassette().misses}")
+
+    passed = True
+    if baseline:
+        passed = compare(result, json.loads(baseline.read_text(encoding="utf-8")), args.tolerance, args.min_delta_ms)
+    else:
+        for name, ms in result["steps"].items():
+            print(f"  {name}: {ms:.2f} ms")
+
+    if save_baseline:
+        save_baseline.write_text(json.dumps(result, indent=2), encoding="utf-8")
+        print(f"Baseline written to {save_baseline}")
+
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Response encoding benchmark for the Academic AI Assistant
+Encode time and bytes on the wire for /sessions and /artifacts payloads built from the stored sessions
+"""
+
+import argparse
+import copy
+import gzip
+import itertools
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from pydantic import TypeAdapter
+
+from models import ArtifactResponse, SessionResponse
+from responses import brotli, dumps
+
+
+def load_seeds(sessions_path: Path) -> List[dict]:
+    seeds = [json.loads(path.read_text(encoding="utf-8")) for path in sorted(sessions_path.glob("*.json"))]
+    return [seed for seed in seeds if seed.get("messages")] or seeds
+
+
+def load_sentences(seeds: List[dict], subjects_path: Path) -> List[str]:
+    """Sentences from stored messages and extracted subject material"""
+    texts = [m.get("content", "") for seed in seeds for m in seed.get("messages", [])]
+    texts += [path.read_text(encoding="utf-8") for path in sorted(subjects_path.glob("*/extracted/*.txt"))]
+    sentences = [s.strip() for text in texts for s in re.split(r"(?<=[.!?])\s+|\n{2,}", text)]
+    return [s for s in sentences if len(s) > 20]
+
+
+def build_sessions(seeds: List[dict], sentences: List[str], count: int, messages: int) -> List[dict]:
+    """`count` sessions shaped like the stored ones, each message drawn from different sentences"""
+    rng = random.Random(0)
+    templates = [m for seed in seeds for m in seed.get("messages", [])] or [{"role": "user"}]
+
+    def text(low: int, high: int) -> str:
+        return " ".join(rng.choice(sentences) for _ in range(rng.randint(low, high)))
+
+    sessions = []
+    for i, seed in zip(range(count), itertools.cycle(seeds)):
+        session = copy.deepcopy(seed)
+        session["id"] = f"bench-{i:04d}"
+        session["messages"] = [
+            {**template, "content": text(1, 3) if template.get("role") == "user" else text(4, 14)}
+            for template, _ in zip(itertools.cycle(templates), range(messages))
+        ]
+        artifacts = session.setdefault("artifacts", {})
+        artifacts["study_plans"] = [{"id": f"plan_{i}_{n}", "title": text(1, 1)[:60], "content": text(15, 40)}
+                                    for n in range(rng.randint(1, 4))]
+        artifacts["notes"] = [{"id": f"note_{i}_{n}", "title": text(1, 1)[:60], "content": text(8, 25)}
+                              for n in range(rng.randint(2, 8))]
+        artifacts["progress"] = [{"id": f"progress_{i}_{n}", "content": text(1, 3)} for n in range(rng.randint(0, 5))]
+        artifacts.setdefault("memory", {})
+        sessions.append(session)
+    return sessions
+
+
+def timed(func, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def bench_encoding(label: str, adapter: TypeAdapter, payload, rounds: int) -> bytes:
+    value = adapter.validate_python(payload)
+    # Older FastAPI: dump to JSON-safe Python, then the response class renders it
+    stdlib = timed(lambda: json.dumps(adapter.dump_python(value, mode="json"), ensure_ascii=False).encode(), rounds)
+    fast = timed(lambda: dumps(adapter.dump_python(value, mode="json")), rounds)
+    # Current FastAPI with a response_model: pydantic writes the bytes directly
+    direct = timed(lambda: adapter.dump_json(value), rounds)
+    body = dumps(adapter.dump_python(value, mode="json"))
+    print(f"\n{label}: {len(body) / 1024:.1f} KiB of JSON")
+    print(f"  encode  json.dumps {stdlib:7.2f} ms   orjson {fast:7.2f} ms   pydantic dump_json {direct:7.2f} ms")
+    return body
+
+
+def bench_wire(body: bytes, rounds: int):
+    codings = [(f"gzip-{level}", lambda level=level: gzip.compress(body, compresslevel=level, mtime=0))
+               for level in (1, 6, 9)]
+    if brotli is not None:
+        codings += [(f"br-{quality}", lambda quality=quality: brotli.compress(body, quality=quality))
+                    for quality in (1, 4, 11)]
+    else:
+        print("  (brotli not installed; skipping br)")
+    for name, encode in codings:
+        size = len(encode())
+        ms = timed(encode, max(3, rounds // 5))
+        print(f"  {name:>8}: {size / 1024:7.1f} KiB ({size / len(body):5.1%})  {ms:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions-path", default=str(BACKEND_DIR / "data" / "sessions"))
+    parser.add_argument("--subjects-path", default=str(BACKEND_DIR / "subjects"))
+    parser.add_argument("--sessions", type=int, default=50, help="Sessions in the /sessions payload")
+    parser.add_argument("--messages", type=int, default=40, help="Messages per session")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    seeds = load_seeds(Path(args.sessions_path))
+    if not seeds:
+        sys.exit(f"No sessions found in {args.sessions_path}")
+    sentences = load_sentences(seeds, Path(args.subjects_path))
+    sessions = build_sessions(seeds, sentences, args.sessions, args.messages)
+
+    body = bench_encoding(f"/sessions ({args.sessions} sessions x {args.messages} messages)",
+                          TypeAdapter(List[SessionResponse]), sessions, args.rounds)
+    bench_wire(body, args.rounds)
+
+    artifacts = {"session_id": sessions[0]["id"], **sessions[0]["artifacts"]}
+    body = bench_encoding("/artifacts/{session_id}", TypeAdapter(ArtifactResponse), artifacts, args.rounds)
+    bench_wire(body, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Retrieval latency benchmark for the Academic AI Assistant
+Measures batched ingest time and cosine top-k query latency per subject
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path for imports
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from retrieval import RetrievalService, create_embedder, subject_dir_name
+
+QUERIES = [
+    "HOG features",
+    "gradient orientation histograms",
+    "scale invariant keypoints",
+    "sliding window detection",
+    "non maximum suppression",
+    "course outcomes and syllabus",
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subjects-path", default="subjects")
+    parser.add_argument("--subject", default="ObjectDetection")
+    parser.add_argument("--embedder", default=None, help="onnx or hashing")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    service = RetrievalService(args.subjects_path, embedder=create_embedder(args.embedder))
+    print(f"Embedder: {service.embedder.name}")
+
+    # Force a rebuild so ingest is measured end to end
+    manifest = Path(args.subjects_path) / subject_dir_name(args.subject) / "index" / "manifest.json"
+    if manifest.exists():
+        manifest.unlink()
+
+    start = time.perf_counter()
+    index = service.get_index(args.subject)
+    ingest_ms = (time.perf_counter() - start) * 1000
+    print(f"Ingest: {len(index.chunks)} chunks in {ingest_ms:.1f} ms")
+
+    samples = []
+    for _ in range(args.rounds):
+        for query in QUERIES:
+            start = time.perf_counter()
+            service.search(args.subject, query, args.k)
+            samples.append((time.perf_counter() - start) * 1000)
+
+    print(f"Query ({len(samples)} samples): "
+          f"mean={statistics.mean(samples):.3f} ms "
+          f"p50={percentile(samples, 50):.3f} ms "
+          f"p95={percentile(samples, 95):.3f} ms")
+
+    for query in QUERIES[:2]:
+        top = service.search(args.subject, query, 1)
+        if top:
+            print(f"  '{query}' -> {top[0]['source']} #{top[0]['chunk']} ({top[0]['score']})")
+
+
+if __name__ == "__main__":
+    main()
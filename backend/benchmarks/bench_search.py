@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Web search client benchmark for the Academic AI Assistant
+Compares per-request connections, the pooled sync client, concurrent async and batch searches
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from tools.search_tool import SearchClient
+
+QUERIES = ["YOLO vs SSD comparison", "HOG feature descriptor", "SIFT keypoints", "non-maximum suppression",
+           "anchor boxes", "R-CNN family", "mean average precision", "feature pyramid networks"]
+
+
+def wait_until_ready(url: str, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready")
+
+
+def timed(label: str, queries, search):
+    latencies = []
+    start = time.perf_counter()
+    for query in queries:
+        t0 = time.perf_counter()
+        search(query)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>22}: total={elapsed * 1000:7.0f} ms  per query p50={statistics.median(latencies) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="Search endpoint to benchmark (default: local mock server)")
+    parser.add_argument("--api-key", default="bench")
+    parser.add_argument("--latency-ms", type=int, default=100, help="Mock server latency per request")
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over the query list")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8102)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if not url:
+        scenario = Path(tempfile.mkdtemp(prefix="academic-search-")) / "scenario.json"
+        scenario.write_text(json.dumps({
+            "latency": {"distribution": "fixed", "ms": args.latency_ms},
+            "tokens_per_second": 0,
+            "script": [{"content": "Search summary."}],
+        }), encoding="utf-8")
+        server = subprocess.Popen([sys.executable, str(BACKEND_DIR / "mock_llm.py"),
+                                   "--port", str(args.port), "--scenario", str(scenario)])
+        url = f"http://127.0.0.1:{args.port}/v1/chat/completions"
+
+    try:
+        if server:
+            wait_until_ready(f"http://127.0.0.1:{args.port}/v1/models")
+        queries = QUERIES * args.rounds
+        headers = {"Authorization": f"Bearer {args.api_key}"}
+
+        def unpooled(query):
+            # One connection per search, as with a bare requests.post
+            response = httpx.post(url, headers=headers, timeout=30.0, json={
+                "model": "sonar-pro", "messages": [{"role": "user", "content": f"Search and summarize: {query}"}]
+            })
+            return response.json()["choices"][0]["message"]["content"]
+
+        client = SearchClient(api_url=url, api_key=args.api_key)
+        timed("unpooled sequential", queries, unpooled)
+        timed("pooled sequential", queries, client.search)
+
+        async def concurrent():
+            limit = asyncio.Semaphore(args.concurrency)
+
+            async def one(query):
+                async with limit:
+                    return await client.asearch(query)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(query) for query in queries))
+            elapsed = time.perf_counter() - start
+            await client.aclose()
+            return elapsed
+
+        elapsed = asyncio.run(concurrent())
+        print(f"{'async concurrent':>22}: total={elapsed * 1000:7.0f} ms  ({args.concurrency} in flight)")
+
+        # Batch Web Search tool path: one call fanning out over the pooled sync client
+        batch_client = SearchClient(api_url=url, api_key=args.api_key)
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            batch_client.batch_search(QUERIES, max_concurrency=args.concurrency)
+        elapsed = time.perf_counter() - start
+        print(f"{'batch search':>22}: total={elapsed * 1000:7.0f} ms  ({args.rounds} batches of {len(QUERIES)})")
+        client.close()
+        batch_client.close()
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Multi-worker load test for the Academic AI Assistant
+Runs the backend under uvicorn --workers N against the mock LLM, checks every worker agrees on sessions,
+recent actions and the live action stream, and reports how throughput scales with the worker count
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from bench_chat_load import percentile, wait_until_ready
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_SCENARIO = Path(__file__).resolve().parent / "scenarios" / "cpu_bound.json"
+
+
+async def fresh_get(base_url: str, path: str) -> httpx.Response:
+    # A new connection per request, so the kernel can hand it to any worker
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+        return await client.get(path, headers={"Connection": "close"})
+
+
+async def watch_stream(base_url: str, session_id: str, seen: List[int], stop: asyncio.Event):
+    """Collect event ids from one worker's live stream of a session"""
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        async with client.stream("GET", f"/agent-logs/{session_id}/stream") as response:
+            # Heartbeats (SSE_HEARTBEAT_SECONDS) keep lines coming, so the stop flag is noticed
+            async for line in response.aiter_lines():
+                if stop.is_set():
+                    return
+                if line.startswith("id: "):
+                    seen.append(int(line[4:]))
+
+
+async def run_load(base_url: str, sessions: int, requests: int, concurrency: int, warmup: int) -> Dict:
+    limit = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0,
+                                 limits=httpx.Limits(max_keepalive_connections=0)) as client:
+        session_ids = []
+        for i in range(sessions):
+            response = await client.post("/session", json={"subject": "Object Detection", "title": f"workers-{i}"})
+            session_ids.append(response.json()["id"])
+
+        async def chat(i: int, record: bool = True):
+            nonlocal failures
+            async with limit:
+                start = time.perf_counter()
+                response = await client.post("/chat", json={
+                    "session_id": session_ids[i % sessions],
+                    "message": f"Explain HOG features (request {i})",
+                })
+                if not record:
+                    return
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    failures += 1
+
+        # Every worker imports its agent stack on its first chat; keep that out of the measurement
+        await asyncio.gather(*(chat(-1 - i, record=False) for i in range(warmup)))
+
+        stop = asyncio.Event()
+        streamed: List[int] = []
+        watcher = asyncio.create_task(watch_stream(base_url, session_ids[0], streamed, stop))
+        await asyncio.sleep(0.5)
+        stream_opened = datetime.now().isoformat()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(chat(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+
+        # Consistency: every worker must give the same answer, whichever one a connection lands on
+        checks = {}
+        expected_messages = {sid: 0 for sid in session_ids}
+        for i in list(range(-warmup, 0)) + list(range(requests)):
+            expected_messages[session_ids[i % sessions]] += 2
+        sessions_seen = (await client.get("/sessions")).json()
+        counts = {s["id"]: len(s.get("messages", [])) for s in sessions_seen if s["id"] in expected_messages}
+        checks["no lost session updates"] = counts == expected_messages
+
+        agreeing = True
+        for session_id in session_ids:
+            bodies = await asyncio.gather(*(fresh_get(base_url, f"/agent-logs/{session_id}") for _ in range(8)))
+            logs = {json.dumps(body.json()["logs"], sort_keys=True) for body in bodies}
+            agreeing = agreeing and len(logs) == 1 and all(body.status_code == 200 for body in bodies)
+        checks["workers agree on recent actions"] = agreeing
+
+        await asyncio.sleep(1.5)  # relay polls and a heartbeat for the stream to catch up
+        stop.set()
+        await watcher
+        logged = (await fresh_get(base_url, f"/agent-logs/{session_ids[0]}?since={stream_opened}&limit=1000")).json()
+        checks["live stream relays every worker"] = len(set(streamed)) >= len(logged["logs"]) > 0
+
+    return {"latencies": latencies, "failures": failures, "elapsed": elapsed, "checks": checks,
+            "streamed": len(set(streamed))}
+
+
+def run_workers(workers: int, args, env: Dict[str, str]) -> Dict:
+    workdir = Path(tempfile.mkdtemp(prefix=f"academic-workers-{workers}-"))
+    (workdir / "subjects").symlink_to(BACKEND_DIR / "subjects")
+    app_cmd = [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(BACKEND_DIR),
+               "--port", str(args.port), "--workers", str(workers), "--log-level", "warning"]
+    server = subprocess.Popen(app_cmd, cwd=workdir, env={**env, "WEB_CONCURRENCY": str(workers)},
+                              stdout=subprocess.DEVNULL)
+    try:
+        wait_until_ready(f"http://127.0.0.1:{args.port}/health")
+        result = asyncio.run(run_load(f"http://127.0.0.1:{args.port}", args.sessions, args.requests,
+                                      args.concurrency, warmup=workers * 4))
+    finally:
+        server.terminate()
+        server.wait()
+    result["workdir"] = workdir
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts to compare")
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--store", default="sqlite", choices=["sqlite", "memory"],
+                        help="ACTION_STORE for the workers; memory shows what breaks without shared state")
+    parser.add_argument("--scenario", default=str(DEFAULT_SCENARIO), help="Mock LLM scenario JSON file")
+    parser.add_argument("--llm-port", type=int, default=8100)
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        "MOCK_LLM_URL": f"http://127.0.0.1:{args.llm_port}/v1",
+        "ACTION_STORE": args.store,
+        "RETRIEVAL_EMBEDDER": "hashing",
+        "LOG_PRINT_SINK": "none",
+        "SSE_HEARTBEAT_SECONDS": "0.5",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "CREWAI_TRACING_ENABLED": "false",
+    }
+    env.pop("GEMINI_API_KEY", None)
+    env.pop("GOOGLE_API_KEY", None)
+
+    llm = subprocess.Popen([sys.executable, str(BACKEND_DIR / "mock_llm.py"), "--port", str(args.llm_port),
+                            "--scenario", args.scenario], env=env, stdout=subprocess.DEVNULL)
+    results = {}
+    try:
+        wait_until_ready(f"http://127.0.0.1:{args.llm_port}/v1/models")
+        for workers in [int(n) for n in args.workers.split(",")]:
+            results[workers] = run_workers(workers, args, env)
+    finally:
+        llm.terminate()
+        llm.wait()
+
+    print(f"{args.requests} chats, concurrency {args.concurrency}, {args.sessions} sessions, "
+          f"ACTION_STORE={args.store}, {os.cpu_count()} CPUs")
+    baseline = None
+    for workers, result in results.items():
+        throughput = args.requests / result["elapsed"]
+        baseline = baseline or throughput
+        latencies = result["latencies"]
+        print(f"\nworkers={workers}: {throughput:6.2f} req/s ({throughput / baseline:4.2f}x)  "
+              f"p50={percentile(latencies, 50) * 1000:.0f} ms  p95={percentile(latencies, 95) * 1000:.0f} ms  "
+              f"mean={statistics.mean(latencies) * 1000:.0f} ms  failures={result['failures']}")
+        for check, passed in result["checks"].items():
+            print(f"  {'✅' if passed else '❌'} {check}")
+        print(f"  streamed events: {result['streamed']}  data: {result['workdir']}")
+    if not all(passed for result in results.values() for passed in result["checks"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
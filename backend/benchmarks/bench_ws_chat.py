@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+WebSocket vs HTTP chat benchmark for the Academic AI Assistant
+Sends the same sequential turns over POST /chat and over one /ws/{session_id} connection against the mock LLM,
+and reports per-turn latency and time to the first streamed token
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+import websockets
+
+from bench_chat_load import percentile, wait_until_ready
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_SCENARIO = Path(__file__).resolve().parent / "scenarios" / "cpu_bound.json"
+
+
+async def http_turns(base_url: str, turns: int, warmup: int) -> Dict[str, List[float]]:
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0) as client:
+        session_id = (await client.post("/session", json={"subject": "Object Detection", "title": "bench-http"})).json()["id"]
+        latencies = []
+        for i in range(-warmup, turns):
+            start = time.perf_counter()
+            response = await client.post("/chat", json={"session_id": session_id,
+                                                        "message": f"Explain HOG features (turn {i})"})
+            response.raise_for_status()
+            if i >= 0:
+                latencies.append(time.perf_counter() - start)
+    return {"latency": latencies}
+
+
+async def socket_turns(base_url: str, turns: int, warmup: int) -> Dict[str, List[float]]:
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0) as client:
+        session_id = (await client.post("/session", json={"subject": "Object Detection", "title": "bench-ws"})).json()["id"]
+    latencies, first_tokens = [], []
+    async with websockets.connect(f"{base_url.replace('http', 'ws', 1)}/ws/{session_id}") as ws:
+        for i in range(-warmup, turns):
+            start, first = time.perf_counter(), None
+            await ws.send(json.dumps({"type": "message", "id": str(i), "message": f"Explain HOG features (turn {i})"}))
+            while True:
+                frame = json.loads(await ws.recv())
+                if frame["type"] == "token" and first is None:
+                    first = time.perf_counter() - start
+                if frame["type"] == "error":
+                    raise RuntimeError(frame)
+                if frame["type"] == "done":
+                    break
+            if i >= 0:
+                latencies.append(time.perf_counter() - start)
+                if first is not None:
+                    first_tokens.append(first)
+    return {"latency": latencies, "first_token": first_tokens}
+
+
+def describe(samples: List[float]) -> str:
+    if not samples:
+        return "n/a"
+    return (f"p50={percentile(samples, 50) * 1000:7.1f} ms  p95={percentile(samples, 95) * 1000:7.1f} ms  "
+            f"mean={statistics.mean(samples) * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured turns (agent stack import, first agent)")
+    parser.add_argument("--scenario", default=str(DEFAULT_SCENARIO), help="Mock LLM scenario JSON file")
+    parser.add_argument("--llm-port", type=int, default=8100)
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        "MOCK_LLM_URL": f"http://127.0.0.1:{args.llm_port}/v1",
+        "RETRIEVAL_EMBEDDER": "hashing",
+        "LOG_PRINT_SINK": "none",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "CREWAI_TRACING_ENABLED": "false",
+    }
+    env.pop("GEMINI_API_KEY", None)
+    env.pop("GOOGLE_API_KEY", None)
+
+    workdir = Path(tempfile.mkdtemp(prefix="academic-ws-"))
+    (workdir / "subjects").symlink_to(BACKEND_DIR / "subjects")
+    llm = subprocess.Popen([sys.executable, str(BACKEND_DIR / "mock_llm.py"), "--port", str(args.llm_port),
+                            "--scenario", args.scenario], env=env, stdout=subprocess.DEVNULL)
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(BACKEND_DIR),
+                               "--port", str(args.port), "--log-level", "warning"],
+                              cwd=workdir, env=env, stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_ready(f"http://127.0.0.1:{args.llm_port}/v1/models")
+        wait_until_ready(f"{base_url}/health")
+        http = asyncio.run(http_turns(base_url, args.turns, args.warmup))
+        socket = asyncio.run(socket_turns(base_url, args.turns, args.warmup))
+    finally:
+        server.terminate()
+        llm.terminate()
+        server.wait()
+        llm.wait()
+
+    print(f"{args.turns} sequential turns per channel, scenario {Path(args.scenario).name}, {os.cpu_count()} CPUs")
+    print(f"  POST /chat      {describe(http['latency'])}")
+    print(f"  /ws  done       {describe(socket['latency'])}")
+    print(f"  /ws  1st token  {describe(socket['first_token'])}")
+    saved = statistics.mean(http["latency"]) - statistics.mean(socket["latency"])
+    print(f"  per-turn saving {saved * 1000:.1f} ms ({saved / statistics.mean(http['latency']):.0%})  data: {workdir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,25 @@ Provides TTL-based caching for API responses and expensive operations
 
 import time
 import threading
+import hashlib
+import re
 from typing import Any, Optional, Dict
 from collections import OrderedDict
 
+import diskcache
+
+try:
+    from .tracing import span
+except ImportError:
+    # Handle case when run as standalone script
+    from tracing import span
+
+# Words that do not change what a web search returns
+SEARCH_STOP_WORDS = {
+    "a", "an", "the", "of", "for", "to", "in", "on", "and", "or", "is", "are", "was", "were",
+    "what", "how", "why", "about", "with", "please", "me", "explain", "tell", "search", "find",
+}
+
 class SimpleCache:
     """Thread-safe TTL-based cache implementation"""
 
@@ -32,8 +48,9 @@ class SimpleCache:
 
     def get(self, key: str) -> Optional[Any]:
         """Get an item from cache"""
-        with self._lock:
+        with span("cache.get", **{"cache.key": key}) as cache_span, self._lock:
             self._cleanup_expired()
+            cache_span.set_attribute("cache.hit", key in self.cache)
             if key in self.cache:
                 # Move to end (most recently used)
                 item = self.cache.pop(key)
@@ -43,7 +60,7 @@ class SimpleCache:
 
     def set(self, key: str, value: Any, ttl: int = 3600):
         """Set an item in cache with TTL in seconds"""
-        with self._lock:
+        with span("cache.set", **{"cache.key": key, "cache.ttl": ttl}), self._lock:
             self._cleanup_expired()
 
             # Remove if exists
@@ -86,4 +103,53 @@ class SimpleCache:
                 'size': len(self.cache),
                 'max_size': self.max_size,
                 'utilization_percent': (len(self.cache) / self.max_size) * 100
-            }
\ No newline at end of file
+            }
+
+def normalize_query(query: str) -> str:
+    """Fold case, punctuation, whitespace and stop words so equivalent queries share a key"""
+    words = re.findall(r"[\w+#.-]+", query.lower())
+    meaningful = [word.strip(".") for word in words if word not in SEARCH_STOP_WORDS]
+    return " ".join(word for word in meaningful if word) or " ".join(words)
+
+class SearchCache:
+    """Persistent LRU cache of web search results keyed by normalized query and model"""
+
+    def __init__(self, directory: str = "data/search_cache", ttl: int = 604800,
+                 size_limit_mb: int = 64):
+        self.ttl = ttl
+        self.cache = diskcache.Cache(
+            directory,
+            size_limit=size_limit_mb * 1024 * 1024,
+            eviction_policy="least-recently-used",
+        )
+        # Hit/miss counters are kept in the cache database and survive restarts
+        self.cache.stats(enable=True)
+
+    def key(self, query: str, model: str) -> str:
+        """Cache key for a query and search model"""
+        return hashlib.sha256(f"{model}\n{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def get(self, query: str, model: str) -> Optional[str]:
+        """Cached result for a query, if present and not expired"""
+        return self.cache.get(self.key(query, model))
+
+    def set(self, query: str, model: str, result: str):
+        """Store a search result with the configured TTL"""
+        self.cache.set(self.key(query, model), result, expire=self.ttl)
+
+    def clear(self):
+        """Remove every cached result and reset the counters"""
+        self.cache.clear()
+        self.cache.stats(reset=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        hits, misses = self.cache.stats()
+        lookups = hits + misses
+        return {
+            'entries': len(self.cache),
+            'size_bytes': self.cache.volume(),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0
+        }
@@ -0,0 +1,163 @@
+"""
+LLM record/replay cassettes for the Academic AI Assistant
+Captures every LLM exchange during a run and serves it back deterministically
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from crewai.llms.base_llm import BaseLLM
+
+# Values that change between otherwise identical runs
+_VOLATILE_PATTERNS = [
+    re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"),
+    re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d+)?"),
+    re.compile(r"\b(note|plan|progress)_\d{8}_\d{6}\b"),
+]
+_ACTION_PATTERN = re.compile(r"^Action:\s*(.+)$", re.MULTILINE)
+
+
+class CassetteMissError(RuntimeError):
+    """Raised on replay when no recorded exchange is left for a prompt"""
+
+
+def prompt_hash(messages: Any) -> str:
+    """Stable hash of a prompt with ids and timestamps masked out"""
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    text = json.dumps(
+        [{"role": m.get("role"), "content": m.get("content")} for m in messages],
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    for pattern in _VOLATILE_PATTERNS:
+        text = pattern.sub("<volatile>", text)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class Cassette:
+    """Append-only JSONL file of recorded LLM exchanges"""
+
+    def __init__(self, path: str, strict: bool = False):
+        self.path = Path(path)
+        self.strict = strict
+        self.entries: List[Dict[str, Any]] = []
+        self.misses = 0
+        self._by_hash: Dict[str, deque] = defaultdict(deque)
+        self._used = set()
+        self._cursor = 0
+        self._lock = threading.Lock()
+        if self.path.exists():
+            self._load()
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            self.entries = [json.loads(line) for line in f if line.strip()]
+        self.rewind()
+
+    def record(self, model: str, messages: Any, response: Any, duration: float,
+               prompt_tokens: int = 0, completion_tokens: int = 0):
+        """Append one exchange to the cassette"""
+        response_text = str(response)
+        entry = {
+            "prompt_hash": prompt_hash(messages),
+            "model": model,
+            "response": response_text,
+            "tool_calls": [name.strip() for name in _ACTION_PATTERN.findall(response_text)],
+            "duration": round(duration, 4),
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+            "recorded_at": datetime.now().isoformat(),
+        }
+        with self._lock:
+            self.entries.append(entry)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def rewind(self):
+        """Make every recorded exchange available again for another replay pass"""
+        with self._lock:
+            self._by_hash = defaultdict(deque)
+            for position, entry in enumerate(self.entries):
+                self._by_hash[entry["prompt_hash"]].append(position)
+            self._used = set()
+            self._cursor = 0
+            self.misses = 0
+
+    def take(self, messages: Any) -> Dict[str, Any]:
+        """Return the next unused exchange for a prompt, falling back to recording order"""
+        key = prompt_hash(messages)
+        with self._lock:
+            candidates = self._by_hash.get(key)
+            while candidates and candidates[0] in self._used:
+                candidates.popleft()
+            if candidates:
+                position = candidates.popleft()
+            else:
+                self.misses += 1
+                while self._cursor < len(self.entries) and self._cursor in self._used:
+                    self._cursor += 1
+                if self.strict or self._cursor >= len(self.entries):
+                    raise CassetteMissError(f"No recorded LLM exchange for prompt {key} in {self.path}")
+                position = self._cursor
+            self._used.add(position)
+            return self.entries[position]
+
+
+class ReplayLLM(BaseLLM):
+    """LLM that serves recorded responses, replaying recorded latency divided by speed (0 = no delay)"""
+
+    def __init__(self, model: str, cassette: Cassette, speed: float = 1.0):
+        super().__init__(model=model, stop=["\nObservation:"])
+        self.cassette = cassette
+        self.speed = speed
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        entry = self.cassette.take(messages)
+        if self.speed > 0:
+            time.sleep(entry["duration"] / self.speed)
+        self._track_token_usage_internal(entry.get("usage", {}))
+        return entry["response"]
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        return await asyncio.to_thread(self.call, messages)
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return True
+
+    def get_context_window_size(self) -> int:
+        return 1_000_000
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def active_cassette() -> Optional[Cassette]:
+    """Cassette configured by LLM_CASSETTE / LLM_CASSETTE_MODE, shared by all agents"""
+    mode = os.getenv("LLM_CASSETTE_MODE")
+    path = os.getenv("LLM_CASSETTE")
+    if mode not in ("record", "replay") or not path:
+        return None
+
+    with _cassettes_lock:
+        if path not in _cassettes:
+            if mode == "record" and Path(path).exists():
+                # A fresh recording replaces the previous cassette
+                Path(path).unlink()
+            strict = os.getenv("LLM_CASSETTE_STRICT", "false").lower() == "true"
+            _cassettes[path] = Cassette(path, strict=strict)
+        return _cassettes[path]
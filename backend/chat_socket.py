@@ -0,0 +1,286 @@
+"""
+WebSocket chat channel for the Academic AI Assistant
+One connection per session carries user messages in and streamed answers, agent actions and replies out
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+
+try:
+    from .logger import ActionFeed, AgentLogger
+    from .storage import FileStorage
+    from .tool_memo import ToolMemo
+    from .streaming import AnswerStream, answer_stream
+    from .run_control import RunCancelledError, run_until
+    from .circuit_breaker import CircuitOpenError
+    from .metrics import metrics, current_endpoint
+    from .responses import dumps
+except ImportError:
+    # Handle case when run as standalone script
+    from logger import ActionFeed, AgentLogger
+    from storage import FileStorage
+    from tool_memo import ToolMemo
+    from streaming import AnswerStream, answer_stream
+    from run_control import RunCancelledError, run_until
+    from circuit_breaker import CircuitOpenError
+    from metrics import metrics, current_endpoint
+    from responses import dumps
+
+ENDPOINT = "/ws/{session_id}"
+
+# Close codes in the application range, mirroring the HTTP status they stand for
+CLOSE_NOT_FOUND = 4404
+CLOSE_SLOW_CLIENT = 4408
+
+
+def chat_cache_key(session_id: str, message: str, context: str) -> str:
+    """Cache key for an answer: the same message only repeats an answer given in the same conversation state"""
+    digest = hashlib.blake2b(f"{message}\0{context}".encode("utf-8"), digest_size=16).hexdigest()
+    return f"chat:{session_id}:{digest}"
+
+
+class SessionContext:
+    """What a connection keeps between turns: the loaded session, its agents and its cache namespace"""
+
+    def __init__(self, session_id: str, storage: FileStorage, logger: AgentLogger, stream: bool = True):
+        self.session_id = session_id
+        self.storage = storage
+        self.stream = stream
+        self.session = storage.get_session(session_id)
+        self.version = storage.session_version(session_id)
+        # Shared by the connection's agents and reset every turn, so it still lasts one run
+        self.memo = ToolMemo(session_id, logger)
+        self._agents: Dict[Tuple[str, int], Any] = {}
+
+    def cache_key(self, message: str, context: str) -> str:
+        return chat_cache_key(self.session_id, message, context)
+
+    def refresh(self) -> Optional[Dict[str, Any]]:
+        """The session, re-read only if another request or worker changed it; None once it is deleted"""
+        version = self.storage.session_version(self.session_id)
+        if version != self.version:
+            self.session = self.storage.get_session(self.session_id) if version else None
+            self.version = version
+        return self.session
+
+    def saved(self, session: Optional[Dict[str, Any]]):
+        """Adopt the session as this connection just wrote it"""
+        self.session, self.version = session, self.storage.session_version(self.session_id)
+
+    def agent(self, build: Callable[..., Any], route: Dict[str, Any]) -> Any:
+        """The connection's agent for a routed model tier, built on first use, with a fresh tool memo for the turn"""
+        key = (route["model"], route["max_iter"])
+        if key not in self._agents:
+            self._agents[key] = build(self.session_id, model=route["model"], max_iter=route["max_iter"],
+                                      memo=self.memo, stream=self.stream)
+        agent = self._agents[key]
+        executor = getattr(agent, "agent_executor", None)
+        if executor is not None:
+            # CrewAI keeps an agent's executor across tasks, appending to its messages and iteration count
+            executor.messages.clear()
+            executor.iterations = 0
+        self.memo.reset()
+        return agent
+
+
+class ChatTurn:
+    """One user message on a channel, with its cancellation and the answer tokens streamed for it"""
+
+    def __init__(self, channel: "ChatChannel", turn_id: str, message: str, parallel: bool = False):
+        self.id = turn_id
+        self.message = message
+        self.parallel = parallel
+        self.cancelled = asyncio.Event()
+        self.tokens = AnswerStream(lambda text: channel.push_token(turn_id, text))
+
+    def cancel(self):
+        self.cancelled.set()
+
+    async def run(self, start_run: Callable[[], Awaitable]) -> Any:
+        """Await the turn's agent run, streaming its answer and stopping it when the turn is cancelled"""
+        reset = answer_stream.set(self.tokens)
+        try:
+            return await run_until(self.cancelled.wait(), start_run, "cancelled by client")
+        finally:
+            answer_stream.reset(reset)
+
+
+class ChatChannel:
+    """A session's WebSocket: reads client frames, runs turns one at a time and writes every outgoing frame"""
+
+    def __init__(self, websocket: WebSocket, session_id: str, feed: ActionFeed, logger: AgentLogger,
+                 heartbeat: float = 15.0, send_timeout: float = 30.0, max_pending: int = 8):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.feed = feed
+        self.logger = logger
+        self.heartbeat = heartbeat
+        self.send_timeout = send_timeout
+        self._loop = asyncio.get_running_loop()
+        self._outbox: deque = deque()
+        self._wake = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._turns: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._current: Optional[ChatTurn] = None
+        # Checked by every loop: on 3.11 wait_for() can swallow a cancel that races its inner await
+        self._closed = False
+
+    def send(self, frame: Dict[str, Any]):
+        """Queue a frame for the client; call on the event loop"""
+        self._outbox.append(frame)
+        self._drained.clear()
+        self._wake.set()
+
+    def _push_token(self, turn_id: str, text: str):
+        last = self._outbox[-1] if self._outbox else None
+        if last is not None and last["type"] == "token" and last["id"] == turn_id:
+            # The client is behind: grow the unsent frame instead of queueing another
+            last["text"] += text
+        else:
+            self.send({"type": "token", "id": turn_id, "text": text})
+
+    def push_token(self, turn_id: str, text: str):
+        """Queue answer text from any thread (LLM stream chunks arrive on the run's worker thread)"""
+        self._loop.call_soon_threadsafe(self._push_token, turn_id, text)
+
+    async def _write(self):
+        while not self._closed:
+            if not self._outbox:
+                self._drained.set()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    # Idle connections still carry a frame now and then, so proxies keep them open
+                    self.send({"type": "ping", "timestamp": datetime.now().isoformat()})
+                self._wake.clear()
+                continue
+            frame = self._outbox.popleft()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(dumps(frame).decode()), self.send_timeout)
+            except asyncio.TimeoutError:
+                # The client stopped reading; drop it rather than buffer without bound
+                self.logger.warning("Closing chat socket: client is not reading", self.session_id)
+                await self.close(CLOSE_SLOW_CLIENT, "Client is not reading")
+                return
+
+    async def _relay_actions(self, last_event_id: Optional[int]):
+        subscription = self.feed.subscribe(self.session_id, last_event_id)
+        try:
+            while not self._closed:
+                # Backpressure: new actions wait in the subscription's bounded queue until the client catches up
+                await self._drained.wait()
+                events, dropped = await subscription.next_batch(self.heartbeat)
+                if dropped:
+                    # Older actions were dropped; the client can refetch /agent-logs
+                    self.send({"type": "dropped", "count": dropped})
+                for event_id, entry in events:
+                    self.send({"type": "action", "event_id": event_id, "action": entry})
+        finally:
+            self.feed.unsubscribe(subscription)
+
+    async def _read(self):
+        while True:
+            try:
+                frame = json.loads(await self.websocket.receive_text())
+                kind = frame.get("type")
+            except (ValueError, KeyError, AttributeError):
+                self.send({"type": "error", "status": 400, "detail": "Frames must be JSON objects with a type"})
+                continue
+
+            if kind == "message":
+                message = frame.get("message")
+                turn_id = str(frame.get("id") or uuid.uuid4().hex[:12])
+                if not isinstance(message, str) or not message.strip():
+                    self.send({"type": "error", "id": turn_id, "status": 422, "detail": "message must be a non-empty string"})
+                    continue
+                try:
+                    self._turns.put_nowait(ChatTurn(self, turn_id, message, bool(frame.get("parallel"))))
+                except asyncio.QueueFull:
+                    self.send({"type": "error", "id": turn_id, "status": 429,
+                               "detail": "Too many messages waiting; wait for an answer first"})
+            elif kind == "cancel":
+                current = self._current
+                if current is not None and frame.get("id") in (None, current.id):
+                    current.cancel()
+            elif kind == "ping":
+                self.send({"type": "pong", "timestamp": datetime.now().isoformat()})
+            elif kind != "pong":
+                self.send({"type": "error", "status": 400, "detail": f"Unknown frame type: {kind}"})
+
+    async def _run_turns(self, handle: Callable[[ChatTurn], Awaitable[Dict[str, Any]]]):
+        while not self._closed:
+            turn = await self._turns.get()
+            self._current = turn
+            try:
+                await self._run_turn(turn, handle)
+            finally:
+                self._current = None
+
+    async def _run_turn(self, turn: ChatTurn, handle: Callable[[ChatTurn], Awaitable[Dict[str, Any]]]):
+        # Turns are timed and labelled like HTTP requests, so LLM and tool metrics attribute to this endpoint
+        token = current_endpoint.set(ENDPOINT)
+        start, status = time.perf_counter(), 200
+        try:
+            self.send({"type": "done", "id": turn.id, **(await handle(turn))})
+        except HTTPException as e:
+            status = e.status_code
+            self.send({"type": "error", "id": turn.id, "status": status, "detail": e.detail})
+        except RunCancelledError as e:
+            # Nobody wants the answer any more, so nothing is cached or saved
+            status = 499
+            self.logger.warning(f"Chat turn cancelled: {e}", self.session_id)
+            self.send({"type": "error", "id": turn.id, "status": status, "detail": str(e)})
+        except CircuitOpenError as e:
+            status = 503
+            self.logger.warning(f"Chat turn rejected: {e}", self.session_id)
+            self.send({"type": "error", "id": turn.id, "status": status, "detail": str(e),
+                       "retry_after": int(e.retry_in) + 1})
+        except Exception as e:
+            status = 500
+            self.logger.error(f"Chat socket error: {str(e)}")
+            self.send({"type": "error", "id": turn.id, "status": status, "detail": f"Internal server error: {str(e)}"})
+        finally:
+            metrics.record_request(ENDPOINT, "WS", status, time.perf_counter() - start)
+            current_endpoint.reset(token)
+
+    async def serve(self, handle: Callable[[ChatTurn], Awaitable[Dict[str, Any]]],
+                    last_event_id: Optional[int] = None):
+        """Run the connection until the client leaves; a turn still running is cancelled"""
+        tasks = [asyncio.create_task(self._write()),
+                 asyncio.create_task(self._relay_actions(last_event_id)),
+                 asyncio.create_task(self._run_turns(handle))]
+        try:
+            await self._read()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            await self._stop(tasks)
+
+    async def _stop(self, tasks):
+        """Cancel the channel's tasks and wait for them, for at most one heartbeat and send timeout"""
+        self._closed = True
+        self._wake.set()
+        if self._current is not None:
+            self._current.cancel()
+        for task in tasks:
+            task.cancel()
+        # wait() rather than gather(): a cancellation of this task keeps its message (anyio relies on it).
+        # A task whose cancel was swallowed stops at its next _closed check, well inside the timeout.
+        _, pending = await asyncio.wait(tasks, timeout=self.heartbeat + self.send_timeout)
+        if pending:
+            self.logger.warning(f"Chat socket tasks still running after close: {len(pending)}", self.session_id)
+
+    async def close(self, code: int = 1000, reason: Optional[str] = None):
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except (RuntimeError, WebSocketDisconnect):
+            pass  # already closed by the client
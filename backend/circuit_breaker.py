@@ -0,0 +1,167 @@
+"""
+Circuit breakers for LLM calls in the Academic AI Assistant
+Tracks error rate and latency per model and fails fast while a model is unhealthy
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import httpx
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# HTTP statuses that mean the provider, not the request, is failing
+FAULT_STATUSES = {408, 429}
+# Provider SDK errors raised before any status arrives (openai, anthropic and litellm share these names)
+FAULT_ERRORS = {"APIConnectionError", "APITimeoutError", "Timeout", "ServiceUnavailableError"}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a model whose circuit is open"""
+
+    def __init__(self, model: str, retry_in: float):
+        super().__init__(f"Circuit open for {model}; retry in {retry_in:.0f}s")
+        self.model = model
+        self.retry_in = retry_in
+
+
+def is_upstream_fault(error: BaseException) -> bool:
+    """Whether an LLM call failed because the provider is unreachable, throttling or erroring (timeouts, 429, 5xx)
+
+    Errors in the request itself, such as an over-long context or invalid arguments, are not faults:
+    they would fail the same way on any model, so they neither trip the breaker nor go to the fallback.
+    """
+    while error is not None:
+        if isinstance(error, (TimeoutError, ConnectionError, httpx.TransportError)):
+            return True
+        if any(cls.__name__ in FAULT_ERRORS for cls in type(error).__mro__):
+            return True
+        # status_code on openai/anthropic/litellm errors, code on google-genai ones
+        status = getattr(error, "status_code", None) or getattr(error, "code", None)
+        if isinstance(status, int) and not isinstance(status, bool):
+            return status in FAULT_STATUSES or status >= 500
+        error = error.__cause__
+    return False
+
+
+class CircuitBreaker:
+    """Rolling-window breaker: opens on too many errors or slow calls, probes when half-open"""
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5, error_rate: float = 0.5,
+                 slow_call_seconds: float = 30.0, slow_call_rate: float = 0.8,
+                 cooldown: float = 30.0, half_open_probes: int = 1):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.cooldown = cooldown
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.calls: deque = deque(maxlen=window)  # (ok, duration)
+        self.rejected = 0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go through now"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    self.rejected += 1
+                    return False
+                self.state, self._probes = HALF_OPEN, 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self.rejected += 1
+                    return False
+                self._probes += 1
+            return True
+
+    def retry_in(self) -> float:
+        """Seconds until an open circuit lets a probe through"""
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def record(self, ok: bool, duration: float):
+        """Record the outcome of a call that allow() let through"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if ok and duration < self.slow_call_seconds:
+                    self.state = CLOSED
+                    self.calls.clear()
+                else:
+                    self._trip()
+                return
+
+            self.calls.append((ok, duration))
+            if len(self.calls) < self.min_calls:
+                return
+            errors = sum(1 for call_ok, _ in self.calls if not call_ok)
+            slow = sum(1 for _, call_duration in self.calls if call_duration >= self.slow_call_seconds)
+            if errors / len(self.calls) >= self.error_rate or slow / len(self.calls) >= self.slow_call_rate:
+                self._trip()
+
+    def _trip(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.calls.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """State and recent window statistics"""
+        with self._lock:
+            calls = list(self.calls)
+            durations = sorted(duration for _, duration in calls)
+            return {
+                "state": self.state,
+                "calls": len(calls),
+                "error_rate": round(sum(1 for ok, _ in calls if not ok) / len(calls), 3) if calls else 0.0,
+                "p95_seconds": round(durations[min(int(len(durations) * 0.95), len(durations) - 1)], 3)
+                if durations else None,
+                "rejected": self.rejected,
+                "retry_in_seconds": round(self.retry_in(), 1) if self.state == OPEN else 0.0,
+            }
+
+
+class BreakerRegistry:
+    """One breaker per model, configured from the environment"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker(
+                    model,
+                    window=int(os.getenv("LLM_BREAKER_WINDOW", "20")),
+                    min_calls=int(os.getenv("LLM_BREAKER_MIN_CALLS", "5")),
+                    error_rate=float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5")),
+                    slow_call_seconds=float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "30")),
+                    slow_call_rate=float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.8")),
+                    cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "30")),
+                )
+            return self._breakers[model]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Breaker state for every model seen so far"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+    def reset(self, model: Optional[str] = None):
+        """Forget breaker state for one model or all of them"""
+        with self._lock:
+            if model is None:
+                self._breakers.clear()
+            else:
+                self._breakers.pop(model, None)
+
+
+# Shared by every agent LLM in the process
+breakers = BreakerRegistry()
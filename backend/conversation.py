@@ -0,0 +1,131 @@
+"""
+Conversation memory for the Academic AI Assistant
+Keeps prompt size bounded with a rolling summary plus the most recent turns
+"""
+
+import os
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable
+
+try:
+    from .storage import FileStorage
+    from .logger import AgentLogger
+except ImportError:
+    # Handle case when run as standalone script
+    from storage import FileStorage
+    from logger import AgentLogger
+
+Summarizer = Callable[[str, List[Dict[str, Any]], int], str]
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def extractive_summary(previous: str, messages: List[Dict[str, Any]], max_chars: int) -> str:
+    """Fold messages into the summary without an LLM call, keeping the newest lines"""
+    lines = [line for line in previous.splitlines() if line.strip()]
+    for message in messages:
+        speaker = "User" if message.get("role") == "user" else "Assistant"
+        lines.append(f"- {speaker}: {_clip(message.get('content', ''), 160)}")
+
+    summary = "\n".join(lines)
+    while len(summary) > max_chars and len(lines) > 1:
+        lines.pop(0)
+        summary = "\n".join(lines)
+    return summary[-max_chars:]
+
+
+class LLMSummarizer:
+    """Summarizer backed by the utility LLM, falling back to extractive summaries"""
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model or os.getenv("UTILITY_LLM", "gemini/gemini-2.5-flash")
+        self._llm = None
+
+    def __call__(self, previous: str, messages: List[Dict[str, Any]], max_chars: int) -> str:
+        transcript = "\n".join(
+            f"{message.get('role', 'user')}: {_clip(message.get('content', ''), 800)}"
+            for message in messages
+        )
+        prompt = (
+            f"Update the running summary of a study session. Keep it under {max_chars} characters "
+            "and preserve the subject, goals, decisions, created artifacts and open questions.\n\n"
+            f"Current summary:\n{previous or '(empty)'}\n\nNew turns:\n{transcript}\n\nUpdated summary:"
+        )
+
+        if self._llm is None:
+            try:
+                from .llm import build_llm
+            except ImportError:
+                from llm import build_llm
+            self._llm = build_llm(self.model)
+
+        return str(self._llm.call(prompt)).strip()[:max_chars]
+
+
+class ConversationMemory:
+    """Builds bounded chat context and folds older turns into a rolling summary"""
+
+    def __init__(self, storage: FileStorage, summarizer: Optional[Summarizer] = None,
+                 recent_turns: Optional[int] = None, summary_batch: Optional[int] = None,
+                 max_summary_chars: Optional[int] = None, max_message_chars: int = 800):
+        self.storage = storage
+        self.summarizer = summarizer or extractive_summary
+        self.recent_turns = recent_turns or int(os.getenv("CONVERSATION_RECENT_TURNS", "4"))
+        self.summary_batch = summary_batch or int(os.getenv("CONVERSATION_SUMMARY_BATCH", "4"))
+        self.max_summary_chars = max_summary_chars or int(os.getenv("CONVERSATION_SUMMARY_MAX_CHARS", "1500"))
+        self.max_message_chars = max_message_chars
+        self.logger = AgentLogger()
+
+    def _summary_state(self, session_data: Dict[str, Any]) -> Dict[str, Any]:
+        return session_data.get("conversation_summary") or {"text": "", "summarized_until": 0}
+
+    def build_context(self, session_data: Optional[Dict[str, Any]]) -> str:
+        """Render the summary and unsummarized recent turns for the next prompt"""
+        if not session_data:
+            return ""
+
+        messages = session_data.get("messages", [])
+        state = self._summary_state(session_data)
+
+        # Turns not yet folded into the summary, capped in case summarization lags behind
+        window = 2 * (self.recent_turns + self.summary_batch)
+        recent = messages[state["summarized_until"]:][-window:]
+
+        parts = []
+        if state["text"]:
+            parts.append(f"Summary of earlier conversation:\n{state['text']}")
+        if recent:
+            parts.append("Recent conversation:\n" + "\n".join(
+                f"{message.get('role', 'user')}: {_clip(message.get('content', ''), self.max_message_chars)}"
+                for message in recent
+            ))
+        return "\n\n".join(parts)
+
+    def update_summary(self, session_id: str) -> bool:
+        """Fold turns older than the verbatim window into the summary once a batch is ready"""
+        session_data = self.storage.get_session(session_id)
+        if not session_data:
+            return False
+
+        messages = session_data.get("messages", [])
+        state = self._summary_state(session_data)
+        fold_until = len(messages) - 2 * self.recent_turns
+        if fold_until - state["summarized_until"] < 2 * self.summary_batch:
+            return False
+
+        pending = messages[state["summarized_until"]:fold_until]
+        try:
+            text = self.summarizer(state["text"], pending, self.max_summary_chars)
+        except Exception as e:
+            self.logger.warning(f"Summary update failed, using extractive summary: {e}", session_id)
+            text = extractive_summary(state["text"], pending, self.max_summary_chars)
+
+        self.storage.update_conversation_summary(session_id, {
+            "text": text,
+            "summarized_until": fold_until,
+            "updated_at": datetime.now().isoformat()
+        })
+        return True
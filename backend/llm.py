@@ -0,0 +1,240 @@
+"""
+LLM construction for the Academic AI Assistant agents
+Wraps CrewAI LLMs so every call is timed, its token usage recorded and guarded by a circuit breaker
+"""
+
+import os
+import time
+from typing import Any, Optional
+
+from crewai import LLM
+from crewai.events import crewai_event_bus
+from crewai.events.types.llm_events import LLMStreamChunkEvent
+from crewai.llms.base_llm import BaseLLM
+
+try:
+    from .metrics import metrics
+    from .cassette import Cassette, ReplayLLM, active_cassette
+    from .circuit_breaker import CircuitOpenError, breakers, is_upstream_fault
+    from .logger import AgentLogger
+    from .run_control import check_cancelled
+    from .tracing import span, annotate
+    from .streaming import answer_stream
+except ImportError:
+    # Handle case when run as standalone script
+    from metrics import metrics
+    from cassette import Cassette, ReplayLLM, active_cassette
+    from circuit_breaker import CircuitOpenError, breakers, is_upstream_fault
+    from logger import AgentLogger
+    from run_control import check_cancelled
+    from tracing import span, annotate
+    from streaming import answer_stream
+
+logger = AgentLogger()
+
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def relay_answer_chunk(source, event):
+    """Pass streamed text (not tool-call arguments) to the answer stream of the running chat turn"""
+    stream = answer_stream.get()
+    if stream is not None and event.tool_call is None:
+        stream.feed(event.chunk)
+
+
+def timeout_kwargs(model: str, timeout: Optional[float], kwargs: dict) -> dict:
+    """LLM constructor arguments with a per-call timeout in the form the model's client takes"""
+    if not timeout or "timeout" in kwargs or "client_params" in kwargs:
+        return kwargs
+    if (kwargs.get("provider") or model.partition("/")[0]) in ("gemini", "google"):
+        # The native Gemini client ignores `timeout`; it takes one in milliseconds through http_options
+        return {**kwargs, "client_params": {"http_options": {"timeout": int(timeout * 1000)}}}
+    return {**kwargs, "timeout": timeout}
+
+
+class InstrumentedLLM(BaseLLM):
+    """Delegating LLM that records latency, tokens and errors for every call
+
+    Upstream faults (timeouts, connection errors, 429 and 5xx) count against the model's breaker and go to
+    the fallback model; any other error is re-raised as it is.
+    """
+
+    def __init__(self, model: str, session_id: Optional[str] = None, llm: Optional[BaseLLM] = None,
+                 cassette: Optional[Cassette] = None, fallback_model: Optional[str] = None,
+                 fallback_llm: Optional[BaseLLM] = None, timeout: Optional[float] = None, **kwargs):
+        inner = llm or LLM(model=model, **timeout_kwargs(model, timeout, kwargs))
+        object.__setattr__(self, "_inner", inner)
+        object.__setattr__(self, "_fallback", fallback_llm)
+        object.__setattr__(self, "_fallback_kwargs", kwargs)
+        object.__setattr__(self, "_timeout", timeout)
+        self.session_id = session_id
+        self.cassette = cassette
+        self.fallback_model = fallback_model or (fallback_llm.model if fallback_llm else None)
+        super().__init__(
+            model=model,
+            temperature=inner.temperature,
+            provider=inner.provider,
+            stop=list(inner.stop or []),
+        )
+
+    @property
+    def stop(self):
+        return self._inner.stop
+
+    @stop.setter
+    def stop(self, value):
+        self._inner.stop = value
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes not defined on the wrapper itself
+        if name == "_inner":
+            raise AttributeError(name)
+        return getattr(self._inner, name)
+
+    def _usage(self):
+        return self._inner.get_token_usage_summary()
+
+    def _span_attributes(self) -> dict:
+        attributes = {"llm.model": self.model}
+        if self.session_id:
+            attributes["session.id"] = self.session_id
+        return attributes
+
+    def _record(self, start: float, before, error: bool):
+        after = self._usage()
+        prompt_tokens = after.prompt_tokens - before.prompt_tokens
+        completion_tokens = after.completion_tokens - before.completion_tokens
+        metrics.record_llm_call(
+            self.session_id,
+            self.model,
+            time.perf_counter() - start,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            error=error,
+        )
+        annotate(**{"llm.prompt_tokens": prompt_tokens, "llm.completion_tokens": completion_tokens})
+
+    def _record_exchange(self, messages, response, start: float, before):
+        if self.cassette is None:
+            return
+        after = self._usage()
+        self.cassette.record(
+            self.model, messages, response, time.perf_counter() - start,
+            prompt_tokens=after.prompt_tokens - before.prompt_tokens,
+            completion_tokens=after.completion_tokens - before.completion_tokens,
+        )
+
+    def _fallback_llm(self, error: Exception) -> BaseLLM:
+        """LLM to use when the primary model has an upstream fault, or re-raise if none is configured"""
+        if not self.fallback_model:
+            raise error
+        if self._fallback is None:
+            object.__setattr__(self, "_fallback", InstrumentedLLM(
+                self.fallback_model, session_id=self.session_id, cassette=self.cassette, timeout=self._timeout,
+                **self._fallback_kwargs
+            ))
+        logger.warning(f"Routing LLM call from {self.model} to {self.fallback_model}: {error}", self.session_id)
+        return self._fallback
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None, response_model=None):
+        """Call the wrapped LLM and record the outcome"""
+        with span("llm.call", **self._span_attributes()):
+            # Stop a cancelled run before it spends another model call
+            check_cancelled()
+            kwargs = dict(tools=tools, callbacks=callbacks, available_functions=available_functions,
+                          from_task=from_task, from_agent=from_agent, response_model=response_model)
+            breaker = breakers.get(self.model)
+            if not breaker.allow():
+                return self._fallback_llm(CircuitOpenError(self.model, breaker.retry_in())).call(messages, **kwargs)
+
+            before, start, error, fault = self._usage(), time.perf_counter(), False, False
+            stream = answer_stream.get()
+            if stream is not None:
+                stream.begin_call()
+            try:
+                response = self._inner.call(messages, **kwargs)
+                self._record_exchange(messages, response, start, before)
+                return response
+            except Exception as e:
+                error, fault = True, is_upstream_fault(e)
+                if not fault:
+                    # The request itself is bad (context length, invalid arguments): the model is healthy
+                    raise
+                failure = e
+            finally:
+                breaker.record(not fault, time.perf_counter() - start)
+                self._record(start, before, error)
+                if stream is not None:
+                    stream.end_call(discard=error)
+            fallback = self._fallback_llm(failure)
+            metrics.record_retry(self.session_id, "llm")
+            return fallback.call(messages, **kwargs)
+
+    async def acall(self, messages, tools=None, callbacks=None, available_functions=None,
+                    from_task=None, from_agent=None, response_model=None):
+        """Async variant of call"""
+        with span("llm.call", **self._span_attributes()):
+            check_cancelled()
+            kwargs = dict(tools=tools, callbacks=callbacks, available_functions=available_functions,
+                          from_task=from_task, from_agent=from_agent, response_model=response_model)
+            breaker = breakers.get(self.model)
+            if not breaker.allow():
+                fallback = self._fallback_llm(CircuitOpenError(self.model, breaker.retry_in()))
+                return await fallback.acall(messages, **kwargs)
+
+            before, start, error, fault = self._usage(), time.perf_counter(), False, False
+            stream = answer_stream.get()
+            if stream is not None:
+                stream.begin_call()
+            try:
+                response = await self._inner.acall(messages, **kwargs)
+                self._record_exchange(messages, response, start, before)
+                return response
+            except Exception as e:
+                error, fault = True, is_upstream_fault(e)
+                if not fault:
+                    # The request itself is bad (context length, invalid arguments): the model is healthy
+                    raise
+                failure = e
+            finally:
+                breaker.record(not fault, time.perf_counter() - start)
+                self._record(start, before, error)
+                if stream is not None:
+                    stream.end_call(discard=error)
+            fallback = self._fallback_llm(failure)
+            metrics.record_retry(self.session_id, "llm")
+            return await fallback.acall(messages, **kwargs)
+
+    def supports_function_calling(self) -> bool:
+        return self._inner.supports_function_calling()
+
+    def supports_stop_words(self) -> bool:
+        return self._inner.supports_stop_words()
+
+    def get_context_window_size(self) -> int:
+        return self._inner.get_context_window_size()
+
+    def get_token_usage_summary(self):
+        return self._inner.get_token_usage_summary()
+
+
+def build_llm(model: str, session_id: Optional[str] = None, **kwargs) -> BaseLLM:
+    """Create the LLM used by an agent for a session"""
+    cassette = active_cassette()
+    if cassette is not None and os.getenv("LLM_CASSETTE_MODE") == "replay":
+        speed = float(os.getenv("LLM_REPLAY_SPEED", "1.0"))
+        return InstrumentedLLM(model, session_id=session_id, llm=ReplayLLM(model, cassette, speed))
+
+    fallback_model = os.getenv("LLM_FALLBACK_MODEL") or None
+    mock_url = os.getenv("MOCK_LLM_URL")
+    if mock_url:
+        # Route every agent to the local OpenAI-compatible stub (see mock_llm.py)
+        model = os.getenv("MOCK_LLM_MODEL", "mock-model")
+        fallback_model = os.getenv("MOCK_LLM_FALLBACK_MODEL") or None
+        kwargs = {**kwargs, "provider": "openai", "base_url": mock_url, "api_key": "mock"}
+    if fallback_model == model:
+        fallback_model = None
+    # A call should be able to run past the breaker's slow-call threshold, or slow calls only ever show up as errors
+    timeout = float(os.getenv("LLM_TIMEOUT_SECONDS") or 2 * breakers.get(model).slow_call_seconds)
+    return InstrumentedLLM(model, session_id=session_id, cassette=cassette, fallback_model=fallback_model,
+                           timeout=timeout, **kwargs)
@@ -0,0 +1,287 @@
+"""
+Rotated, indexed storage for agent action logs in the Academic AI Assistant
+Appends JSONL with a sparse offset/timestamp index, rotates into gzip segments and answers range queries by seeking
+"""
+
+import gzip
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+INDEX_SUFFIX = ".idx"
+LOCK_SUFFIX = ".lock"
+
+
+def index_path(path: str) -> str:
+    return path + INDEX_SUFFIX
+
+
+def read_index(path: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Rotated segment records and live-file checkpoints from a log's index"""
+    segments, checkpoints = [], []
+    try:
+        with open(index_path(path), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn write after a crash
+                (segments if "segment" in record else checkpoints).append(record)
+    except OSError:
+        pass
+    return segments, checkpoints
+
+
+def _append_index(path: str, record: Dict[str, Any]):
+    with open(index_path(path), "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def _rewrite_index(path: str, records: Iterable[Dict[str, Any]]):
+    tmp = index_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    os.replace(tmp, index_path(path))
+
+
+def _epoch(timestamp: Optional[str]) -> float:
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+class LogStream:
+    """One open JSONL log: sparse index every index_bytes, rotation by size or age"""
+
+    def __init__(self, path: str, rotate_bytes: int = 10 * 1024 * 1024, rotate_seconds: float = 86400,
+                 index_bytes: int = 64 * 1024):
+        self.path = path
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.index_bytes = index_bytes
+        # Worker processes writing the same log take turns through an advisory lock on a sidecar file
+        self.lock_handle = open(path + LOCK_SUFFIX, "ab") if fcntl is not None else None
+        with self._locked():
+            self.handle = open(path, "ab")
+            self._load()
+
+    def _load(self):
+        """Pick up the live file's size, checkpoints and segments as they are on disk"""
+        self.size = os.fstat(self.handle.fileno()).st_size
+        self.segments, checkpoints = read_index(self.path)
+        if self.size and not checkpoints:
+            checkpoints = self._rebuild_checkpoints()
+        self.last_checkpoint = checkpoints[-1]["offset"] if checkpoints else None
+        self.started = _epoch(checkpoints[0]["ts"]) if checkpoints else None
+        self.last_ts: Optional[str] = None
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        if self.lock_handle is None:
+            yield
+            return
+        fcntl.flock(self.lock_handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.lock_handle.fileno(), fcntl.LOCK_UN)
+
+    def _sync(self):
+        """Catch up with writes, rotations and deletions made by other processes"""
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            current = None
+        if current is None or current.st_ino != os.fstat(self.handle.fileno()).st_ino:
+            self.handle.close()
+            self.handle = open(self.path, "ab")
+            self._load()
+        elif current.st_size != self.size:
+            self._load()
+
+    def _rebuild_checkpoints(self) -> List[Dict[str, Any]]:
+        """Index a live file written before indexing existed (or whose index was lost)"""
+        checkpoints, offset, last = [], 0, None
+        with open(self.path, "rb") as f:
+            for line in f:
+                if last is None or offset - last >= self.index_bytes:
+                    try:
+                        checkpoints.append({"offset": offset, "ts": json.loads(line)["timestamp"]})
+                        last = offset
+                    except (ValueError, KeyError):
+                        pass
+                offset += len(line)
+        _rewrite_index(self.path, self.segments + checkpoints)
+        return checkpoints
+
+    def append(self, lines: List[Tuple[str, bytes]]):
+        """Write (timestamp, encoded line) pairs, rotating first if the live file is due"""
+        with self._locked():
+            if self.lock_handle is not None:
+                self._sync()
+            self._append(lines)
+
+    def _append(self, lines: List[Tuple[str, bytes]]):
+        if self.size and self._due(sum(len(line) for _, line in lines)):
+            self.rotate()
+
+        checkpoints = []
+        offset = self.size
+        for timestamp, line in lines:
+            if self.last_checkpoint is None or offset - self.last_checkpoint >= self.index_bytes:
+                checkpoints.append({"offset": offset, "ts": timestamp})
+                self.last_checkpoint = offset
+                if self.started is None:
+                    self.started = _epoch(timestamp)
+            offset += len(line)
+
+        self.handle.write(b"".join(line for _, line in lines))
+        self.handle.flush()
+        self.size = offset
+        self.last_ts = lines[-1][0]
+        for checkpoint in checkpoints:
+            _append_index(self.path, checkpoint)
+
+    def _due(self, incoming: int) -> bool:
+        if self.rotate_bytes and self.size + incoming > self.rotate_bytes:
+            return True
+        return bool(self.rotate_seconds and self.started and time.time() - self.started >= self.rotate_seconds)
+
+    def rotate(self):
+        """Compress the live file into the next segment and start an empty one"""
+        self.handle.close()
+        self.segments, checkpoints = read_index(self.path)
+        directory = os.path.dirname(self.path)
+        segment = f"{os.path.basename(self.path)}.{len(self.segments) + 1:05d}.gz"
+        rotating = self.path + ".rotating"
+        os.replace(self.path, rotating)
+        self.handle = open(self.path, "ab")
+
+        count, last_line = 0, b""
+        with open(rotating, "rb") as src, gzip.open(os.path.join(directory, segment + ".tmp"), "wb") as dst:
+            for line in src:
+                dst.write(line)
+                count += 1
+                last_line = line
+        os.replace(os.path.join(directory, segment + ".tmp"), os.path.join(directory, segment))
+
+        last_ts = self.last_ts
+        if last_ts is None and last_line:
+            try:
+                last_ts = json.loads(last_line)["timestamp"]
+            except (ValueError, KeyError):
+                pass
+        self.segments.append({
+            "segment": segment,
+            "first_ts": checkpoints[0]["ts"] if checkpoints else None,
+            "last_ts": last_ts,
+            "count": count,
+        })
+        _rewrite_index(self.path, self.segments)
+        os.remove(rotating)
+        self.size, self.last_checkpoint, self.started = 0, None, None
+
+    def close(self):
+        self.handle.close()
+        if self.lock_handle is not None:
+            self.lock_handle.close()
+
+
+def delete_log(path: str):
+    """Remove a log, its index and every rotated segment listed in the index"""
+    segments, _ = read_index(path)
+    directory = os.path.dirname(path)
+    for name in [os.path.join(directory, s["segment"]) for s in segments] + [index_path(path), path,
+                                                                             path + LOCK_SUFFIX]:
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+
+
+class _Block:
+    """A run of log lines that can be read without touching the rest of the log"""
+
+    def __init__(self, first_ts: Optional[str], source: str, start: int = 0, end: Optional[int] = None,
+                 compressed: bool = False):
+        self.first_ts = first_ts
+        self.source = source
+        self.start = start
+        self.end = end
+        self.compressed = compressed
+
+    def lines(self) -> List[bytes]:
+        try:
+            if self.compressed:
+                with gzip.open(self.source, "rb") as f:
+                    return f.read().splitlines()
+            with open(self.source, "rb") as f:
+                f.seek(self.start)
+                data = f.read() if self.end is None else f.read(self.end - self.start)
+            return data.splitlines()
+        except OSError:
+            return []
+
+
+def _blocks(path: str) -> List[_Block]:
+    segments, checkpoints = read_index(path)
+    directory = os.path.dirname(path)
+    blocks = [_Block(s["first_ts"], os.path.join(directory, s["segment"]), compressed=True) for s in segments]
+    if not checkpoints and os.path.exists(path):
+        checkpoints = [{"offset": 0, "ts": None}]
+    for i, checkpoint in enumerate(checkpoints):
+        end = checkpoints[i + 1]["offset"] if i + 1 < len(checkpoints) else None
+        blocks.append(_Block(checkpoint["ts"], path, checkpoint["offset"], end))
+    return blocks
+
+
+def query_log(path: str, since: Optional[str] = None, until: Optional[str] = None,
+              actions: Optional[Set[str]] = None, limit: int = 100) -> List[Dict[str, Any]]:
+    """Matching entries in time order: the first `limit` after `since`, otherwise the last `limit`"""
+    blocks = _blocks(path)
+    # A block can only hold entries between its first timestamp and the next block's
+    bounds = [(block, blocks[i + 1].first_ts if i + 1 < len(blocks) else None) for i, block in enumerate(blocks)]
+    candidates = [
+        block for block, next_ts in bounds
+        if not (since and next_ts and next_ts < since) and not (until and block.first_ts and block.first_ts > until)
+    ]
+    needles = [f'"action": "{action}"'.encode() for action in actions or []]
+
+    def matches(block: _Block) -> Iterator[Dict[str, Any]]:
+        for line in block.lines():
+            if needles and not any(needle in line for needle in needles):
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # partially written last line
+            timestamp = entry.get("timestamp", "")
+            if (since and timestamp < since) or (until and timestamp > until):
+                continue
+            if actions and entry.get("action") not in actions:
+                continue
+            yield entry
+
+    results: List[Dict[str, Any]] = []
+    if since:
+        for block in candidates:
+            results.extend(matches(block))
+            if len(results) >= limit:
+                return results[:limit]
+        return results
+
+    for block in reversed(candidates):
+        results[:0] = list(matches(block))
+        if len(results) >= limit:
+            break
+    return results[-limit:]
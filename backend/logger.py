@@ -3,69 +3,604 @@ Agent action logging system for the Academic AI Assistant
 Tracks agent activities for frontend display and debugging
 """
 
+import asyncio
+import atexit
+import itertools
 import json
+import multiprocessing
+import os
+import queue
+import sys
 import threading
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from datetime import datetime
-from collections import defaultdict
+from collections import defaultdict, deque, OrderedDict
 from pathlib import Path
 
+try:
+    from .log_store import LogStream, delete_log, query_log
+    from .shared_state import SharedActionStore, get_action_store
+except ImportError:
+    # Handle case when run as standalone script
+    from log_store import LogStream, delete_log, query_log
+    from shared_state import SharedActionStore, get_action_store
+
+
+def print_sink(entry: Dict[str, Any]):
+    """Default console sink, one short line per action"""
+    print(f"[AGENT LOG] Session {entry['session_id']}: {entry['action']}")
+
+
+def _sink_from_env() -> Optional[Callable[[Dict[str, Any]], None]]:
+    kind = os.getenv("LOG_PRINT_SINK", "stdout").lower()
+    if kind in ("none", "off", "false", "0"):
+        return None
+    if kind == "stderr":
+        return lambda entry: print(f"[AGENT LOG] Session {entry['session_id']}: {entry['action']}", file=sys.stderr)
+    return print_sink
+
+
+class _Flush:
+    """Queue marker signalled once every entry enqueued before it is on disk"""
+
+    def __init__(self, stop: bool = False, action: Optional[Callable[[], None]] = None):
+        self.done = threading.Event()
+        self.stop = stop
+        self.action = action
+
+
+class LogWriter:
+    """Background writer shared by every AgentLogger: batches entries and keeps log files open"""
+
+    def __init__(self, batch_size: int = 256, flush_interval: float = 0.2, max_open_files: int = 64,
+                 sink: Optional[Callable[[Dict[str, Any]], None]] = print_sink,
+                 rotate_bytes: int = 10 * 1024 * 1024, rotate_seconds: float = 86400, index_bytes: int = 64 * 1024):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_open_files = max_open_files
+        self.sink = sink
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.index_bytes = index_bytes
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._handles: "OrderedDict[str, LogStream]" = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+        # Entries queued for a shared action store and not committed yet
+        self._store_pending = 0
+        self._store_lock = threading.Lock()
+        # Called after a batch reaches a shared store (the action feed polls it straight away)
+        self.on_stored: Optional[Callable[[], None]] = None
+
+    def _ensure_started(self):
+        if self._running and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # Threads and queued entries do not survive a fork; the child starts fresh
+                self._queue = queue.SimpleQueue()
+                self._handles = OrderedDict()
+                self._thread = None
+                self._store_pending = 0
+                self._pid = os.getpid()
+            if self._thread is not None and not self._running:
+                # A closed writer may still be finishing its last batch
+                self._thread.join()
+            if self._thread is None or not self._thread.is_alive():
+                self._running = True
+                self._thread = threading.Thread(target=self._run, name="agent-log-writer", daemon=True)
+                self._thread.start()
+
+    def write(self, path: str, entry: Dict[str, Any], store: Optional[SharedActionStore] = None,
+              keep: int = 100):
+        """Queue an entry for its JSONL file (and a shared action store); returns without touching the disk"""
+        self._ensure_started()
+        if store is not None:
+            with self._store_lock:
+                self._store_pending += 1
+        self._queue.put((path, entry, store, keep))
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    @property
+    def store_pending(self) -> bool:
+        """Whether entries written from this process are still on their way to a shared store"""
+        return self._store_pending > 0 and self._pid == os.getpid()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything queued so far has been written"""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        marker = _Flush()
+        self._queue.put(marker)
+        self._wake.set()
+        return marker.done.wait(timeout)
+
+    def delete(self, path: str, timeout: float = 5.0) -> bool:
+        """Write out what is queued for a log, then remove it with its index and segments"""
+        def drop():
+            stream = self._handles.pop(path, None)
+            if stream is not None:
+                stream.close()
+            delete_log(path)
+
+        if self._thread is None or not self._thread.is_alive():
+            drop()
+            return True
+        marker = _Flush(action=drop)
+        self._queue.put(marker)
+        self._wake.set()
+        return marker.done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Write what is queued, close the open files and stop the writer thread"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        marker = _Flush(stop=True)
+        self._queue.put(marker)
+        self._wake.set()
+        marker.done.wait(timeout)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            if self._queue.qsize() < self.batch_size and not isinstance(batch[0], _Flush):
+                # Sleep out the interval rather than waking for every entry; size and flush cut it short
+                self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            markers = [item for item in batch if isinstance(item, _Flush)]
+            self._write_batch([item for item in batch if not isinstance(item, _Flush)])
+            for marker in markers:
+                if marker.action is not None:
+                    try:
+                        marker.action()
+                    except Exception as e:
+                        print(f"Log writer action failed: {e}")
+                if marker.stop:
+                    self._close_handles()
+                marker.done.set()
+            if any(marker.stop for marker in markers):
+                self._running = False
+                return
+
+    def _store_batch(self, batch):
+        # One transaction per store and batch, off the request path
+        rows: Dict[Tuple[SharedActionStore, int], List[Tuple[str, Dict[str, Any]]]] = defaultdict(list)
+        for _, entry, store, keep in batch:
+            if store is not None:
+                rows[(store, keep)].append((entry["session_id"], entry))
+        if not rows:
+            return
+        for (store, keep), entries in rows.items():
+            try:
+                store.append_many(entries, keep)
+            except Exception as e:
+                print(f"Failed to write to action store: {e}")
+            finally:
+                with self._store_lock:
+                    self._store_pending -= len(entries)
+        if self.on_stored is not None:
+            self.on_stored()
+
+    def _handle(self, path: str) -> LogStream:
+        handle = self._handles.get(path)
+        if handle is not None:
+            self._handles.move_to_end(path)
+            return handle
+        handle = LogStream(path, self.rotate_bytes, self.rotate_seconds, self.index_bytes)
+        self._handles[path] = handle
+        if len(self._handles) > self.max_open_files:
+            _, oldest = self._handles.popitem(last=False)
+            oldest.close()
+        return handle
+
+    def _write_batch(self, batch):
+        self._store_batch(batch)
+        lines: Dict[str, List[Tuple[str, bytes]]] = defaultdict(list)
+        for path, entry, _, _ in batch:
+            line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+            lines[path].append((entry.get("timestamp", ""), line))
+            if self.sink is not None:
+                try:
+                    self.sink(entry)
+                except Exception:
+                    pass
+
+        for path, chunk in lines.items():
+            try:
+                if path in self._handles and not os.path.exists(path):
+                    # File was removed under us: reopen instead of writing to the old inode
+                    self._handles.pop(path).close()
+                self._handle(path).append(chunk)
+            except Exception as e:
+                print(f"Failed to write to log file: {e}")
+
+    def _close_handles(self):
+        while self._handles:
+            _, handle = self._handles.popitem()
+            try:
+                handle.close()
+            except Exception:
+                pass
+
+
+# One pipeline for the whole process, however many AgentLogger instances exist
+log_writer = LogWriter(
+    batch_size=int(os.getenv("LOG_BATCH_SIZE", "256")),
+    flush_interval=float(os.getenv("LOG_FLUSH_INTERVAL", "0.2")),
+    max_open_files=int(os.getenv("LOG_MAX_OPEN_FILES", "64")),
+    sink=_sink_from_env(),
+    rotate_bytes=int(os.getenv("LOG_ROTATE_BYTES", str(10 * 1024 * 1024))),
+    rotate_seconds=float(os.getenv("LOG_ROTATE_SECONDS", "86400")),
+    index_bytes=int(os.getenv("LOG_INDEX_BYTES", str(64 * 1024))),
+)
+atexit.register(log_writer.close)
+
+
+class Subscription:
+    """One live reader of a session's actions; its bounded queue drops the oldest entries when full"""
+
+    def __init__(self, session_id: str, max_queue: int, lock: threading.Lock,
+                 loop: asyncio.AbstractEventLoop):
+        self.session_id = session_id
+        self.queue: deque = deque(maxlen=max_queue)
+        self.dropped = 0
+        self._lock = lock
+        self._loop = loop
+        self._ready = asyncio.Event()
+
+    def _push(self, event: Tuple[int, Dict[str, Any]]):
+        # Caller holds the feed lock; may run on any thread
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(event)
+        if not self._ready.is_set():
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError:
+                pass  # the subscriber's event loop has closed
+
+    async def next_batch(self, timeout: float) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+        """Queued (event id, entry) pairs and how many were dropped since the last batch"""
+        if not self.queue:
+            # asyncio.wait() rather than wait_for(): on 3.11 wait_for can swallow a cancel that races the wakeup
+            ready = asyncio.ensure_future(self._ready.wait())
+            try:
+                await asyncio.wait([ready], timeout=timeout)
+            finally:
+                ready.cancel()
+        self._ready.clear()
+        with self._lock:
+            events = list(self.queue)
+            self.queue.clear()
+            dropped, self.dropped = self.dropped, 0
+        return events, dropped
+
+
+class ActionFeed:
+    """Fans new actions out to each session's live subscribers and keeps a short history for resuming"""
+
+    def __init__(self, history: int = 100, max_queue: int = 256, max_sessions: int = 1000,
+                 poll_interval: float = 0.1):
+        self.history = history
+        self.max_queue = max_queue
+        self.max_sessions = max_sessions
+        self.poll_interval = poll_interval
+        # Microsecond-based ids keep increasing across restarts, so stale Last-Event-IDs stay comparable
+        self._ids = itertools.count(time.time_ns() // 1000)
+        self._recent: "OrderedDict[str, deque]" = OrderedDict()
+        self._subscribers: Dict[str, set] = defaultdict(set)
+        # Newest id of any session whose history was dropped; stands in for their version
+        self._dropped_upto = 0
+        self._lock = threading.Lock()
+        # Shared stores whose actions from other worker processes are relayed here, with poll cursors
+        self._followed: Dict[SharedActionStore, int] = {}
+        self._poller: Optional[threading.Thread] = None
+        self._poller_pid = None
+        self._poll_now = threading.Event()
+
+    def publish(self, session_id: str, entry: Dict[str, Any], event_id: Optional[int] = None) -> int:
+        """Record an action and hand it to every subscriber of its session"""
+        with self._lock:
+            event = (event_id if event_id is not None else next(self._ids), entry)
+            recent = self._recent.get(session_id)
+            if recent is None:
+                recent = self._recent[session_id] = deque(maxlen=self.history)
+                while len(self._recent) > self.max_sessions:
+                    _, evicted = self._recent.popitem(last=False)
+                    self._dropped_upto = max(self._dropped_upto, evicted[-1][0])
+            else:
+                self._recent.move_to_end(session_id)
+            recent.append(event)
+            for subscription in self._subscribers.get(session_id, ()):
+                subscription._push(event)
+        return event[0]
+
+    def subscribe(self, session_id: str, last_event_id: Optional[int] = None) -> Subscription:
+        """Start receiving a session's actions, beginning with history newer than last_event_id"""
+        subscription = Subscription(session_id, self.max_queue, self._lock, asyncio.get_running_loop())
+        with self._lock:
+            for event in self._recent.get(session_id, ()):
+                if last_event_id is None or event[0] > last_event_id:
+                    subscription.queue.append(event)
+            self._subscribers[session_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.session_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.session_id]
+
+    def subscriber_count(self, session_id: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get(session_id, ()))
+
+    def forget(self, session_id: str):
+        """Drop a session's resume history"""
+        with self._lock:
+            recent = self._recent.pop(session_id, None)
+            if recent:
+                self._dropped_upto = max(self._dropped_upto, recent[-1][0])
+
+    def version(self, session_id: str) -> int:
+        """Id of the session's latest action; changes whenever the session logs something"""
+        with self._lock:
+            recent = self._recent.get(session_id)
+            return recent[-1][0] if recent else self._dropped_upto
+
+    def follow(self, store: SharedActionStore):
+        """Relay every action written to a shared store, by any worker, to this worker's subscribers in id order"""
+        with self._lock:
+            if store not in self._followed:
+                self._followed[store] = store.latest()
+            if self._poller_pid != os.getpid() or not self._poller.is_alive():
+                # Threads do not survive a fork; each worker polls for itself
+                self._poller_pid = os.getpid()
+                self._poller = threading.Thread(target=self._poll, name="action-feed-poller", daemon=True)
+                self._poller.start()
+
+    def poke(self):
+        """Poll the followed stores now rather than at the next interval"""
+        self._poll_now.set()
+
+    def _poll(self):
+        while True:
+            self._poll_now.wait(self.poll_interval)
+            self._poll_now.clear()
+            with self._lock:
+                followed = list(self._followed.items())
+            for store, cursor in followed:
+                try:
+                    changes, cursor = store.changes(cursor)
+                except Exception:
+                    continue  # busy or removed database; retried on the next tick
+                for event_id, session_id, entry in changes:
+                    if entry is None:
+                        self.forget(session_id)
+                    else:
+                        self.publish(session_id, entry, event_id)
+                with self._lock:
+                    self._followed[store] = cursor
+
+
+# Live action stream for the whole process, fed by every AgentLogger
+action_feed = ActionFeed(
+    history=int(os.getenv("LOG_STREAM_HISTORY", "100")),
+    max_queue=int(os.getenv("LOG_STREAM_QUEUE", "256")),
+    max_sessions=int(os.getenv("LOG_MAX_SESSIONS", "1000")),
+    poll_interval=float(os.getenv("LOG_STREAM_POLL", "0.1")),
+)
+log_writer.on_stored = action_feed.poke
+
+
+class RecentActions:
+    """Ring buffers of each session log's newest actions, least recently used first, evicted past max_sessions"""
+
+    def __init__(self, max_sessions: int = 1000):
+        self.max_sessions = max_sessions
+        self.logs: "OrderedDict[str, deque]" = OrderedDict()  # log file path -> recent actions
+        self.hydrated = set()  # paths whose buffer already holds the tail of their log file
+        self.lock = threading.Lock()
+
+    def buffer(self, path: str, maxlen: int) -> deque:
+        # Caller holds the lock
+        buffer = self.logs.get(path)
+        if buffer is None:
+            buffer = self.logs[path] = deque(maxlen=maxlen)
+            while len(self.logs) > self.max_sessions:
+                evicted, _ = self.logs.popitem(last=False)
+                self.hydrated.discard(evicted)
+        else:
+            self.logs.move_to_end(path)
+        return buffer
+
+    def discard(self, path: str):
+        # Caller holds the lock
+        self.logs.pop(path, None)
+        self.hydrated.discard(path)
+
+
+# Recent actions for every AgentLogger in the process, so one logger reads what another wrote
+recent_actions = RecentActions(max_sessions=int(os.getenv("LOG_MAX_SESSIONS", "1000")))
+
+
+def _store_from_env() -> str:
+    """memory (one process) or sqlite (shared by every worker); several workers default to sqlite"""
+    # uvicorn --workers N spawns each worker with multiprocessing; forking managers (gunicorn) need ACTION_STORE
+    several = int(os.getenv("WEB_CONCURRENCY", "1")) > 1 or multiprocessing.parent_process() is not None
+    return os.getenv("ACTION_STORE", "sqlite" if several else "memory").lower()
+
+
 class AgentLogger:
     """Thread-safe agent action logger"""
 
-    def __init__(self, log_dir: str = "logs"):
+    def __init__(self, log_dir: str = "logs", max_actions_per_session: int = 100,
+                 recent: Optional[RecentActions] = None, store: Optional[str] = None):
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(exist_ok=True)
-        self.logs = defaultdict(list)  # session_id -> list of actions
-        self.max_actions_per_session = 100
-        self._lock = threading.Lock()
+        self._log_prefix = os.path.join(str(self.log_dir), "")
+        self.max_actions_per_session = max_actions_per_session
+        self.recent = recent or recent_actions
+        # With several workers, recent actions live in a database they all share instead of self.recent
+        self.store: Optional[SharedActionStore] = None
+        if (store or _store_from_env()) == "sqlite":
+            self.store = get_action_store(str(self.log_dir / "actions.db"))
+            action_feed.follow(self.store)
+
+    def _path(self, session_id: str) -> str:
+        return f"{self._log_prefix}{session_id}_actions.jsonl"
+
+    def _buffer(self, session_id: str) -> deque:
+        # Caller holds the recent actions lock
+        return self.recent.buffer(self._path(session_id), self.max_actions_per_session)
 
     def log_action(self, session_id: str, action: str, details: Dict[str, Any] = None):
         """Log an agent action"""
-        with self._lock:
-            action_entry = {
-                "timestamp": datetime.now().isoformat(),
-                "action": action,
-                "details": details or {},
-                "session_id": session_id
-            }
+        action_entry = {
+            "timestamp": datetime.now().isoformat(),
+            "action": action,
+            "details": details or {},
+            "session_id": session_id
+        }
+
+        if self.store is not None:
+            # The writer thread stores it with the next batch; the feed relays it from the store in id order
+            log_writer.write(self._path(session_id), action_entry,
+                             store=self.store, keep=self.max_actions_per_session)
+            return
+
+        with self.recent.lock:
+            # Add to in-memory logs; the ring buffer drops the oldest entry
+            self._buffer(session_id).append(action_entry)
+
+        # Live subscribers (SSE) see the action straight away
+        action_feed.publish(session_id, action_entry)
+
+        # File write and console output happen on the shared writer thread
+        self._write_to_file(session_id, action_entry)
 
-            # Add to in-memory logs
-            if len(self.logs[session_id]) >= self.max_actions_per_session:
-                self.logs[session_id].pop(0)  # Remove oldest
+    def _tail(self, session_id: str) -> List[Dict[str, Any]]:
+        """Last max_actions_per_session entries of the session's log file"""
+        try:
+            with open(self._path(session_id), "rb") as f:
+                f.seek(0, os.SEEK_END)
+                position, data = f.tell(), b""
+                while position > 0 and data.count(b"\n") <= self.max_actions_per_session:
+                    step = min(65536, position)
+                    position -= step
+                    f.seek(position)
+                    data = f.read(step) + data
+        except OSError:
+            return []
+
+        entries = []
+        for line in data.splitlines()[-self.max_actions_per_session:]:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue  # first line of a partial read, or a torn write
+        return entries
+
+    def _actions(self, session_id: str) -> Optional[deque]:
+        """Session buffer, filled lazily from the log file after eviction or a restart"""
+        path = self._path(session_id)
+        with self.recent.lock:
+            if path in self.recent.hydrated:
+                return self._buffer(session_id)
 
-            self.logs[session_id].append(action_entry)
+        history = self._tail(session_id)
 
-            # Also write to file
-            self._write_to_file(session_id, action_entry)
+        with self.recent.lock:
+            if path not in self.recent.logs and not history:
+                return None
+            buffer = self._buffer(session_id)
+            if path not in self.recent.hydrated:
+                # The file also holds entries still in memory (or queued); keep only the older ones
+                oldest = buffer[0]["timestamp"] if buffer else None
+                older = [entry for entry in history if oldest is None or entry.get("timestamp", "") < oldest]
+                room = self.max_actions_per_session - len(buffer)
+                if room > 0 and older:
+                    buffer.extendleft(reversed(older[-room:]))
+                self.recent.hydrated.add(path)
+            return buffer
 
-            print(f"[AGENT LOG] Session {session_id}: {action}")
+    def _store_synced(self) -> SharedActionStore:
+        """The shared store once this process's queued actions are in it, so reads see our own writes"""
+        if log_writer.store_pending:
+            log_writer.flush()
+        return self.store
 
     def get_recent_actions(self, session_id: str, limit: int = 20) -> List[Dict[str, Any]]:
         """Get recent actions for a session"""
-        with self._lock:
-            return self.logs[session_id][-limit:] if session_id in self.logs else []
+        if self.store is not None:
+            return self._store_synced().recent(session_id, min(limit, self.max_actions_per_session))
+        buffer = self._actions(session_id)
+        with self.recent.lock:
+            return list(buffer)[-limit:] if buffer is not None else []
 
     def get_all_actions(self, session_id: str) -> List[Dict[str, Any]]:
         """Get all actions for a session"""
-        with self._lock:
-            return self.logs[session_id].copy() if session_id in self.logs else []
+        if self.store is not None:
+            return self._store_synced().recent(session_id, self.max_actions_per_session)
+        buffer = self._actions(session_id)
+        with self.recent.lock:
+            return list(buffer) if buffer is not None else []
 
     def clear_session_logs(self, session_id: str):
         """Clear logs for a specific session"""
-        with self._lock:
-            if session_id in self.logs:
-                del self.logs[session_id]
+        if self.store is not None:
+            # Actions queued before the clear must not land after its tombstone
+            self._store_synced().clear(session_id)
+        with self.recent.lock:
+            # Kept as an empty, hydrated buffer so the file is not read back in
+            self._buffer(session_id).clear()
+            self.recent.hydrated.add(self._path(session_id))
+        action_feed.forget(session_id)
 
     def _write_to_file(self, session_id: str, action_entry: Dict[str, Any]):
-        """Write action to log file"""
-        log_file = self.log_dir / f"{session_id}_actions.jsonl"
+        """Queue action for the session's log file"""
+        log_writer.write(self._path(session_id), action_entry)
 
-        try:
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(action_entry, ensure_ascii=False) + '\n')
-        except Exception as e:
-            print(f"Failed to write to log file: {e}")
+    def version(self, session_id: str) -> int:
+        """Cheap version of a session's action log, for conditional requests"""
+        if self.store is not None:
+            return self._store_synced().version(session_id)
+        return action_feed.version(session_id)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until queued actions are on disk"""
+        return log_writer.flush(timeout)
+
+    def query_actions(self, session_id: str, since: Optional[str] = None, until: Optional[str] = None,
+                      actions: Optional[List[str]] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Actions from the session's full log history, including rotated segments"""
+        self.flush()
+        return query_log(self._path(session_id), since=since, until=until,
+                         actions=set(actions) if actions else None, limit=limit)
+
+    def delete_session_logs(self, session_id: str):
+        """Forget a session's buffered actions and remove its log files"""
+        if self.store is not None:
+            # Actions queued before the clear must not land after its tombstone
+            self._store_synced().clear(session_id)
+        with self.recent.lock:
+            self.recent.discard(self._path(session_id))
+        action_feed.forget(session_id)
+        log_writer.delete(self._path(session_id))
 
     def info(self, message: str, session_id: str = None):
         """Log an info message"""
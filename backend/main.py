@@ -3,18 +3,19 @@ Autonomous Academic AI Assistant Backend
 FastAPI application with CrewAI integration for academic assistance
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header, Query, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from starlette.routing import Match
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import Awaitable, Callable, List, Optional, Dict, Any
 import json
-from crewai import Crew, Agent, Task
 import uuid
 from datetime import datetime
 from pathlib import Path
 import asyncio
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -22,30 +23,53 @@ load_dotenv()
 
 # Import our modules
 try:
-    from .agents import get_academic_agent, create_task_for_message
     from .models import (
         ChatRequest, ChatResponse, SessionCreate, SessionResponse,
-        ArtifactResponse, SaveNotesRequest, UpdateProgressRequest
+        ArtifactResponse, SaveNotesRequest, UpdateProgressRequest, SearchResponse
     )
     from .storage import FileStorage
     from .cache import SimpleCache
-    from .logger import AgentLogger
+    from .logger import AgentLogger, action_feed, log_writer
+    from .streaming import parse_event_id, stream_agent_actions
+    from .retrieval import RetrievalService
+    from .conversation import ConversationMemory, LLMSummarizer
+    from .tools.search_tool import get_search_client
+    from .circuit_breaker import CircuitOpenError, breakers
+    from .routing import route_request, log_route
+    from .run_control import RunCancelledError, run_until_disconnected
+    from .metrics import metrics, current_endpoint
+    from .tracing import span, traced, tag_session, shutdown_tracing
+    from .responses import CompressionMiddleware, FastJSONResponse, etag_matches, make_etag, not_modified
+    from .warmup import agent_stack
+    from .chat_socket import CLOSE_NOT_FOUND, ChatChannel, ChatTurn, SessionContext, chat_cache_key
 except ImportError:
     # Handle case when run as standalone script
-    from agents import get_academic_agent, create_task_for_message
     from models import (
         ChatRequest, ChatResponse, SessionCreate, SessionResponse,
-        ArtifactResponse, SaveNotesRequest, UpdateProgressRequest
+        ArtifactResponse, SaveNotesRequest, UpdateProgressRequest, SearchResponse
     )
     from storage import FileStorage
     from cache import SimpleCache
-    from logger import AgentLogger
+    from logger import AgentLogger, action_feed, log_writer
+    from streaming import parse_event_id, stream_agent_actions
+    from retrieval import RetrievalService
+    from conversation import ConversationMemory, LLMSummarizer
+    from tools.search_tool import get_search_client
+    from circuit_breaker import CircuitOpenError, breakers
+    from routing import route_request, log_route
+    from run_control import RunCancelledError, run_until_disconnected
+    from metrics import metrics, current_endpoint
+    from tracing import span, traced, tag_session, shutdown_tracing
+    from responses import CompressionMiddleware, FastJSONResponse, etag_matches, make_etag, not_modified
+    from warmup import agent_stack
+    from chat_socket import CLOSE_NOT_FOUND, ChatChannel, ChatTurn, SessionContext, chat_cache_key
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Academic AI Assistant API",
     description="Autonomous Academic AI Assistant with CrewAI integration",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Configure CORS
@@ -57,43 +81,84 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large complete responses (sessions, artifacts); streamed responses pass through
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESS_MIN_BYTES", "1024")),
+    gzip_level=int(os.getenv("COMPRESS_GZIP_LEVEL", "6")),
+    brotli_quality=int(os.getenv("COMPRESS_BROTLI_QUALITY", "4")),
+)
+
+def _route_template(request: Request) -> str:
+    """Resolve the route path template (e.g. /artifacts/{session_id}) for metric labels"""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", request.url.path)
+    return "unmatched"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Time and trace every request and expose its endpoint to LLM and tool metrics"""
+    endpoint = _route_template(request)
+    token = current_endpoint.set(endpoint)
+    start = time.perf_counter()
+    status = 500
+    attributes = {"http.method": request.method, "http.route": endpoint}
+    try:
+        with span(f"{request.method} {endpoint}", **attributes) as request_span:
+            response = await call_next(request)
+            status = response.status_code
+            request_span.set_attribute("http.status_code", status)
+            return response
+    finally:
+        metrics.record_request(endpoint, request.method, status, time.perf_counter() - start)
+        current_endpoint.reset(token)
+
 # Initialize components
 storage = FileStorage()
 cache = SimpleCache()
 logger = AgentLogger()
+retrieval = RetrievalService()
 
-# Configure Google Generative AI if API key is available
+# CrewAI and the Gemini SDK load on first agent use (see warmup.py)
 gemini_api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-if gemini_api_key:
-    try:
-        import google.genai as genai
-        genai.configure(api_key=gemini_api_key)
-        logger.info("Google Generative AI configured successfully")
-    except ImportError:
-        try:
-            import google.generativeai as genai
-            genai.configure(api_key=gemini_api_key)
-            logger.info("Google Generative AI configured successfully (using deprecated package)")
-        except ImportError:
-            logger.warning("google-generativeai package not available")
-        except Exception as e:
-            logger.error(f"Failed to configure Google Generative AI: {e}")
-    except Exception as e:
-        logger.error(f"Failed to configure Google Generative AI: {e}")
+PREWARM_AGENTS = os.getenv("PREWARM_AGENTS", "true").lower() == "true"
+# Stream answer tokens to WebSocket clients as the model writes them
+WS_STREAM_TOKENS = os.getenv("WS_STREAM_TOKENS", "true").lower() == "true"
 
 # Check if we have API keys, enable mock mode if not
-MOCK_MODE = not gemini_api_key
+MOCK_LLM_URL = os.getenv("MOCK_LLM_URL")
+REPLAY_MODE = os.getenv("LLM_CASSETTE_MODE") == "replay"
+MOCK_MODE = not (gemini_api_key or MOCK_LLM_URL or REPLAY_MODE)
 if MOCK_MODE:
     logger.info("Running in MOCK MODE - No API keys detected")
+elif REPLAY_MODE:
+    logger.info(f"Replaying LLM responses from {os.getenv('LLM_CASSETTE')}")
+elif MOCK_LLM_URL:
+    logger.info(f"Running against local mock LLM at {MOCK_LLM_URL}")
 else:
     logger.info("Running with API keys - Full AI functionality enabled")
 
+conversation = ConversationMemory(storage, summarizer=None if MOCK_MODE else LLMSummarizer())
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize the application"""
     # Ensure data directories exist
     storage.ensure_directories()
     logger.info("Academic AI Assistant backend started")
+    # Import the agent stack off the event loop so the first chat does not pay for it
+    if PREWARM_AGENTS and not MOCK_MODE:
+        agent_stack.warm_in_background()
+        # The embedding model may need a download; fetch it before the first subject search does
+        retrieval.warm_in_background()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Write out queued agent logs and spans before the process exits"""
+    log_writer.close()
+    shutdown_tracing()
 
 @app.get("/")
 async def root():
@@ -103,27 +168,103 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
+    search_cache = get_search_client().cache
+    circuits = breakers.snapshot()
     return {
-        "status": "healthy",
+        "status": "degraded" if any(c["state"] != "closed" for c in circuits.values()) else "healthy",
         "timestamp": datetime.now().isoformat(),
         "mode": "mock" if MOCK_MODE else "full_ai",
         "components": {
             "storage": "ready",
             "cache": "ready",
-            "agents": "mock_ready" if MOCK_MODE else "ready"
-        }
+            "agents": "mock_ready" if MOCK_MODE else "ready",
+            "llm_circuits": circuits
+        },
+        "search_cache": search_cache.stats() if search_cache else None
     }
 
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """Readiness check: 503 until the agent stack has loaded (mock mode needs none)"""
+    ready = MOCK_MODE or agent_stack.ready
+    if not ready:
+        response.status_code = 503
+    return {
+        "status": "ready" if ready else "not_ready",
+        "mode": "mock" if MOCK_MODE else "full_ai",
+        "agents": agent_stack.status()
+    }
+
+def _mock_response(session_id: str, message: str) -> Dict[str, Any]:
+    """Canned answer used when no LLM is configured"""
+    return {
+        "session_id": session_id,
+        "response": f"I understand you want to discuss: '{message}'. This is a mock response since no API keys are configured. Please set up your GEMINI_API_KEY in the .env file to enable full AI functionality.",
+        "timestamp": datetime.now().isoformat(),
+        "agent_actions": [
+            {
+                "timestamp": datetime.now().isoformat(),
+                "action": "MOCK_RESPONSE",
+                "details": {"message": "Mock AI response generated"}
+            }
+        ]
+    }
+
+def _save_turn(session_id: str, message: str, response_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Append the user message and its answer to the session in one write"""
+    return storage.add_messages_to_session(session_id, [
+        {"role": "user", "content": message, "timestamp": response_data["timestamp"]},
+        {"role": "assistant", "content": response_data["response"], "timestamp": response_data["timestamp"]}
+    ])
+
+async def _answer(session_id: str, message: str, context: str, parallel: bool,
+                  run: Callable[[Callable[[], Awaitable]], Awaitable], agent_for: Callable[[Any, Dict], Any]) -> str:
+    """Route a message to a model tier and run the agents on it; `run` awaits the work and owns its cancellation"""
+    # Cheap complexity score picks the model tier and iteration budget
+    route = route_request(message)
+    route_start = time.perf_counter()
+
+    try:
+        stack = await agent_stack.get()
+        if parallel:
+            # Independent specialist tasks run concurrently, then feed the final answer
+            graph = stack.build_study_graph(message, context, route)
+            result = (await run(lambda: stack.orchestrator.run(graph, session_id)))["outputs"]["answer"]
+        else:
+            agent = agent_for(stack, route)
+            task = stack.create_task_for_message(message, session_id, context, agent=agent)
+
+            # Create crew with the task
+            crew = stack.Crew(
+                agents=[agent],
+                tasks=[task],
+                process="sequential",
+                verbose=False
+            )
+
+            # Execute the task off the event loop
+            kickoff = traced("crew.kickoff")(crew.kickoff)
+            result = await run(lambda: asyncio.to_thread(kickoff))
+    except Exception:
+        log_route(session_id, route, time.perf_counter() - route_start, error=True)
+        raise
+    log_route(session_id, route, time.perf_counter() - route_start)
+    return str(result)
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks):
+async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks, http_request: Request):
     """Main chat endpoint with streaming support"""
+    tag_session(request.session_id)
     try:
         # Validate session exists
         if not storage.session_exists(request.session_id):
             raise HTTPException(status_code=404, detail="Session not found")
 
+        # Bounded conversation context for the user message; answers are cached per conversation state
+        context = conversation.build_context(storage.get_session(request.session_id))
+        cache_key = chat_cache_key(request.session_id, request.message, context)
+
         # Check cache first
-        cache_key = f"chat:{request.session_id}:{hash(request.message)}"
         cached_response = cache.get(cache_key)
         if cached_response:
             logger.info(f"Cache hit for session {request.session_id}")
@@ -132,56 +273,31 @@ async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks)
         # Handle mock mode
         if MOCK_MODE:
             logger.info(f"Mock response for session {request.session_id}")
-            mock_response = {
-                "session_id": request.session_id,
-                "response": f"I understand you want to discuss: '{request.message}'. This is a mock response since no API keys are configured. Please set up your GEMINI_API_KEY in the .env file to enable full AI functionality.",
-                "timestamp": datetime.now().isoformat(),
-                "agent_actions": [
-                    {
-                        "timestamp": datetime.now().isoformat(),
-                        "action": "MOCK_RESPONSE",
-                        "details": {"message": "Mock AI response generated"}
-                    }
-                ]
-            }
+            mock_response = _mock_response(request.session_id, request.message)
 
             # Cache the response
             cache.set(cache_key, mock_response, ttl=3600)
 
             # Update session
-            storage.add_message_to_session(
-                request.session_id,
-                {"role": "user", "content": request.message, "timestamp": mock_response["timestamp"]}
-            )
-            storage.add_message_to_session(
-                request.session_id,
-                {"role": "assistant", "content": mock_response["response"], "timestamp": mock_response["timestamp"]}
-            )
+            _save_turn(request.session_id, request.message, mock_response)
 
             return ChatResponse(**mock_response)
 
-        # Get academic agent for this session
-        agent = get_academic_agent(request.session_id)
-
-        # Create task for the user message
-        task = create_task_for_message(request.message, request.session_id)
+        logger.info(f"Processing chat request for session {request.session_id}")
 
-        # Create crew with the task
-        crew = Crew(
-            agents=[agent],
-            tasks=[task],
-            process="sequential",
-            verbose=False
+        # A client disconnect cancels the run
+        result = await _answer(
+            request.session_id, request.message, context, request.parallel,
+            run=lambda start_run: run_until_disconnected(http_request, start_run),
+            agent_for=lambda stack, route: stack.get_academic_agent(
+                request.session_id, model=route["model"], max_iter=route["max_iter"]
+            ),
         )
 
-        # Execute the task
-        logger.info(f"Processing chat request for session {request.session_id}")
-        result = crew.kickoff()
-
         # Parse the result
         response_data = {
             "session_id": request.session_id,
-            "response": str(result),
+            "response": result,
             "timestamp": datetime.now().isoformat(),
             "agent_actions": logger.get_recent_actions(request.session_id)
         }
@@ -190,25 +306,99 @@ async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks)
         cache.set(cache_key, response_data, ttl=3600)  # Cache for 1 hour
 
         # Update session with new message
-        storage.add_message_to_session(
-            request.session_id,
-            {"role": "user", "content": request.message, "timestamp": response_data["timestamp"]}
-        )
-        storage.add_message_to_session(
-            request.session_id,
-            {"role": "assistant", "content": response_data["response"], "timestamp": response_data["timestamp"]}
-        )
+        _save_turn(request.session_id, request.message, response_data)
+
+        # Fold older turns into the rolling summary after the response is sent
+        background_tasks.add_task(conversation.update_summary, request.session_id)
 
         return ChatResponse(**response_data)
 
+    except RunCancelledError as e:
+        # Nobody is waiting for the answer, so nothing is cached or saved
+        logger.warning(f"Chat request cancelled: {e}", request.session_id)
+        raise HTTPException(status_code=499, detail=str(e))
+    except CircuitOpenError as e:
+        # Upstream model is unhealthy and no fallback is configured: fail fast
+        logger.warning(f"Chat request rejected: {e}", request.session_id)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_in) + 1)})
     except Exception as e:
         logger.error(f"Chat endpoint error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+async def _socket_turn(context: SessionContext, turn: ChatTurn) -> Dict[str, Any]:
+    """One chat turn on a WebSocket: the session, agents and cache namespace come from the connection"""
+    session = context.refresh()
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    # Answers depend on the conversation so far, so they are cached per conversation state
+    history = conversation.build_context(session)
+    cache_key = context.cache_key(turn.message, history)
+    cached_response = cache.get(cache_key)
+    if cached_response:
+        return {"response": cached_response["response"], "timestamp": cached_response["timestamp"], "cached": True}
+
+    if MOCK_MODE:
+        response_data = _mock_response(context.session_id, turn.message)
+        cache.set(cache_key, response_data, ttl=3600)
+        context.saved(_save_turn(context.session_id, turn.message, response_data))
+        return {"response": response_data["response"], "timestamp": response_data["timestamp"], "cached": False}
+
+    result = await _answer(
+        context.session_id, turn.message, history, turn.parallel,
+        run=turn.run, agent_for=lambda stack, route: context.agent(stack.get_academic_agent, route),
+    )
+    response_data = {
+        "session_id": context.session_id,
+        "response": result,
+        "timestamp": datetime.now().isoformat(),
+        # Actions already went out live on the socket
+        "agent_actions": []
+    }
+    cache.set(cache_key, response_data, ttl=3600)
+    context.saved(_save_turn(context.session_id, turn.message, response_data))
+    # Summarize off the event loop; the next turn re-reads the session once the summary lands
+    asyncio.get_running_loop().run_in_executor(None, conversation.update_summary, context.session_id)
+    return {"response": result, "timestamp": response_data["timestamp"], "cached": False}
+
+@app.websocket("/ws/{session_id}")
+async def chat_socket(
+    websocket: WebSocket,
+    session_id: str,
+    after: Optional[str] = Query(None, description="Resume agent actions after this event id"),
+):
+    """Persistent chat channel for one session: messages in; answer tokens, agent actions and replies out"""
+    tag_session(session_id)
+    await websocket.accept()
+    context = SessionContext(session_id, storage, logger, stream=WS_STREAM_TOKENS)
+    if context.session is None:
+        await websocket.close(code=CLOSE_NOT_FOUND, reason="Session not found")
+        return
+    channel = ChatChannel(
+        websocket, session_id, action_feed, logger,
+        heartbeat=float(os.getenv("WS_HEARTBEAT_SECONDS", "15")),
+        send_timeout=float(os.getenv("WS_SEND_TIMEOUT", "30")),
+        max_pending=int(os.getenv("WS_MAX_PENDING", "8")),
+    )
+    await channel.serve(lambda turn: _socket_turn(context, turn), parse_event_id(after))
+
+def _revalidate(http_request: Request, response: Response, *version) -> Optional[Response]:
+    """304 if the client already holds this version, otherwise tag the response with its ETag"""
+    etag = make_etag(*version)
+    if etag_matches(http_request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return None
+
 @app.get("/sessions", response_model=List[SessionResponse])
-async def get_sessions():
+async def get_sessions(http_request: Request, response: Response):
     """Get all chat sessions"""
     try:
+        # Versions are taken before reading, so a concurrent write at worst costs one extra full response
+        unchanged = _revalidate(http_request, response, "sessions", storage.sessions_version())
+        if unchanged:
+            return unchanged
         sessions = storage.get_all_sessions()
         return sessions
     except Exception as e:
@@ -220,6 +410,7 @@ async def create_session(request: SessionCreate):
     """Create a new chat session"""
     try:
         session_id = str(uuid.uuid4())
+        tag_session(session_id)
         session_data = {
             "id": session_id,
             "title": request.title or f"Session {datetime.now().strftime('%Y-%m-%d %H:%M')}",
@@ -246,6 +437,7 @@ async def create_session(request: SessionCreate):
 @app.delete("/session/{session_id}")
 async def delete_session(session_id: str):
     """Delete a chat session and all its data"""
+    tag_session(session_id)
     try:
         if not storage.session_exists(session_id):
             raise HTTPException(status_code=404, detail="Session not found")
@@ -264,11 +456,16 @@ async def delete_session(session_id: str):
         raise HTTPException(status_code=500, detail="Failed to delete session")
 
 @app.get("/artifacts/{session_id}", response_model=ArtifactResponse)
-async def get_artifacts(session_id: str):
+async def get_artifacts(session_id: str, http_request: Request, response: Response):
     """Get artifacts for a specific session"""
+    tag_session(session_id)
     try:
-        if not storage.session_exists(session_id):
+        version = storage.session_version(session_id)
+        if version is None:
             raise HTTPException(status_code=404, detail="Session not found")
+        unchanged = _revalidate(http_request, response, "artifacts", version)
+        if unchanged:
+            return unchanged
 
         artifacts = storage.get_session_artifacts(session_id)
         return artifacts
@@ -280,71 +477,148 @@ async def get_artifacts(session_id: str):
         raise HTTPException(status_code=500, detail="Failed to retrieve artifacts")
 
 @app.post("/save-notes")
-async def save_notes(request: SaveNotesRequest):
+async def save_notes(request: SaveNotesRequest, http_request: Request):
     """Save notes for a session"""
+    tag_session(request.session_id)
     try:
         if not storage.session_exists(request.session_id):
             raise HTTPException(status_code=404, detail="Session not found")
 
         # Save notes using the academic agent
-        agent = get_academic_agent(request.session_id)
+        stack = await agent_stack.get()
+        agent = stack.get_academic_agent(request.session_id)
 
-        task = Task(
+        task = stack.Task(
             description=f"Save these notes: {request.content}",
             expected_output="Notes saved successfully.",
             agent=agent
         )
 
-        crew = Crew(agents=[agent], tasks=[task])
-        result = crew.kickoff()
+        crew = stack.Crew(agents=[agent], tasks=[task])
+        kickoff = traced("crew.kickoff")(crew.kickoff)
+        result = await run_until_disconnected(http_request, lambda: asyncio.to_thread(kickoff))
         storage.save_notes(request.session_id, request.content, request.title)
 
         return {"message": "Notes saved successfully", "result": str(result)}
 
     except HTTPException:
         raise
+    except RunCancelledError as e:
+        logger.warning(f"Save notes request cancelled: {e}", request.session_id)
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         logger.error(f"Save notes error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to save notes")
 
 @app.post("/update-progress")
-async def update_progress(request: UpdateProgressRequest):
+async def update_progress(request: UpdateProgressRequest, http_request: Request):
     """Update progress for a session"""
+    tag_session(request.session_id)
     try:
         if not storage.session_exists(request.session_id):
             raise HTTPException(status_code=404, detail="Session not found")
 
         # Update progress using the academic agent
-        agent = get_academic_agent(request.session_id)
+        stack = await agent_stack.get()
+        agent = stack.get_academic_agent(request.session_id)
 
-        task = Task(
+        task = stack.Task(
             description=f"Update progress: {request.progress_text}",
             expected_output="Progress updated successfully.",
             agent=agent
         )
 
-        crew = Crew(agents=[agent], tasks=[task])
-        result = crew.kickoff()
+        crew = stack.Crew(agents=[agent], tasks=[task])
+        kickoff = traced("crew.kickoff")(crew.kickoff)
+        result = await run_until_disconnected(http_request, lambda: asyncio.to_thread(kickoff))
         storage.update_progress(request.session_id, request.progress_text)
 
         return {"message": "Progress updated successfully", "result": str(result)}
 
     except HTTPException:
         raise
+    except RunCancelledError as e:
+        logger.warning(f"Update progress request cancelled: {e}", request.session_id)
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         logger.error(f"Update progress error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to update progress")
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """LLM, tool and endpoint latency histograms in Prometheus text format"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/search/{subject}", response_model=SearchResponse)
+async def search_subject(subject: str, q: str = Query(..., min_length=1), k: int = Query(5, ge=1, le=50)):
+    """Semantic search over a subject's extracted course materials"""
+    try:
+        if not retrieval.subject_exists(subject):
+            raise HTTPException(status_code=404, detail="Subject not found")
+
+        return await asyncio.to_thread(retrieval.timed_search, subject, q, k)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Search error: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to search subject materials")
+
+def _log_time(value: Optional[datetime]) -> Optional[str]:
+    """Query time as a string comparable with logged (local, naive ISO) timestamps"""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value.isoformat()
+
 @app.get("/agent-logs/{session_id}")
-async def get_agent_logs(session_id: str):
+async def get_agent_logs(
+    session_id: str,
+    http_request: Request,
+    response: Response,
+    since: Optional[datetime] = Query(None, description="Only actions at or after this time (oldest first)"),
+    until: Optional[datetime] = Query(None, description="Only actions at or before this time"),
+    action: Optional[str] = Query(None, description="Comma-separated action types, e.g. TOOL_USED,ERROR"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximum number of actions returned"),
+):
     """Get agent action logs for a session"""
+    tag_session(session_id)
     try:
-        logs = logger.get_recent_actions(session_id)
-        return {"logs": logs}
+        unchanged = _revalidate(http_request, response, "logs", logger.version(session_id),
+                                metrics.session_version(session_id))
+        if unchanged:
+            return unchanged
+        if since is None and until is None and action is None and limit is None:
+            logs = logger.get_recent_actions(session_id)
+        else:
+            # Full history on disk, located through the log index instead of a scan
+            logs = await asyncio.to_thread(
+                logger.query_actions, session_id,
+                since=_log_time(since), until=_log_time(until),
+                actions=[a.strip() for a in action.split(",") if a.strip()] if action else None,
+                limit=limit or 100,
+            )
+        return {"logs": logs, "metrics": metrics.session_summary(session_id)}
     except Exception as e:
         logger.error(f"Get agent logs error: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve agent logs")
 
+@app.get("/agent-logs/{session_id}/stream")
+async def stream_agent_logs(
+    session_id: str,
+    last_event_id: Optional[str] = Header(None, description="Resume after this event id (sent by EventSource)"),
+    after: Optional[str] = Query(None, description="Resume after this event id, for clients that cannot set headers"),
+):
+    """Live Server-Sent Events tail of a session's agent actions"""
+    tag_session(session_id)
+    return stream_agent_actions(
+        action_feed, session_id, parse_event_id(last_event_id or after),
+        heartbeat=float(os.getenv("SSE_HEARTBEAT_SECONDS", "15")),
+    )
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Several workers need an import string; they share recent actions via ACTION_STORE=sqlite (see logger.py)
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    uvicorn.run("main:app" if workers > 1 else app, host="0.0.0.0", port=8000, workers=workers)
\ No newline at end of file
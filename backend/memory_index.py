@@ -0,0 +1,166 @@
+"""
+Memory lookup index for the Academic AI Assistant
+Ranks subject and global memory entries by exact, prefix, fuzzy and semantic match
+"""
+
+import os
+import re
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Bookkeeping keys written by FileStorage that are not memories
+SKIP_KEYS = {"last_updated", "history"}
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_TOKEN_PATTERN.findall(str(text).lower()))
+
+
+def trigrams(text: str) -> Set[str]:
+    """Character trigrams of the normalized text, padded at word boundaries"""
+    padded = f"  {_normalize(text)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class MemoryIndex:
+    """Incrementally updated trigram and token index over memory keys and values"""
+
+    def __init__(self, embedder=None, max_value_chars: int = 2000):
+        self.embedder = embedder
+        self.max_value_chars = max_value_chars
+        # Version of the memory file the index reflects; None until it is first built
+        self.version: Optional[str] = None
+        self.docs: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._key_postings: Dict[str, Set[Tuple[str, str]]] = defaultdict(set)
+        self._token_postings: Dict[str, Set[Tuple[str, str]]] = defaultdict(set)
+        self._lock = threading.RLock()
+
+    def rebuild(self, memory_data: Dict[str, Any], version: Optional[str] = None):
+        """Index every entry of a memory.json document, read at the given file version"""
+        with self._lock:
+            self.docs.clear()
+            self._key_postings.clear()
+            self._token_postings.clear()
+            for subject, entries in (memory_data.get("subjects") or {}).items():
+                for key, value in entries.items():
+                    self.upsert(subject, key, value)
+            for key, value in (memory_data.get("global_memory") or {}).items():
+                self.upsert(None, key, value)
+            self.version = version
+
+    def upsert(self, subject: Optional[str], key: str, value: Any):
+        """Add or replace one entry; subject None is global memory"""
+        if key in SKIP_KEYS:
+            return
+        doc_id = (subject or "", key)
+        text = value if isinstance(value, str) else str(value)
+        text = text[:self.max_value_chars]
+
+        with self._lock:
+            self.remove(subject, key)
+            doc = {
+                "scope": "subject" if subject else "global",
+                "subject": subject,
+                "key": key,
+                "value": value,
+                "norm_key": _normalize(key),
+                "key_grams": trigrams(key),
+                "tokens": set(_TOKEN_PATTERN.findall(text.lower())),
+            }
+            if self.embedder is not None:
+                doc["vector"] = self.embedder.embed([f"{key}: {text}"])[0]
+            self.docs[doc_id] = doc
+            for gram in doc["key_grams"]:
+                self._key_postings[gram].add(doc_id)
+            for token in doc["tokens"] | set(doc["norm_key"].split()):
+                self._token_postings[token].add(doc_id)
+
+    def remove(self, subject: Optional[str], key: str):
+        """Drop one entry from the index"""
+        doc_id = (subject or "", key)
+        with self._lock:
+            doc = self.docs.pop(doc_id, None)
+            if doc is None:
+                return
+            for gram in doc["key_grams"]:
+                self._key_postings[gram].discard(doc_id)
+            for token in doc["tokens"] | set(doc["norm_key"].split()):
+                self._token_postings[token].discard(doc_id)
+
+    def _key_score(self, query: str, query_grams: Set[str], doc: Dict[str, Any]) -> float:
+        if doc["norm_key"] == query:
+            return 1.0
+        if query and (doc["norm_key"].startswith(query)
+                      or any(word.startswith(query) for word in doc["norm_key"].split())):
+            return 0.9
+        overlap = len(query_grams & doc["key_grams"])
+        return 2 * overlap / (len(query_grams) + len(doc["key_grams"]))
+
+    def search(self, query: str, subject: Optional[str] = None, k: int = 5,
+               min_score: float = 0.2) -> List[Dict[str, Any]]:
+        """Ranked entries for a subject (plus global memory) matching a key or description"""
+        norm_query = _normalize(query)
+        query_grams = trigrams(query)
+        query_tokens = set(norm_query.split())
+
+        with self._lock:
+            candidates: Set[Tuple[str, str]] = set()
+            for gram in query_grams:
+                candidates |= self._key_postings.get(gram, set())
+            for token in query_tokens:
+                candidates |= self._token_postings.get(token, set())
+
+            query_vector = None
+            if self.embedder is not None and self.docs:
+                query_vector = self.embedder.embed([query])[0]
+                candidates = set(self.docs)
+
+            results = []
+            for doc_id in candidates:
+                doc = self.docs[doc_id]
+                if doc["subject"] and subject is not None and doc["subject"] != subject:
+                    continue
+
+                key_score = self._key_score(norm_query, query_grams, doc)
+                content_score = len(query_tokens & doc["tokens"]) / len(query_tokens) if query_tokens else 0.0
+                if query_vector is not None:
+                    content_score = max(content_score, float(query_vector @ doc["vector"]))
+
+                score = 1.0 if key_score == 1.0 else 0.65 * key_score + 0.35 * content_score
+                if score >= min_score:
+                    results.append({
+                        "key": doc["key"],
+                        "value": doc["value"],
+                        "scope": doc["scope"],
+                        "subject": doc["subject"],
+                        "score": round(score, 3),
+                    })
+
+        # Subject entries win ties against global ones, as with the old exact lookup
+        results.sort(key=lambda hit: (-hit["score"], hit["scope"] != "subject", hit["key"]))
+        return results[:k]
+
+
+_indexes: Dict[str, MemoryIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_memory_index(memory_file: Path) -> MemoryIndex:
+    """Index shared by every FileStorage using the same memory file"""
+    path = str(Path(memory_file).resolve())
+    with _indexes_lock:
+        if path not in _indexes:
+            embedder = None
+            kind = os.getenv("MEMORY_INDEX_EMBEDDER", "none").lower()
+            if kind != "none":
+                try:
+                    from .retrieval import create_embedder
+                except ImportError:
+                    from retrieval import create_embedder
+                embedder = create_embedder(kind)
+            _indexes[path] = MemoryIndex(embedder=embedder)
+        return _indexes[path]
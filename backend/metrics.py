@@ -0,0 +1,267 @@
+"""
+Latency and token metrics for the Academic AI Assistant
+Histograms by model, tool and endpoint, rendered in Prometheus text format
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536)
+
+# USD per million (input, output) tokens
+MODEL_PRICING = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-1.5-flash": (0.075, 0.30),
+}
+
+# Route template of the request being served, e.g. "/chat"
+current_endpoint: contextvars.ContextVar[str] = contextvars.ContextVar("current_endpoint", default="background")
+
+
+def _label_key(label_names: Tuple[str, ...], labels: Dict[str, Any]) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, "")) for name in label_names)
+
+
+def _format_labels(label_names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    """Labelled monotonically increasing counter"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, amount: float = 1.0, **labels):
+        self.values[_label_key(self.label_names, labels)] += amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value:g}")
+        return "\n".join(lines)
+
+
+class Histogram:
+    """Labelled cumulative histogram with fixed buckets"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.label_names, labels)
+        series = self.series.get(key)
+        if series is None:
+            series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            self.series[key] = series
+
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["counts"][i] += 1
+        series["sum"] += value
+        series["count"] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.series.items()):
+            labels = _format_labels(self.label_names, key)
+            for bound, count in zip(self.buckets, series["counts"]):
+                bucket_labels = _format_labels(self.label_names, key, 'le="%g"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+            inf_labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf_labels} {series['count']}")
+            lines.append(f"{self.name}_sum{labels} {series['sum']:g}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return "\n".join(lines)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimate USD cost of a call from the pricing table"""
+    input_price, output_price = MODEL_PRICING.get(model.split("/")[-1], (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+class MetricsRegistry:
+    """Thread-safe process-wide registry of LLM, tool and HTTP metrics"""
+
+    def __init__(self, max_sessions: int = 1000):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._updates = 0  # stamped on a session summary each time it changes
+
+        self.llm_latency = Histogram(
+            "academic_llm_call_duration_seconds", "LLM call latency",
+            ("model", "endpoint", "status"), LATENCY_BUCKETS)
+        self.llm_tokens = Histogram(
+            "academic_llm_tokens", "Tokens per LLM call",
+            ("model", "endpoint", "kind"), TOKEN_BUCKETS)
+        self.llm_cost = Counter(
+            "academic_llm_cost_usd_total", "Estimated LLM spend in USD", ("model",))
+        self.tool_latency = Histogram(
+            "academic_tool_duration_seconds", "Agent tool execution latency",
+            ("tool", "endpoint", "status"), LATENCY_BUCKETS)
+        self.tool_tokens = Histogram(
+            "academic_tool_output_tokens", "Estimated tokens returned by agent tools",
+            ("tool",), TOKEN_BUCKETS)
+        self.http_latency = Histogram(
+            "academic_http_request_duration_seconds", "HTTP request latency",
+            ("endpoint", "method", "status"), LATENCY_BUCKETS)
+        self.retries = Counter(
+            "academic_retries_total", "Upstream calls made again after a failure", ("kind", "endpoint"))
+
+    def _session(self, session_id: str) -> Dict[str, Any]:
+        self._updates += 1
+        summary = self._sessions.get(session_id)
+        if summary is None:
+            summary = {
+                "llm": {"calls": 0, "errors": 0, "total_seconds": 0.0, "prompt_tokens": 0,
+                        "completion_tokens": 0, "cost_usd": 0.0, "models": {}},
+                "tools": {},
+                "retries": {},
+            }
+            self._sessions[session_id] = summary
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        summary["version"] = self._updates
+        return summary
+
+    def record_llm_call(self, session_id: Optional[str], model: str, duration: float,
+                        prompt_tokens: int = 0, completion_tokens: int = 0, error: bool = False):
+        """Record one LLM call"""
+        endpoint = current_endpoint.get()
+        status = "error" if error else "ok"
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+
+        with self._lock:
+            self.llm_latency.observe(duration, model=model, endpoint=endpoint, status=status)
+            if not error:
+                self.llm_tokens.observe(prompt_tokens, model=model, endpoint=endpoint, kind="prompt")
+                self.llm_tokens.observe(completion_tokens, model=model, endpoint=endpoint, kind="completion")
+            self.llm_cost.inc(cost, model=model)
+
+            if session_id:
+                llm = self._session(session_id)["llm"]
+                llm["calls"] += 1
+                llm["errors"] += int(error)
+                llm["total_seconds"] += duration
+                llm["prompt_tokens"] += prompt_tokens
+                llm["completion_tokens"] += completion_tokens
+                llm["cost_usd"] += cost
+                llm["models"][model] = llm["models"].get(model, 0) + 1
+
+    def record_tool_call(self, session_id: Optional[str], tool: str, duration: float,
+                         output_tokens: int = 0, error: bool = False):
+        """Record one tool execution"""
+        status = "error" if error else "ok"
+        with self._lock:
+            self.tool_latency.observe(duration, tool=tool, endpoint=current_endpoint.get(), status=status)
+            self.tool_tokens.observe(output_tokens, tool=tool)
+
+            if session_id:
+                tools = self._session(session_id)["tools"]
+                stats = tools.setdefault(tool, {"calls": 0, "errors": 0, "total_seconds": 0.0})
+                stats["calls"] += 1
+                stats["errors"] += int(error)
+                stats["total_seconds"] += duration
+
+    def record_retry(self, session_id: Optional[str], kind: str):
+        """Record one retried upstream call: a search backoff attempt or an LLM call re-sent to the fallback"""
+        with self._lock:
+            self.retries.inc(kind=kind, endpoint=current_endpoint.get())
+            if session_id:
+                retries = self._session(session_id)["retries"]
+                retries[kind] = retries.get(kind, 0) + 1
+
+    def record_request(self, endpoint: str, method: str, status: int, duration: float):
+        """Record one HTTP request"""
+        with self._lock:
+            self.http_latency.observe(duration, endpoint=endpoint, method=method, status=status)
+
+    def session_version(self, session_id: str) -> int:
+        """Changes whenever the session's summary does"""
+        with self._lock:
+            summary = self._sessions.get(session_id)
+            return summary["version"] if summary else 0
+
+    def session_summary(self, session_id: str) -> Dict[str, Any]:
+        """Per-session latency, token, error, retry and cost totals"""
+        with self._lock:
+            if session_id not in self._sessions:
+                return {}
+            summary = self._sessions[session_id]
+            llm = summary["llm"]
+            return {
+                "llm": {
+                    **{key: value for key, value in llm.items() if key != "total_seconds"},
+                    "models": dict(llm["models"]),
+                    "total_ms": round(llm["total_seconds"] * 1000, 1),
+                    "avg_ms": round(llm["total_seconds"] * 1000 / llm["calls"], 1) if llm["calls"] else 0.0,
+                    "cost_usd": round(llm["cost_usd"], 6),
+                },
+                "tools": {
+                    name: {
+                        "calls": stats["calls"],
+                        "errors": stats["errors"],
+                        "total_ms": round(stats["total_seconds"] * 1000, 1),
+                        "avg_ms": round(stats["total_seconds"] * 1000 / stats["calls"], 1),
+                    }
+                    for name, stats in summary["tools"].items()
+                },
+                "retries": dict(summary["retries"]),
+            }
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in Prometheus text exposition format"""
+        with self._lock:
+            collectors = (self.llm_latency, self.llm_tokens, self.llm_cost,
+                          self.tool_latency, self.tool_tokens, self.http_latency, self.retries)
+            return "\n".join(collector.render() for collector in collectors) + "\n"
+
+
+def instrument_tool(session_id: str, tool_name: str) -> Callable:
+    """Decorator recording latency and output size of an agent tool function"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = False
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            except Exception:
+                error = True
+                raise
+            finally:
+                metrics.record_tool_call(
+                    session_id, tool_name, time.perf_counter() - start,
+                    output_tokens=len(str(result or "")) // 4, error=error
+                )
+        return wrapper
+    return decorator
+
+
+# Shared registry for the whole process
+metrics = MetricsRegistry()
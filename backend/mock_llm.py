@@ -0,0 +1,208 @@
+"""
+Local stand-in LLM server for the Academic AI Assistant
+OpenAI-compatible chat completions (plain or streamed) with scripted tool calls, latency and errors
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_SCENARIO: Dict[str, Any] = {
+    "model": "mock-model",
+    "seed": None,
+    # fixed | uniform | normal | lognormal, all values in milliseconds
+    "latency": {"distribution": "lognormal", "median_ms": 300, "sigma": 0.4},
+    "tokens_per_second": 120,
+    "errors": {"rate": 0.0, "statuses": [429, 503]},
+    "script": [
+        {"tool": "Load Academic Content", "arguments": {"query": "HOG"}},
+        {"tool": "Get Study Progress", "arguments": {}},
+        {"content": "HOG describes local shape with histograms of gradient orientations. "
+                    "I loaded your course materials and checked your progress."},
+    ],
+}
+
+
+def load_scenario(path: Optional[str] = None) -> Dict[str, Any]:
+    """Load a scenario file on top of the default scenario"""
+    scenario = json.loads(json.dumps(DEFAULT_SCENARIO))
+    if path:
+        scenario.update(json.loads(Path(path).read_text(encoding="utf-8")))
+    return scenario
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count used for usage reporting and token-rate delays"""
+    return max(1, len(text) // 4)
+
+
+class MockLLM:
+    """Scripted LLM behaviour shared by all requests to the stub server"""
+
+    def __init__(self, scenario: Dict[str, Any]):
+        self.scenario = scenario
+        self.random = random.Random(scenario.get("seed"))
+        self.stats = {"requests": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def sample_latency(self) -> float:
+        """Time to first token in seconds"""
+        latency = self.scenario.get("latency", {})
+        kind = latency.get("distribution", "fixed")
+        if kind == "uniform":
+            ms = self.random.uniform(latency.get("min_ms", 0), latency.get("max_ms", 0))
+        elif kind == "normal":
+            ms = self.random.gauss(latency.get("mean_ms", 0), latency.get("stddev_ms", 0))
+        elif kind == "lognormal":
+            ms = latency.get("median_ms", 0) * self.random.lognormvariate(0, latency.get("sigma", 0))
+        else:
+            ms = latency.get("ms", 0)
+        return max(ms, 0) / 1000
+
+    def injected_error(self) -> Optional[int]:
+        """Status code to fail this request with, if any"""
+        errors = self.scenario.get("errors", {})
+        if errors.get("rate", 0) and self.random.random() < errors["rate"]:
+            return self.random.choice(errors.get("statuses", [503]))
+        return None
+
+    def next_step(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Pick the scripted step from how many agent turns the conversation already has"""
+        script = self.scenario.get("script") or [{"content": "OK"}]
+        turns = sum(1 for message in messages if message.get("role") in ("assistant", "tool")
+                    and not message.get("tool_calls"))
+        return script[min(turns, len(script) - 1)]
+
+    def render(self, step: Dict[str, Any], native_tools: bool) -> Dict[str, Any]:
+        """Build the assistant message for a step, as ReAct text or native tool calls"""
+        if "tool" not in step:
+            content = step.get("content", "")
+            if not native_tools:
+                content = f"Thought: I now know the final answer\nFinal Answer: {content}"
+            return {"role": "assistant", "content": content}
+
+        arguments = json.dumps(step.get("arguments", {}))
+        if native_tools:
+            return {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {"name": step["tool"], "arguments": arguments},
+                }],
+            }
+        return {
+            "role": "assistant",
+            "content": f"Thought: I should use a tool\nAction: {step['tool']}\nAction Input: {arguments}",
+        }
+
+
+def stream_chunks(message: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Split an assistant message into chat.completion.chunk deltas, word by word for text"""
+    if message.get("tool_calls"):
+        deltas = [{"role": "assistant", "tool_calls": [{**call, "index": i}
+                                                       for i, call in enumerate(message["tool_calls"])]}]
+    else:
+        words = (message.get("content") or "").split(" ")
+        deltas = [{"role": "assistant", "content": ""}] + [
+            {"content": word if i == 0 else " " + word} for i, word in enumerate(words)
+        ]
+    return deltas
+
+
+def create_app(scenario: Optional[Dict[str, Any]] = None) -> FastAPI:
+    """Create the stub server for a scenario"""
+    mock = MockLLM(scenario or load_scenario())
+    app = FastAPI(title="Mock LLM", version="1.0.0")
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": mock.scenario["model"], "object": "model"}]}
+
+    @app.get("/stats")
+    async def stats():
+        return mock.stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        mock.stats["requests"] += 1
+
+        await asyncio.sleep(mock.sample_latency())
+
+        status = mock.injected_error()
+        if status:
+            mock.stats["errors"] += 1
+            return JSONResponse(status_code=status, content={
+                "error": {"message": f"Injected error {status}", "type": "mock_error", "code": status}
+            })
+
+        message = mock.render(mock.next_step(messages), native_tools=bool(body.get("tools")))
+        prompt_tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in messages)
+        completion_tokens = estimate_tokens(json.dumps(message))
+
+        rate = mock.scenario.get("tokens_per_second") or 0
+        mock.stats["prompt_tokens"] += prompt_tokens
+        mock.stats["completion_tokens"] += completion_tokens
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        if body.get("stream"):
+            return StreamingResponse(stream_completion(body, message, usage, rate), media_type="text/event-stream")
+
+        # Simulate generation time at the configured token rate
+        if rate:
+            await asyncio.sleep(completion_tokens / rate)
+
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", mock.scenario["model"]),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+            }],
+            "usage": usage,
+        }
+
+    async def stream_completion(body: Dict[str, Any], message: Dict[str, Any], usage: Dict[str, int], rate: float):
+        """Server-sent chat.completion.chunk events, paced at the configured token rate"""
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": body.get("model", mock.scenario["model"])}
+        deltas = stream_chunks(message)
+        for i, delta in enumerate(deltas):
+            if rate and i:
+                await asyncio.sleep(usage["completion_tokens"] / rate / len(deltas))
+            finish = ("tool_calls" if message.get("tool_calls") else "stop") if i == len(deltas) - 1 else None
+            chunk = {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield f"data: {json.dumps({**base, 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the mock LLM server")
+    parser.add_argument("--scenario", help="Path to a JSON scenario file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(load_scenario(args.scenario)), host=args.host, port=args.port, log_level="warning")
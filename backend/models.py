@@ -11,6 +11,7 @@ class ChatRequest(BaseModel):
     session_id: str = Field(..., description="ID of the chat session")
     message: str = Field(..., description="User message to process")
     stream: bool = Field(default=False, description="Whether to stream the response")
+    parallel: bool = Field(default=False, description="Run research, materials and memory agents concurrently")
 
 class ChatResponse(BaseModel):
     """Response model for chat endpoint"""
@@ -52,6 +53,20 @@ class UpdateProgressRequest(BaseModel):
     session_id: str
     progress_text: str
 
+class SearchResult(BaseModel):
+    """A single passage returned by subject retrieval"""
+    source: str
+    chunk: int
+    text: str
+    score: float
+
+class SearchResponse(BaseModel):
+    """Response model for subject material search"""
+    subject: str
+    query: str
+    results: List[SearchResult] = Field(default_factory=list)
+    latency_ms: float
+
 class AgentAction(BaseModel):
     """Model for agent actions logging"""
     session_id: str
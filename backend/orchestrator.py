@@ -0,0 +1,183 @@
+"""
+Parallel multi-agent orchestration for the Academic AI Assistant
+Runs a DAG of specialist agent tasks, starting each one as soon as its dependencies finish
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from crewai import Agent, Crew, Task
+
+try:
+    from .agents import (
+        get_academic_agent, get_memory_agent, get_search_agent,
+        describe_message_task, MESSAGE_EXPECTED_OUTPUT,
+    )
+    from .logger import AgentLogger
+    from .tracing import span
+except ImportError:
+    # Handle case when run as standalone script
+    from agents import (
+        get_academic_agent, get_memory_agent, get_search_agent,
+        describe_message_task, MESSAGE_EXPECTED_OUTPUT,
+    )
+    from logger import AgentLogger
+    from tracing import span
+
+AgentFactory = Callable[[str], Agent]
+
+
+class TaskNode:
+    """One agent task in the graph and the tasks whose output it needs"""
+
+    def __init__(self, name: str, agent: AgentFactory, description: str,
+                 expected_output: str, depends_on: Optional[List[str]] = None):
+        self.name = name
+        self.agent = agent
+        self.description = description
+        self.expected_output = expected_output
+        self.depends_on = list(depends_on or [])
+
+
+class TaskGraph:
+    """Dependency graph of agent tasks"""
+
+    def __init__(self, nodes: Optional[List[TaskNode]] = None):
+        self.nodes: Dict[str, TaskNode] = {}
+        for node in nodes or []:
+            self.add(node)
+
+    def add(self, node: TaskNode) -> TaskNode:
+        """Add a task to the graph"""
+        if node.name in self.nodes:
+            raise ValueError(f"Duplicate task name: {node.name}")
+        self.nodes[node.name] = node
+        return node
+
+    def topological_order(self) -> List[str]:
+        """Task names ordered so every task follows its dependencies"""
+        for node in self.nodes.values():
+            missing = [dep for dep in node.depends_on if dep not in self.nodes]
+            if missing:
+                raise ValueError(f"Task {node.name} depends on unknown tasks: {missing}")
+
+        remaining = {name: set(node.depends_on) for name, node in self.nodes.items()}
+        order = []
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Dependency cycle between tasks: {sorted(remaining)}")
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+    def critical_path(self, durations: Dict[str, float]) -> float:
+        """Longest chain of task durations through the graph"""
+        finish: Dict[str, float] = {}
+        for name in self.topological_order():
+            start = max((finish[dep] for dep in self.nodes[name].depends_on), default=0.0)
+            finish[name] = start + durations.get(name, 0.0)
+        return max(finish.values(), default=0.0)
+
+
+Runner = Callable[[TaskNode, str, Dict[str, str]], Awaitable[str]]
+
+
+async def run_with_crew(node: TaskNode, session_id: str, upstream: Dict[str, str]) -> str:
+    """Execute one task as a single-agent crew, off the event loop"""
+    description = node.description
+    if upstream:
+        description += "\n\nResults from earlier steps:\n" + "\n\n".join(
+            f"[{name}]\n{output}" for name, output in upstream.items()
+        )
+
+    agent = node.agent(session_id)
+    task = Task(description=description, expected_output=node.expected_output, agent=agent)
+    crew = Crew(agents=[agent], tasks=[task], process="sequential", verbose=False)
+    with span("crew.kickoff", **{"session.id": session_id, "task.name": node.name}):
+        return str(await crew.kickoff_async())
+
+
+class ParallelOrchestrator:
+    """Runs task graphs with independent tasks executing concurrently"""
+
+    def __init__(self, runner: Optional[Runner] = None, max_concurrency: Optional[int] = None):
+        self.runner = runner or run_with_crew
+        self.max_concurrency = max_concurrency or int(os.getenv("ORCHESTRATOR_MAX_CONCURRENCY", "4"))
+        self.logger = AgentLogger()
+
+    async def run(self, graph: TaskGraph, session_id: str) -> Dict[str, Any]:
+        """Run every task once its dependencies are done and return outputs and timings"""
+        order = graph.topological_order()
+        limit = asyncio.Semaphore(self.max_concurrency)
+        durations: Dict[str, float] = {}
+        pending: Dict[str, asyncio.Task] = {}
+
+        async def execute(node: TaskNode) -> str:
+            upstream = {dep: await pending[dep] for dep in node.depends_on}
+            async with limit:
+                self.logger.log_action(session_id, "AGENT_TASK_STARTED", {
+                    "task": node.name, "depends_on": node.depends_on
+                })
+                start = time.perf_counter()
+                output = await self.runner(node, session_id, upstream)
+                durations[node.name] = time.perf_counter() - start
+                self.logger.log_action(session_id, "AGENT_TASK_COMPLETED", {
+                    "task": node.name, "duration_ms": round(durations[node.name] * 1000, 1)
+                })
+            return output
+
+        start = time.perf_counter()
+        for name in order:
+            pending[name] = asyncio.create_task(execute(graph.nodes[name]))
+        try:
+            outputs = await asyncio.gather(*pending.values())
+        except BaseException:
+            for task in pending.values():
+                task.cancel()
+            raise
+
+        return {
+            "outputs": dict(zip(pending, outputs)),
+            "durations": durations,
+            "wall_time": time.perf_counter() - start,
+            "critical_path": graph.critical_path(durations),
+        }
+
+
+def build_study_graph(message: str, context: str = "", route: Optional[Dict[str, Any]] = None) -> TaskGraph:
+    """Web research, course materials and memory recall in parallel, joined by the final answer"""
+    def answer_agent(session_id: str) -> Agent:
+        if route is None:
+            return get_academic_agent(session_id)
+        return get_academic_agent(session_id, model=route["model"], max_iter=route["max_iter"])
+
+    return TaskGraph([
+        TaskNode(
+            "research", get_search_agent,
+            f"Research on the web: {message}\nUse the Batch Web Search tool with a few focused queries "
+            "and summarize the most relevant findings.",
+            "Concise summary of relevant web findings",
+        ),
+        TaskNode(
+            "materials", get_academic_agent,
+            f"Use the Search Subject Materials tool to find course material passages relevant to: {message}",
+            "The most relevant passages from the course materials",
+        ),
+        TaskNode(
+            "memory", get_memory_agent,
+            f"Retrieve stored memory and study progress relevant to: {message}",
+            "Relevant remembered facts and progress",
+        ),
+        TaskNode(
+            "answer", answer_agent,
+            describe_message_task(message, context),
+            MESSAGE_EXPECTED_OUTPUT,
+            depends_on=["research", "materials", "memory"],
+        ),
+    ])
@@ -0,0 +1,356 @@
+"""
+Local vector retrieval over subject materials for the Academic AI Assistant
+Chunks extracted text, embeds it on CPU and answers cosine top-k queries
+"""
+
+import json
+import os
+import re
+import tarfile
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .logger import AgentLogger
+except ImportError:
+    # Handle case when run as standalone script
+    from logger import AgentLogger
+
+logger = AgentLogger()
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def subject_dir_name(subject: str) -> str:
+    """Map a subject name to its folder under subjects/"""
+    return subject.replace(" ", "")
+
+
+def chunk_text(text: str, chunk_size: int = 120, overlap: int = 30) -> List[str]:
+    """Split text into overlapping word windows"""
+    words = text.split()
+    if not words:
+        return []
+
+    step = max(chunk_size - overlap, 1)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_size]))
+        if start + chunk_size >= len(words):
+            break
+    return chunks
+
+
+class HashingEmbedder:
+    """Dependency-free embedder using hashed word and character trigram features"""
+
+    name = "hashing-512"
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        features = list(tokens)
+        for token in tokens:
+            padded = f"#{token}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts into L2-normalised rows"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                matrix[row, digest % self.dim] += sign
+        return _normalize(matrix)
+
+
+MODEL_URL = "https://chroma-onnx-models.s3.amazonaws.com/all-MiniLM-L6-v2/onnx.tar.gz"
+MODEL_DIR = Path(os.getenv("RETRIEVAL_MODEL_DIR", "~/.cache/academic-ai/all-MiniLM-L6-v2")).expanduser()
+
+
+def download_model(model_dir: Path = MODEL_DIR, url: str = MODEL_URL) -> Path:
+    """Fetch and unpack the MiniLM ONNX export once; returns the folder holding model.onnx"""
+    model_path = model_dir / "onnx"
+    if (model_path / "model.onnx").exists() and (model_path / "tokenizer.json").exists():
+        return model_path
+
+    import httpx
+
+    model_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=model_dir) as tmp:
+        archive = Path(tmp) / "onnx.tar.gz"
+        with httpx.stream("GET", url, timeout=60.0, follow_redirects=True) as response:
+            response.raise_for_status()
+            with open(archive, "wb") as f:
+                for chunk in response.iter_bytes():
+                    f.write(chunk)
+        with tarfile.open(archive) as tar:
+            tar.extractall(tmp, filter="data")
+        # Rename into place, so a concurrent or interrupted download never leaves half a model
+        os.replace(Path(tmp) / "onnx", model_path)
+    return model_path
+
+
+class OnnxEmbedder:
+    """all-MiniLM-L6-v2 sentence embeddings via onnxruntime on CPU"""
+
+    name = "onnx-minilm-l6-v2"
+
+    def __init__(self, model_dir: Path = MODEL_DIR, max_length: int = 256):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_path = download_model(Path(model_dir))
+        self.dim = 384
+        self._tokenizer = Tokenizer.from_file(str(model_path / "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=max_length)
+        self._tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        self._session = onnxruntime.InferenceSession(str(model_path / "model.onnx"),
+                                                     providers=["CPUExecutionProvider"])
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts into L2-normalised rows"""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        encoded = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        hidden = self._session.run(None, {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "token_type_ids": np.zeros_like(input_ids),
+        })[0]
+        # Mean over the real tokens, as sentence-transformers pools MiniLM
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return _normalize(pooled.astype(np.float32))
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def create_embedder(kind: Optional[str] = None, fallback: bool = True):
+    """Create the configured embedder, falling back to hashing when ONNX is unavailable (or raising if not fallback)"""
+    kind = (kind or os.getenv("RETRIEVAL_EMBEDDER", "onnx")).lower()
+    if kind == "onnx":
+        try:
+            return OnnxEmbedder()
+        except Exception as e:
+            if not fallback:
+                raise
+            logger.warning(f"ONNX embedder unavailable, using hashing embedder: {e}")
+    return HashingEmbedder()
+
+
+class SubjectIndex:
+    """Embedding matrix and chunk metadata for one subject, persisted unless it belongs to a fallback embedder"""
+
+    def __init__(self, subject_path: Path, embedder, batch_size: int = 32, persist: bool = True):
+        self.subject_path = Path(subject_path)
+        self.extracted_path = self.subject_path / "extracted"
+        self.index_path = self.subject_path / "index"
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.persist = persist
+        # (chunks, matrix) swapped in one assignment, so a search never pairs new chunks with an old matrix
+        self._data: Tuple[List[Dict[str, Any]], Optional[np.ndarray]] = ([], None)
+        # Sources the loaded data was built from, and when they were last compared with the disk
+        self._fingerprint: Optional[Dict[str, List[int]]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def chunks(self) -> List[Dict[str, Any]]:
+        return self._data[0]
+
+    @property
+    def matrix(self) -> Optional[np.ndarray]:
+        return self._data[1]
+
+    def _source_fingerprint(self) -> Dict[str, List[int]]:
+        fingerprint = {}
+        if self.extracted_path.exists():
+            for file in sorted(self.extracted_path.glob("*.txt")):
+                stat = file.stat()
+                fingerprint[file.name] = [stat.st_mtime_ns, stat.st_size]
+        return fingerprint
+
+    def _manifest_matches(self, fingerprint: Dict[str, List[int]]) -> bool:
+        try:
+            manifest = json.loads((self.index_path / "manifest.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        return manifest.get("embedder") == self.embedder.name and manifest.get("sources") == fingerprint
+
+    def is_stale(self) -> bool:
+        """Check whether the persisted index is missing or out of date"""
+        return not self._manifest_matches(self._source_fingerprint())
+
+    def ensure_ready(self, check_interval: float = 2.0) -> "SubjectIndex":
+        """Load or rebuild the index if its sources changed, comparing them at most every check_interval seconds"""
+        if self.matrix is not None and time.monotonic() - self._checked_at < check_interval:
+            return self
+        # While another thread rebuilds, searches keep using the data already loaded
+        if not self._lock.acquire(blocking=self.matrix is None):
+            return self
+        try:
+            if self.matrix is not None and time.monotonic() - self._checked_at < check_interval:
+                return self
+            fingerprint = self._source_fingerprint()
+            if self.matrix is None or fingerprint != self._fingerprint:
+                if self.persist and self._manifest_matches(fingerprint):
+                    self.load()
+                else:
+                    self.build()
+                self._fingerprint = fingerprint
+            self._checked_at = time.monotonic()
+            return self
+        finally:
+            self._lock.release()
+
+    def build(self):
+        """Chunk all extracted text, embed it in batches and persist the matrix"""
+        fingerprint = self._source_fingerprint()
+        chunks = []
+        for file in sorted(self.extracted_path.glob("*.txt")):
+            content = file.read_text(encoding="utf-8")
+            for position, text in enumerate(chunk_text(content)):
+                chunks.append({"source": file.name, "chunk": position, "text": text})
+
+        texts = [chunk["text"] for chunk in chunks]
+        batches = [
+            self.embedder.embed(texts[i:i + self.batch_size])
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        matrix = np.vstack(batches) if batches else np.zeros((0, self.embedder.dim), dtype=np.float32)
+
+        if not self.persist:
+            # A fallback embedder's vectors stay in memory, so the persisted index survives for the real model
+            self._data = (chunks, matrix.astype(np.float32))
+            logger.info(f"Indexed {len(chunks)} chunks for {self.subject_path.name} in memory ({self.embedder.name})")
+            return
+
+        self.index_path.mkdir(parents=True, exist_ok=True)
+        np.save(self.index_path / "embeddings.npy", matrix.astype(np.float32))
+        (self.index_path / "chunks.json").write_text(
+            json.dumps(chunks, ensure_ascii=False), encoding="utf-8"
+        )
+        (self.index_path / "manifest.json").write_text(json.dumps({
+            "embedder": self.embedder.name,
+            "dim": int(matrix.shape[1]),
+            "sources": fingerprint,
+        }, indent=2), encoding="utf-8")
+
+        logger.info(f"Indexed {len(chunks)} chunks for {self.subject_path.name}")
+        self.load()
+
+    def load(self):
+        """Memory-map the persisted embedding matrix"""
+        chunks = json.loads((self.index_path / "chunks.json").read_text(encoding="utf-8"))
+        self._data = (chunks, np.load(self.index_path / "embeddings.npy", mmap_mode="r"))
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Return the k chunks with the highest cosine similarity to the query"""
+        chunks, matrix = self._data
+        if matrix is None or not len(chunks) or not query.strip():
+            return []
+
+        query_vector = self.embedder.embed([query])[0]
+        scores = matrix @ query_vector
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            {**chunks[i], "score": round(float(scores[i]), 4)}
+            for i in top
+        ]
+
+
+class RetrievalService:
+    """Thread-safe registry of per-subject indexes, rebuilt when sources change"""
+
+    def __init__(self, subjects_path: str = "subjects", embedder=None,
+                 check_interval: Optional[float] = None, retry_seconds: Optional[float] = None):
+        self.subjects_path = Path(subjects_path)
+        self.check_interval = float(os.getenv("RETRIEVAL_CHECK_SECONDS", "2.0")) \
+            if check_interval is None else check_interval
+        self.retry_seconds = float(os.getenv("RETRIEVAL_RETRY_SECONDS", "300")) \
+            if retry_seconds is None else retry_seconds
+        self._embedder = embedder
+        # Used while the configured embedder cannot load; never cached in its place
+        self._fallback = HashingEmbedder()
+        self._retry_at = 0.0
+        self._indexes: Dict[Tuple[str, str], SubjectIndex] = {}
+        # Guards the registry only; each index builds under its own lock
+        self._lock = threading.Lock()
+        # Separate from the index locks: loading (or downloading) the model must not stall searches
+        self._embedder_lock = threading.Lock()
+        self._warmer: Optional[threading.Thread] = None
+
+    @property
+    def embedder(self):
+        """The configured embedder, or the hashing fallback until a retry manages to load it"""
+        if self._embedder is None and time.monotonic() >= self._retry_at:
+            with self._embedder_lock:
+                if self._embedder is None and time.monotonic() >= self._retry_at:
+                    try:
+                        self._embedder = create_embedder(fallback=False)
+                    except Exception as e:
+                        self._retry_at = time.monotonic() + self.retry_seconds
+                        logger.warning(f"ONNX embedder unavailable, using hashing embedder for "
+                                       f"{self.retry_seconds:.0f}s: {e}")
+        return self._embedder or self._fallback
+
+    def warm_in_background(self):
+        """Load the embedding model without holding up startup"""
+        if self._embedder is not None or (self._warmer is not None and self._warmer.is_alive()):
+            return
+        self._warmer = threading.Thread(target=lambda: self.embedder, name="retrieval-warmup", daemon=True)
+        self._warmer.start()
+
+    def subject_exists(self, subject: str) -> bool:
+        """Check if a subject has extracted materials"""
+        return (self.subjects_path / subject_dir_name(subject) / "extracted").exists()
+
+    def get_index(self, subject: str) -> SubjectIndex:
+        """Get a ready-to-query index for a subject, building it if needed"""
+        embedder = self.embedder
+        key = (subject, embedder.name)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = SubjectIndex(self.subjects_path / subject_dir_name(subject), embedder,
+                                     persist=embedder is not self._fallback)
+                self._indexes[key] = index
+        return index.ensure_ready(self.check_interval)
+
+    def search(self, subject: str, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Search a subject's materials"""
+        if not self.subject_exists(subject):
+            return []
+        return self.get_index(subject).search(query, k)
+
+    def timed_search(self, subject: str, query: str, k: int = 5) -> Dict[str, Any]:
+        """Search a subject's materials and report latency"""
+        start = time.perf_counter()
+        results = self.search(subject, query, k)
+        return {
+            "subject": subject,
+            "query": query,
+            "results": results,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
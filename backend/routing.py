@@ -0,0 +1,111 @@
+"""
+Request routing for the Academic AI Assistant
+Scores message complexity with cheap local heuristics and picks a model tier and agent max_iter
+"""
+
+import os
+import re
+from typing import Any, Dict, List
+
+try:
+    from .logger import AgentLogger
+except ImportError:
+    # Handle case when run as standalone script
+    from logger import AgentLogger
+
+logger = AgentLogger()
+
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+# Phrases that signal multi-step work or long generated output
+HEAVY_PATTERNS = [
+    r"\b(write|create|generate|make|draft|prepare)\b.*\b(notes|plan|summary|guide|report|quiz|questions)\b",
+    r"\b(full|detailed|comprehensive|in[- ]depth|complete|thorough|step[- ]by[- ]step)\b",
+    r"\b(compare|contrast|versus|vs|difference between|trade-?offs?)\b",
+    r"\b(derive|prove|analy[sz]e|evaluate|design)\b",
+    r"\b(study plan|schedule|week|weeks|days)\b",
+]
+
+# Lookups that a single tool call or a short answer can satisfy
+LIGHT_PATTERNS = [
+    r"^(hi|hello|hey|thanks|thank you|ok|okay|cool|great)\b",
+    r"\b(my|latest|current) (progress|status)\b",
+    r"\bwhat('s| is) my\b",
+    r"\b(list|show) (my )?(notes|plans|artifacts)\b",
+    r"\b(define|definition of|what does .* stand for)\b",
+]
+
+
+def tier_config() -> Dict[str, Dict[str, Any]]:
+    """Model and max_iter for each tier, overridable from the environment"""
+    return {
+        "light": {
+            "model": os.getenv("MODEL_TIER_LIGHT", "gemini/gemini-2.5-flash-lite"),
+            "max_iter": int(os.getenv("MODEL_TIER_LIGHT_MAX_ITER", "2")),
+        },
+        "standard": {
+            "model": os.getenv("MODEL_TIER_STANDARD", "gemini/gemini-2.5-flash"),
+            "max_iter": int(os.getenv("MODEL_TIER_STANDARD_MAX_ITER", "5")),
+        },
+        "heavy": {
+            "model": os.getenv("MODEL_TIER_HEAVY", "gemini/gemini-2.5-flash"),
+            "max_iter": int(os.getenv("MODEL_TIER_HEAVY_MAX_ITER", "8")),
+        },
+    }
+
+
+def score_complexity(message: str) -> Dict[str, Any]:
+    """Complexity score in [0, 1] and the signals that produced it"""
+    text = message.lower().strip()
+    words = _WORD_PATTERN.findall(text)
+    reasons: List[str] = []
+
+    score = min(len(words) / 60, 0.4)
+    if len(words) > 25:
+        reasons.append(f"{len(words)} words")
+
+    heavy = [pattern for pattern in HEAVY_PATTERNS if re.search(pattern, text)]
+    score += 0.25 * len(heavy)
+    reasons.extend(f"heavy:{re.search(pattern, text).group(0)}" for pattern in heavy)
+
+    questions = text.count("?")
+    if questions > 1:
+        score += 0.1 * (questions - 1)
+        reasons.append(f"{questions} questions")
+
+    light = [pattern for pattern in LIGHT_PATTERNS if re.search(pattern, text)]
+    if light and not heavy:
+        score -= 0.3
+        reasons.extend(f"light:{re.search(pattern, text).group(0)}" for pattern in light)
+
+    return {"score": round(max(0.0, min(score, 1.0)), 3), "reasons": reasons}
+
+
+def route_request(message: str) -> Dict[str, Any]:
+    """Pick the model tier and max_iter for a user message"""
+    complexity = score_complexity(message)
+    light_below = float(os.getenv("ROUTING_LIGHT_BELOW", "0.1"))
+    heavy_from = float(os.getenv("ROUTING_HEAVY_FROM", "0.5"))
+
+    if complexity["score"] < light_below:
+        tier = "light"
+    elif complexity["score"] >= heavy_from:
+        tier = "heavy"
+    else:
+        tier = "standard"
+
+    return {"tier": tier, **tier_config()[tier], **complexity}
+
+
+def log_route(session_id: str, decision: Dict[str, Any], duration: float, error: bool = False):
+    """Append a routing decision and the latency it produced, for tuning tier thresholds"""
+    logger.log_action("routing", "MODEL_ROUTE", {
+        "session_id": session_id,
+        "tier": decision["tier"],
+        "model": decision["model"],
+        "max_iter": decision["max_iter"],
+        "score": decision["score"],
+        "reasons": decision["reasons"],
+        "latency_ms": round(duration * 1000, 1),
+        "error": error,
+    })
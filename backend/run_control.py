@@ -0,0 +1,176 @@
+"""
+Timeouts and cancellation for agent runs in the Academic AI Assistant
+Bounds every tool call and stops in-flight crew runs once the client has gone away
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Optional
+
+try:
+    from .logger import AgentLogger
+except ImportError:
+    # Handle case when run as standalone script
+    from logger import AgentLogger
+
+
+class RunCancelledError(RuntimeError):
+    """Raised inside a run that was cancelled, e.g. because the client disconnected"""
+
+
+class CancelToken:
+    """Cooperative cancellation flag shared by everything running for one request"""
+
+    def __init__(self, parent: Optional["CancelToken"] = None):
+        self.parent = parent
+        self._event = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "cancelled"):
+        self.reason = reason
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if self.parent is not None and self.parent.cancelled:
+            self.reason = self.reason or self.parent.reason
+            return True
+        return self._event.is_set()
+
+
+# Copied into worker threads by asyncio.to_thread and the tool executor
+_current_token: contextvars.ContextVar = contextvars.ContextVar("run_cancel_token", default=None)
+
+
+@contextmanager
+def cancel_scope(token: CancelToken):
+    """Make a token the current one for code started inside the block"""
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current_token.get()
+
+
+def check_cancelled():
+    """Raise RunCancelledError if the current run has been cancelled"""
+    token = _current_token.get()
+    if token is not None and token.cancelled:
+        raise RunCancelledError(f"Run cancelled: {token.reason}")
+
+
+def tool_timeout(tool_name: str) -> float:
+    """Timeout for a tool from TOOL_TIMEOUT_<NAME>, else TOOL_TIMEOUT (0 disables)"""
+    specific = "TOOL_TIMEOUT_" + re.sub(r"[^A-Z0-9]+", "_", tool_name.upper()).strip("_")
+    return float(os.getenv(specific) or os.getenv("TOOL_TIMEOUT", "30"))
+
+
+def timeout_result(tool_name: str, seconds: float) -> str:
+    """Structured error returned to the agent in place of a tool result"""
+    return json.dumps({
+        "error": "tool_timeout",
+        "tool": tool_name,
+        "timeout_seconds": seconds,
+        "message": f"{tool_name} did not finish within {seconds:g}s. Retry once with narrower input, "
+                   "or answer without this tool and say the information was unavailable.",
+    })
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _tool_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=int(os.getenv("TOOL_MAX_WORKERS", "16")),
+                                           thread_name_prefix="agent-tool")
+        return _executor
+
+
+def guard_tool(session_id: str, tool_name: str, logger: Optional[AgentLogger] = None) -> Callable:
+    """Decorator running a tool under its timeout and aborting it when the run is cancelled"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            check_cancelled()
+            seconds = tool_timeout(tool_name)
+            if seconds <= 0:
+                return func(*args, **kwargs)
+
+            # The call gets its own token so a timed-out tool also sees check_cancelled() fire
+            run_token = current_token()
+            call_token = CancelToken(parent=run_token)
+            context = contextvars.copy_context()
+            context.run(_current_token.set, call_token)
+            future = _tool_executor().submit(context.run, func, *args, **kwargs)
+            deadline = time.monotonic() + seconds
+            while True:
+                done, _ = wait([future], timeout=max(0.0, min(0.1, deadline - time.monotonic())))
+                if done:
+                    return future.result()
+                if run_token is not None and run_token.cancelled:
+                    future.cancel()
+                    raise RunCancelledError(f"Run cancelled during {tool_name}: {run_token.reason}")
+                if time.monotonic() >= deadline:
+                    # Threads cannot be killed; the tool stops at its next check_cancelled()
+                    call_token.cancel(f"{tool_name} timed out")
+                    future.cancel()
+                    (logger or AgentLogger()).log_action(session_id, "TOOL_TIMEOUT", {
+                        "tool": tool_name, "timeout_seconds": seconds
+                    })
+                    return timeout_result(tool_name, seconds)
+        return wrapper
+    return decorator
+
+
+async def _wait_for_disconnect(request: Any):
+    # The body has already been read, so the only message left is the disconnect
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def run_until(stop: Awaitable, start_run: Callable[[], Awaitable], reason: str = "client disconnected") -> Any:
+    """Await a run, cancelling it as soon as `stop` completes"""
+    token = CancelToken()
+    with cancel_scope(token):
+        work = asyncio.ensure_future(start_run())
+    stopped = asyncio.ensure_future(stop)
+
+    try:
+        done, _ = await asyncio.wait({work, stopped}, return_when=asyncio.FIRST_COMPLETED)
+        if work in done:
+            return work.result()
+        if stopped.exception() is not None:
+            # Could not listen for the stop signal; just finish the run
+            return await work
+        token.cancel(reason)
+        work.cancel()
+        raise RunCancelledError(f"Run cancelled: {reason}")
+    except asyncio.CancelledError:
+        # The request itself was cancelled (e.g. server shutdown): stop the run as well
+        token.cancel("request cancelled")
+        work.cancel()
+        raise
+    finally:
+        stopped.cancel()
+
+
+async def run_until_disconnected(request: Any, start_run: Callable[[], Awaitable]) -> Any:
+    """Await a run, cancelling it as soon as the HTTP client disconnects"""
+    return await run_until(_wait_for_disconnect(request), start_run)
@@ -0,0 +1,151 @@
+"""
+Shared state for multi-worker deployments of the Academic AI Assistant
+Recent agent actions in a SQLite (WAL) database that every worker process on the host reads and writes
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS actions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    created REAL NOT NULL,
+    entry TEXT
+);
+CREATE INDEX IF NOT EXISTS actions_by_session ON actions (session_id, id);
+"""
+
+# Rows with a NULL entry mark a cleared or deleted session: they move its version and tell other workers
+TOMBSTONE_SECONDS = 3600
+# Actions past a session's cap stay this long before trimming, so a lagging poller still relays them
+RELAY_GRACE_SECONDS = 30
+
+
+class SharedActionStore:
+    """Per-session rings of recent actions; ids come from one sequence, so they order events across workers"""
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread, and never one inherited across a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        # Take the write lock up front so concurrent writers queue on busy_timeout instead of failing to upgrade
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def append(self, session_id: str, entry: Dict[str, Any], keep: int = 100) -> int:
+        """Store an action, trim the session to its newest `keep` and return the action's event id"""
+        return self.append_many([(session_id, entry)], keep)[0]
+
+    def append_many(self, rows: List[Tuple[str, Dict[str, Any]]], keep: int = 100) -> List[int]:
+        """Store (session id, entry) pairs in one transaction, trimming each session once; returns their event ids
+
+        Reads are capped at `keep` anyway, so trimming only drops rows older than RELAY_GRACE_SECONDS.
+        """
+        pid, now = os.getpid(), time.time()
+        with self._write() as conn:
+            event_ids = [
+                conn.execute(
+                    "INSERT INTO actions (session_id, pid, created, entry) VALUES (?, ?, ?, ?)",
+                    (session_id, pid, now, json.dumps(entry, ensure_ascii=False))
+                ).lastrowid
+                for session_id, entry in rows
+            ]
+            for session_id in {session_id for session_id, _ in rows}:
+                conn.execute(
+                    "DELETE FROM actions WHERE session_id = ? AND created < ? AND id <= "
+                    "(SELECT id FROM actions WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (session_id, now - RELAY_GRACE_SECONDS, session_id, keep)
+                )
+        return event_ids
+
+    def events(self, session_id: str, limit: int = 100, after: Optional[int] = None) -> List[Tuple[int, Dict[str, Any]]]:
+        """The session's newest (event id, entry) pairs, oldest first, optionally only those after an id"""
+        rows = self._connect().execute(
+            "SELECT id, entry FROM actions WHERE session_id = ? AND id > ? AND entry IS NOT NULL "
+            "ORDER BY id DESC LIMIT ?",
+            (session_id, after or 0, limit)
+        ).fetchall()
+        return [(event_id, json.loads(entry)) for event_id, entry in reversed(rows)]
+
+    def recent(self, session_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        return [entry for _, entry in self.events(session_id, limit)]
+
+    def version(self, session_id: str) -> int:
+        """Id of the session's latest action or tombstone; 0 if it has none"""
+        (version,) = self._connect().execute(
+            "SELECT COALESCE(MAX(id), 0) FROM actions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return version
+
+    def latest(self) -> int:
+        (latest,) = self._connect().execute("SELECT COALESCE(MAX(id), 0) FROM actions").fetchone()
+        return latest
+
+    def clear(self, session_id: str):
+        """Drop a session's actions, leaving a tombstone"""
+        with self._write() as conn:
+            conn.execute("DELETE FROM actions WHERE session_id = ?", (session_id,))
+            conn.execute("INSERT INTO actions (session_id, pid, created, entry) VALUES (?, ?, ?, NULL)",
+                         (session_id, os.getpid(), time.time()))
+            conn.execute("DELETE FROM actions WHERE entry IS NULL AND created < ?",
+                         (time.time() - TOMBSTONE_SECONDS,))
+
+    def changes(self, after: int, limit: int = 500) -> Tuple[List[Tuple[int, str, Optional[Dict[str, Any]]]], int]:
+        """Actions written after an id, in id order (entry None for tombstones), and the cursor to poll from next"""
+        conn = self._connect()
+        conn.execute("BEGIN")
+        try:
+            (latest,) = conn.execute("SELECT COALESCE(MAX(id), 0) FROM actions").fetchone()
+            # Writers commit one at a time, so committed ids have no gaps a later commit could fill
+            rows = conn.execute(
+                "SELECT id, session_id, entry FROM actions WHERE id > ? AND id <= ? ORDER BY id LIMIT ?",
+                (after, latest, limit)
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        cursor = rows[-1][0] if len(rows) == limit else max(after, latest)
+        return [(event_id, session_id, json.loads(entry) if entry is not None else None)
+                for event_id, session_id, entry in rows], cursor
+
+
+_stores: Dict[str, SharedActionStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_action_store(path: str) -> SharedActionStore:
+    """Store shared by every AgentLogger in this process that uses the same database file"""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None or not os.path.exists(key):
+            store = _stores[key] = SharedActionStore(key)
+        return store
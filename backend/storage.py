@@ -4,16 +4,37 @@ Handles sessions, artifacts, and memory persistence
 """
 
 from typing import List, Dict, Any, Optional
+from contextlib import contextmanager
 from datetime import datetime
+import functools
 import threading
 from pathlib import Path
 import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 try:
     from .logger import AgentLogger
+    from .memory_index import get_memory_index
+    from .tracing import span
 except ImportError:
     # Handle case when run as standalone script
     from logger import AgentLogger
+    from memory_index import get_memory_index
+    from tracing import span
+
+def exclusive(method):
+    """Run a read-modify-write method while holding the storage lock shared with other workers"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._exclusive():
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class FileStorage:
     """File-based storage with thread-safe operations"""
@@ -25,6 +46,7 @@ class FileStorage:
         self.notes_path = self.base_path / "notes"
         self.memory_file = self.base_path / "memory.json"
         self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
         self.logger = AgentLogger()
 
     def ensure_directories(self):
@@ -43,14 +65,63 @@ class FileStorage:
             self._write_json(self.memory_file, {"subjects": {}, "global_memory": {}})
 
     def _write_json(self, file_path: Path, data: Any):
-        """Thread-safe JSON write"""
-        with self._lock:
-            with open(file_path, 'w', encoding='utf-8') as f:
+        """Thread-safe JSON write; readers never see a partial file"""
+        with span("storage.write", **{"storage.path": str(file_path)}), self._lock:
+            tmp_path = file_path.with_name(f"{file_path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=2, ensure_ascii=False)
+            # Filesystem mtimes tick every few ms; stamp a precise one so versions change on every write
+            now = time.time_ns()
+            os.utime(tmp_path, ns=(now, now))
+            os.replace(tmp_path, file_path)
+            self._touch(file_path.parent, now)
+
+    @contextmanager
+    def _exclusive(self):
+        """Serialize read-modify-write updates across threads and worker processes"""
+        with self._update_lock:
+            if fcntl is None:
+                yield
+                return
+            self.base_path.mkdir(parents=True, exist_ok=True)
+            with open(self.base_path / ".storage.lock", "ab") as lock:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _touch(self, directory: Path, now: int):
+        """Move a directory's mtime forward so its version reflects every change inside it"""
+        stat = directory.stat()
+        os.utime(directory, ns=(stat.st_atime_ns, max(now, stat.st_mtime_ns + 1)))
+
+    def session_version(self, session_id: str) -> Optional[str]:
+        """Cheap version of a session (and its artifacts) that changes on every write, None if missing"""
+        try:
+            stat = (self.sessions_path / f"{session_id}.json").stat()
+        except FileNotFoundError:
+            return None
+        return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+    def memory_version(self) -> Optional[str]:
+        """Cheap version of memory.json, changed by a write from any process"""
+        try:
+            stat = self.memory_file.stat()
+        except FileNotFoundError:
+            return None
+        return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+    def sessions_version(self) -> str:
+        """Cheap version of the session list, bumped by any session write or delete"""
+        try:
+            return f"{self.sessions_path.stat().st_mtime_ns:x}"
+        except FileNotFoundError:
+            return "0"
 
     def _read_json(self, file_path: Path) -> Any:
         """Thread-safe JSON read"""
-        with self._lock:
+        with span("storage.read", **{"storage.path": str(file_path)}), self._lock:
             if not file_path.exists():
                 return None
             with open(file_path, 'r', encoding='utf-8') as f:
@@ -89,18 +160,17 @@ class FileStorage:
             # Delete session file
             session_file = self.sessions_path / f"{session_id}.json"
             if session_file.exists():
-                session_file.unlink()
+                with self._lock:
+                    session_file.unlink()
+                    self._touch(self.sessions_path, time.time_ns())
 
             # Delete associated notes file
             notes_file = self.notes_path / f"{session_id}_notes.json"
             if notes_file.exists():
                 notes_file.unlink()
 
-            # Delete associated logs
-            logs_dir = Path("logs")
-            if logs_dir.exists():
-                for log_file in logs_dir.glob(f"{session_id}_*.jsonl"):
-                    log_file.unlink()
+            # Delete associated logs, including rotated segments and the index
+            self.logger.delete_session_logs(session_id)
 
             self.logger.info(f"Deleted session: {session_id}")
             return True
@@ -108,6 +178,7 @@ class FileStorage:
             self.logger.error(f"Failed to delete session {session_id}: {e}")
             return False
 
+    @exclusive
     def add_message_to_session(self, session_id: str, message: Dict[str, Any]):
         """Add a message to a session"""
         session_data = self.get_session(session_id)
@@ -115,6 +186,23 @@ class FileStorage:
             session_data["messages"].append(message)
             self.save_session(session_data)
 
+    @exclusive
+    def add_messages_to_session(self, session_id: str, messages: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Add several messages to a session in one write and return the saved session"""
+        session_data = self.get_session(session_id)
+        if session_data:
+            session_data["messages"].extend(messages)
+            self.save_session(session_data)
+        return session_data
+
+    @exclusive
+    def update_conversation_summary(self, session_id: str, summary: Dict[str, Any]):
+        """Store the rolling conversation summary for a session"""
+        session_data = self.get_session(session_id)
+        if session_data:
+            session_data["conversation_summary"] = summary
+            self.save_session(session_data)
+
     def get_session_artifacts(self, session_id: str) -> Dict[str, Any]:
         """Get artifacts for a session"""
         session_data = self.get_session(session_id)
@@ -125,6 +213,7 @@ class FileStorage:
             }
         return {"session_id": session_id, "study_plans": [], "notes": [], "progress": [], "memory": {}}
 
+    @exclusive
     def save_notes(self, session_id: str, content: str, title: str):
         """Save notes for a session"""
         session_data = self.get_session(session_id)
@@ -154,6 +243,7 @@ class FileStorage:
 
             self.logger.info(f"Saved notes for session: {session_id}")
 
+    @exclusive
     def update_progress(self, session_id: str, progress_text: str):
         """Update progress for a session"""
         session_data = self.get_session(session_id)
@@ -176,6 +266,7 @@ class FileStorage:
 
             self.logger.info(f"Updated progress for session: {session_id}")
 
+    @exclusive
     def save_study_plan(self, session_id: str, plan_data: Dict[str, Any]):
         """Save a study plan for a session"""
         session_data = self.get_session(session_id)
@@ -205,8 +296,10 @@ class FileStorage:
             return memory_data["subjects"].get(subject, {})
         return {}
 
+    @exclusive
     def update_subject_memory(self, subject: str, memory_data: Dict[str, Any]):
         """Update memory for a specific subject"""
+        before = self.memory_version()
         current_memory = self._read_json(self.memory_file) or {"subjects": {}, "global_memory": {}}
 
         if "subjects" not in current_memory:
@@ -219,6 +312,7 @@ class FileStorage:
         }
 
         self._write_json(self.memory_file, current_memory)
+        self._index_memory(subject, memory_data, before)
         self.logger.info(f"Updated memory for subject: {subject}")
 
     def get_global_memory(self) -> Dict[str, Any]:
@@ -228,8 +322,10 @@ class FileStorage:
             return memory_data["global_memory"]
         return {}
 
+    @exclusive
     def update_global_memory(self, memory_data: Dict[str, Any]):
         """Update global memory"""
+        before = self.memory_version()
         current_memory = self._read_json(self.memory_file) or {"subjects": {}, "global_memory": {}}
 
         current_memory["global_memory"] = {
@@ -239,4 +335,24 @@ class FileStorage:
         }
 
         self._write_json(self.memory_file, current_memory)
-        self.logger.info("Updated global memory")
\ No newline at end of file
+        self._index_memory(None, memory_data, before)
+        self.logger.info("Updated global memory")
+
+    def _index_memory(self, subject: Optional[str], memory_data: Dict[str, Any], before: Optional[str]):
+        """Apply a memory update to the lookup index if it was current before the write"""
+        index = get_memory_index(self.memory_file)
+        with index._lock:
+            # Otherwise another process wrote in between, and the next search rebuilds from the file
+            if index.version is not None and index.version == before:
+                for key, value in memory_data.items():
+                    index.upsert(subject, key, value)
+                index.version = self.memory_version()
+
+    def search_memory(self, query: str, subject: Optional[str] = None, k: int = 5) -> List[Dict[str, Any]]:
+        """Ranked subject and global memory entries matching a key or description"""
+        index = get_memory_index(self.memory_file)
+        # Versioned before reading, so a write racing the read only costs another rebuild
+        version = self.memory_version()
+        if index.version != version:
+            index.rebuild(self._read_json(self.memory_file) or {}, version)
+        return index.search(query, subject=subject, k=k)
\ No newline at end of file
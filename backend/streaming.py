@@ -2,11 +2,18 @@
 Streaming utilities for real-time AI responses
 """
 
+import contextvars
 import json
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Callable, Optional
 from fastapi.responses import StreamingResponse
 import asyncio
 
+try:
+    from .logger import ActionFeed
+except ImportError:
+    # Handle case when run as standalone script
+    from logger import ActionFeed
+
 async def stream_ai_response(response_generator: AsyncGenerator[str, None]):
     """Stream AI response as Server-Sent Events"""
     async def generate():
@@ -63,4 +70,93 @@ def format_agent_action_stream(action: str, details: dict = None) -> str:
         "action": action,
         "details": details or {},
         "timestamp": asyncio.get_event_loop().time()
-    })
\ No newline at end of file
+    })
+
+def parse_event_id(value: Optional[str]) -> Optional[int]:
+    """Last-Event-ID as sent by EventSource, or None if absent or malformed"""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+async def action_events(feed: ActionFeed, session_id: str, last_event_id: Optional[int] = None,
+                        heartbeat: float = 15.0) -> AsyncGenerator[str, None]:
+    """Server-Sent Events for a session's agent actions, starting after last_event_id"""
+    subscription = feed.subscribe(session_id, last_event_id)
+    try:
+        # Reconnect quickly; EventSource then resends the last id it saw
+        yield "retry: 2000\n\n"
+        while True:
+            events, dropped = await subscription.next_batch(heartbeat)
+            chunk = ""
+            if dropped:
+                # Slow client: tell it to refetch /agent-logs rather than silently skipping
+                chunk += f"event: dropped\ndata: {json.dumps({'count': dropped})}\n\n"
+            for event_id, entry in events:
+                chunk += f"id: {event_id}\ndata: {json.dumps(entry, ensure_ascii=False)}\n\n"
+            # Comment lines keep proxies from timing out an idle stream
+            yield chunk or ": keep-alive\n\n"
+    finally:
+        feed.unsubscribe(subscription)
+
+def stream_agent_actions(feed: ActionFeed, session_id: str, last_event_id: Optional[int] = None,
+                         heartbeat: float = 15.0) -> StreamingResponse:
+    """Live tail of a session's agent actions as Server-Sent Events"""
+    return StreamingResponse(
+        action_events(feed, session_id, last_event_id, heartbeat),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+FINAL_ANSWER = "Final Answer:"
+
+class AnswerStream:
+    """Picks the user-facing answer out of an agent's streamed LLM output, chunk by chunk"""
+
+    def __init__(self, emit: Callable[[str], None]):
+        self.emit = emit
+        self.begin_call()
+
+    def begin_call(self):
+        # ReAct calls narrate thoughts and tool use before the answer; plain calls are the answer
+        self._buffer = ""
+        self._mode: Optional[str] = None  # None until known, then "text", "react" or "answer"
+        self._started = False
+
+    def _send(self, text: str):
+        if not self._started:
+            text = text.lstrip()
+        if text:
+            self._started = True
+            self.emit(text)
+
+    def feed(self, chunk: str):
+        if self._mode in ("text", "answer"):
+            self._send(chunk)
+            return
+        self._buffer += chunk
+        if self._mode is None:
+            head = self._buffer.lstrip()
+            if len(head) < len("Thought") and any(m.startswith(head) for m in ("Thought", "Action")):
+                return
+            self._mode = "react" if head.startswith(("Thought", "Action")) else "text"
+            if self._mode == "text":
+                self._send(self._buffer)
+                return
+        marker = self._buffer.find(FINAL_ANSWER)
+        if marker >= 0:
+            self._mode = "answer"
+            self._send(self._buffer[marker + len(FINAL_ANSWER):])
+
+    def end_call(self, discard: bool = False):
+        # A short plain answer may end before its mode is known; a failed call's partial text is dropped
+        if self._mode is None and not discard:
+            self._send(self._buffer)
+        self.begin_call()
+
+# Set for a chat turn whose answer is streamed; LLM stream chunks run on the calling thread and find it here
+answer_stream: contextvars.ContextVar = contextvars.ContextVar("answer_stream", default=None)
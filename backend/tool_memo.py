@@ -0,0 +1,82 @@
+"""
+Per-run tool call memoization for the Academic AI Assistant
+Serves repeated read-only tool calls from memory and short-circuits agents stuck calling the same tool
+"""
+
+import functools
+import json
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    from .logger import AgentLogger
+except ImportError:
+    # Handle case when run as standalone script
+    from logger import AgentLogger
+
+REPEAT_NOTE = ("\n\n[Repeated call: this tool already returned the result above with the same arguments "
+               "in this run. Use it instead of calling the tool again.]")
+
+
+def call_key(tool_name: str, args: Tuple, kwargs: Dict[str, Any]) -> str:
+    """Stable key for a tool call from its name and arguments"""
+    return json.dumps([tool_name, list(args), kwargs], sort_keys=True, default=str)
+
+
+class ToolMemo:
+    """Results of read-only tool calls for one agent run, cleared whenever a write tool runs"""
+
+    def __init__(self, session_id: str, logger: Optional[AgentLogger] = None):
+        self.session_id = session_id
+        self.logger = logger or AgentLogger()
+        self.results: Dict[str, Any] = {}
+        self.repeats: Dict[str, int] = {}
+        self.last_write: Optional[Tuple[str, Any]] = None
+        self.saved = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Start a new run, e.g. the next turn of an agent kept for a whole connection"""
+        with self._lock:
+            self.results.clear()
+            self.repeats.clear()
+            self.last_write = None
+            self.saved = 0
+
+    def _saved(self, tool_name: str, reason: str, repeats: int):
+        self.saved += 1
+        self.logger.log_action(self.session_id, "TOOL_CALL_SAVED", {
+            "tool": tool_name, "reason": reason, "repeats": repeats, "saved_in_run": self.saved
+        })
+
+    def wrap(self, tool_name: str, writes: bool = False) -> Callable:
+        """Decorator memoizing a read tool, or invalidating the memo after a write tool"""
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                key = call_key(tool_name, args, kwargs)
+                with self._lock:
+                    if writes and self.last_write and self.last_write[0] == key:
+                        # Same write twice in a row is an agent loop, not new information
+                        self.repeats[key] = self.repeats.get(key, 0) + 1
+                        self._saved(tool_name, "loop", self.repeats[key])
+                        return str(self.last_write[1]) + REPEAT_NOTE
+                    if not writes and key in self.results:
+                        self.repeats[key] = self.repeats.get(key, 0) + 1
+                        self._saved(tool_name, "memo", self.repeats[key])
+                        result = self.results[key]
+                        return str(result) + REPEAT_NOTE if self.repeats[key] > 1 else result
+
+                result = func(*args, **kwargs)
+
+                with self._lock:
+                    if writes:
+                        self.results.clear()
+                        self.repeats.clear()
+                        self.last_write = (key, result)
+                    else:
+                        self.results[key] = result
+                        self.last_write = None
+                return result
+            return wrapper
+        return decorator
@@ -1,51 +1,158 @@
 import json
 import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 MEMORY_PATH = "data/memory.json"
+HISTORY_PATH = "data/memory_history.jsonl"
 
-def save_memory(entry):
-    """Save an entry to global memory"""
-    memory_file = Path(MEMORY_PATH)
+# Entry kinds recognised from the prefix written by failure_tool and decision_tool
+KINDS = ("FAILURE", "RECOVERY PLAN")
 
-    # Ensure directory exists
-    memory_file.parent.mkdir(parents=True, exist_ok=True)
 
-    # Read existing memory or create default structure
-    if memory_file.exists():
-        with open(memory_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    else:
-        data = {"subjects": {}, "global_memory": {}}
+def entry_kind(text):
+    """Kind of a history entry from its prefix, NOTE when it has none"""
+    for kind in KINDS:
+        if text.startswith(f"{kind}:"):
+            return kind
+    return "NOTE"
 
-    # Initialize global_memory if it doesn't exist
-    if "global_memory" not in data:
-        data["global_memory"] = {}
 
-    # Add entry to global memory history
-    if "history" not in data["global_memory"]:
-        data["global_memory"]["history"] = []
+class MemoryHistory:
+    """Append-only JSONL history capped at the newest max_entries"""
 
-    data["global_memory"]["history"].append(entry)
+    def __init__(self, path=HISTORY_PATH, max_entries=500, legacy_path=MEMORY_PATH):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.legacy_path = Path(legacy_path) if legacy_path else None
+        self._lines = None
+        self._seen = None
+        self._lock = threading.Lock()
 
-    # Write back to file
-    with open(memory_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    @contextmanager
+    def _exclusive(self):
+        """Serialize appends and compaction across threads and worker processes"""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(self.path.with_name(f"{self.path.name}.lock"), "ab") as lock:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
 
-    return "Memory saved."
+    def _stat(self):
+        stat = self.path.stat()
+        return stat.st_ino, stat.st_size
+
+    def _ensure(self):
+        """Create the history file, importing the old memory.json history once
+
+        Recounts lines when another process appended or compacted since this one last wrote.
+        """
+        if self._lines is not None and self.path.exists() and self._stat() == self._seen:
+            return
+        if not self.path.exists():
+            legacy = []
+            if self.legacy_path and self.legacy_path.exists():
+                with open(self.legacy_path, "r", encoding="utf-8") as f:
+                    legacy = json.load(f).get("global_memory", {}).get("history", [])
+            with open(self.path, "w", encoding="utf-8") as f:
+                for text in legacy[-self.max_entries:]:
+                    f.write(json.dumps({"ts": None, "kind": entry_kind(text), "text": text}, ensure_ascii=False) + "\n")
+        with open(self.path, "r", encoding="utf-8") as f:
+            self._lines = sum(1 for _ in f)
+        self._seen = self._stat()
+
+    def _compact(self):
+        """Rewrite the file with only the newest max_entries lines"""
+        with open(self.path, "r", encoding="utf-8") as f:
+            keep = deque(f, maxlen=self.max_entries)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(keep)
+        os.replace(tmp, self.path)
+        self._lines = len(keep)
+
+    def append(self, text):
+        """Append one entry, compacting once the file is a quarter over the cap"""
+        entry = {"ts": datetime.now().isoformat(), "kind": entry_kind(text), "text": text}
+        with self._exclusive():
+            self._ensure()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._lines += 1
+            if self._lines > self.max_entries + max(self.max_entries // 4, 1):
+                self._compact()
+            self._seen = self._stat()
+        return entry
+
+    def entries(self, limit=None, since=None, kind=None):
+        """Newest matching entries in chronological order, at most limit (1 to max_entries) of them"""
+        if limit is not None:
+            limit = min(max(int(limit), 1), self.max_entries)
+        if isinstance(since, str):
+            since = datetime.fromisoformat(since)
+        kinds = {kind.upper()} if isinstance(kind, str) else {k.upper() for k in kind or []}
 
-def load_memory():
-    """Load memory entries"""
-    memory_file = Path(MEMORY_PATH)
+        with self._exclusive():
+            self._ensure()
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = deque(f, maxlen=self.max_entries)
 
-    if not memory_file.exists():
-        return []
+        matches = []
+        for line in reversed(lines):
+            try:
+                entry = json.loads(line)
+                ts = datetime.fromisoformat(entry["ts"]) if entry["ts"] else None
+            except (ValueError, TypeError, KeyError):
+                ts = entry = None
+            if not entry or "kind" not in entry or "text" not in entry:
+                # Skip torn or hand-edited lines rather than failing every read
+                continue
+            if since and (ts is None or ts < since):
+                break
+            if kinds and entry["kind"] not in kinds:
+                continue
+            matches.append(entry)
+            if limit and len(matches) >= limit:
+                break
+        return matches[::-1]
 
-    with open(memory_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
 
-    # Return history from global_memory if it exists
-    if "global_memory" in data and "history" in data["global_memory"]:
-        return data["global_memory"]["history"]
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_history():
+    """Process-wide memory history configured from the environment"""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = MemoryHistory(
+                os.getenv("MEMORY_HISTORY_PATH", HISTORY_PATH),
+                max_entries=int(os.getenv("MEMORY_HISTORY_MAX", "500")),
+            )
+        return _history
+
+
+def save_memory(entry):
+    """Save an entry to global memory"""
+    get_history().append(entry)
+    return "Memory saved."
+
 
-    return []
+def load_memory(limit=None, since=None, kind=None):
+    """Load memory entries, newest `limit` matching `since` (datetime or ISO string) and `kind`"""
+    return [entry["text"] for entry in get_history().entries(limit=limit, since=since, kind=kind)]
@@ -1,25 +1,311 @@
-import requests
+"""
+Perplexity web search over a shared, pooled HTTP client
+Sync and async variants with timeouts, jittered backoff on 429/5xx and a persistent result cache
+"""
+
+import asyncio
+import contextvars
 import os
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import httpx
 from dotenv import load_dotenv
 
+try:
+    from ..cache import SearchCache, normalize_query
+    from ..run_control import check_cancelled
+    from ..metrics import metrics
+    from ..tracing import current_session
+except ImportError:
+    # Handle case when run as standalone script
+    from cache import SearchCache, normalize_query
+    from run_control import check_cancelled
+    from metrics import metrics
+    from tracing import current_session
+
 load_dotenv()
 
-API_KEY = os.getenv("PERPLEXITY_API_KEY")
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class SearchError(RuntimeError):
+    """Web search failed; status is the HTTP status when the API answered"""
+
+    def __init__(self, message: str, status: Optional[int] = None, retryable: bool = False):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+
+
+class SearchClient:
+    """Keep-alive HTTP client for the Perplexity chat completions API"""
+
+    def __init__(self, api_url: Optional[str] = None, api_key: Optional[str] = None,
+                 model: Optional[str] = None, timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None, backoff: Optional[float] = None,
+                 max_connections: int = 20, cache: Optional[SearchCache] = None,
+                 max_batch_queries: Optional[int] = None):
+        self.api_url = api_url or os.getenv("PERPLEXITY_API_URL", "https://api.perplexity.ai/chat/completions")
+        self.api_key = api_key or os.getenv("PERPLEXITY_API_KEY")
+        self.model = model or os.getenv("PERPLEXITY_MODEL", "sonar-pro")
+        self.timeout = httpx.Timeout(timeout or float(os.getenv("SEARCH_TIMEOUT", "20")), connect=5.0)
+        self.max_retries = int(os.getenv("SEARCH_MAX_RETRIES", "3")) if max_retries is None else max_retries
+        self.backoff = backoff if backoff is not None else float(os.getenv("SEARCH_BACKOFF", "0.5"))
+        self.max_batch_queries = max_batch_queries or int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "8"))
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.cache = cache
+        self._client: Optional[httpx.Client] = None
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _headers(self) -> Dict[str, str]:
+        if not self.api_key:
+            raise SearchError("PERPLEXITY_API_KEY is not configured")
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+    def _payload(self, query: str) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": f"Search and summarize: {query}"}],
+        }
+
+    def _sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(timeout=self.timeout, limits=self.limits)
+            return self._client
+
+    def _async_client(self) -> httpx.AsyncClient:
+        # Async connections belong to the event loop that opened them
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+                self._async_clients[loop] = client
+            return client
+
+    def _delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), 30.0)
+            except ValueError:
+                pass
+        # Full jitter keeps concurrent callers from retrying in lockstep
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def _parse(self, response: httpx.Response) -> str:
+        if response.status_code != 200:
+            raise SearchError(
+                f"Search API returned {response.status_code}: {response.text[:200]}",
+                status=response.status_code,
+                retryable=response.status_code in RETRY_STATUSES,
+            )
+        try:
+            return response.json()["choices"][0]["message"]["content"]
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise SearchError(f"Malformed search response: {e}", status=response.status_code)
+
+    def _cached(self, query: str) -> Optional[str]:
+        return self.cache.get(query, self.model) if self.cache is not None else None
+
+    def _store(self, query: str, result: str) -> str:
+        if self.cache is not None:
+            self.cache.set(query, self.model, result)
+        return result
+
+    def search(self, query: str) -> str:
+        """Run a search, retrying throttled and failed requests"""
+        cached = self._cached(query)
+        if cached is not None:
+            return cached
+
+        headers, payload = self._headers(), self._payload(query)
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = self._sync_client().post(self.api_url, headers=headers, json=payload)
+                return self._store(query, self._parse(response))
+            except httpx.TransportError as e:
+                error = SearchError(f"Search request failed: {e!r}", retryable=True)
+            except SearchError as e:
+                error = e
+            if not error.retryable or attempt == self.max_retries:
+                raise error
+            metrics.record_retry(current_session.get(), "search")
+            time.sleep(self._delay(attempt, response))
+            check_cancelled()
+
+    async def asearch(self, query: str) -> str:
+        """Async variant of search sharing the same retry policy and cache"""
+        cached = self._cached(query)
+        if cached is not None:
+            return cached
+
+        headers, payload = self._headers(), self._payload(query)
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = await self._async_client().post(self.api_url, headers=headers, json=payload)
+                return self._store(query, self._parse(response))
+            except httpx.TransportError as e:
+                error = SearchError(f"Search request failed: {e!r}", retryable=True)
+            except SearchError as e:
+                error = e
+            if not error.retryable or attempt == self.max_retries:
+                raise error
+            metrics.record_retry(current_session.get(), "search")
+            await asyncio.sleep(self._delay(attempt, response))
+
+    def _batch(self, queries: List[str], max_concurrency: int):
+        """Split a batch into the queries to run and those over the batch limit"""
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+        unique = dedupe_queries(queries)
+        skipped = SearchError(f"Not searched: a batch is limited to {self.max_batch_queries} queries")
+        return unique[:self.max_batch_queries], {query: skipped for query in unique[self.max_batch_queries:]}
+
+    def batch_search(self, queries: List[str], max_concurrency: int = 4) -> Dict[str, Any]:
+        """Run distinct queries concurrently over the pooled sync client, up to max_batch_queries of them"""
+        unique, skipped = self._batch(queries, max_concurrency)
+        results: Dict[str, Any] = {}
+        if not unique:
+            return results
+
+        def run(query: str):
+            try:
+                return self.search(query)
+            except SearchError as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(unique))) as pool:
+            # Each query runs in a copy of the caller's context, so cancellation, spans and metric labels carry over
+            futures = [pool.submit(contextvars.copy_context().run, run, query) for query in unique]
+            for query, future in zip(unique, futures):
+                results[query] = future.result()
+        results.update(skipped)
+        return results
+
+    async def abatch_search(self, queries: List[str], max_concurrency: int = 4) -> Dict[str, Any]:
+        """Async variant of batch_search"""
+        unique, skipped = self._batch(queries, max_concurrency)
+        limit = asyncio.Semaphore(max_concurrency)
+
+        async def run(query: str):
+            async with limit:
+                try:
+                    return await self.asearch(query)
+                except SearchError as e:
+                    return e
+
+        results = dict(zip(unique, await asyncio.gather(*(run(query) for query in unique))))
+        results.update(skipped)
+        return results
+
+    def close(self):
+        """Close the pooled sync connections"""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    async def aclose(self):
+        """Close the pooled async connections of the running event loop"""
+        with self._lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+def dedupe_queries(queries: List[str]) -> List[str]:
+    """Drop blank queries and queries equivalent to an earlier one"""
+    seen, unique = set(), []
+    for query in queries:
+        query = " ".join(str(query).split())
+        key = normalize_query(query)
+        if query and key not in seen:
+            seen.add(key)
+            unique.append(query)
+    return unique
+
+
+def _clip(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit - 3].rsplit(" ", 1)[0] + "..."
+
+
+def format_batch_results(results: Dict[str, Any], max_chars: int = 6000, min_body: int = 40) -> str:
+    """Merge batch results into one tool result of at most max_chars characters
+
+    Keeps as many leading queries as can each get min_body characters of summary and notes the rest.
+    Room left unused by short results goes to the queries after them.
+    """
+    if not results:
+        return "No queries to search."
+
+    items = [(f"## {query}\n", result) for query, result in results.items()]
+    fit, budget = len(items), max_chars
+    while fit:
+        note = f"({len(items) - fit} more results omitted to fit the length limit)"
+        budget = max_chars - (len(note) + 2 if fit < len(items) else 0)
+        if budget // fit - 2 - max(len(header) for header, _ in items[:fit]) >= min_body:
+            break
+        fit -= 1
+    if not fit:
+        return f"({len(items)} results omitted to fit the length limit)"[:max_chars]
+
+    sections = []
+    for index, (header, result) in enumerate(items[:fit]):
+        separator = 2 if sections else 0
+        if isinstance(result, Exception):
+            body = f"Search failed: {result}"
+        else:
+            body = " ".join(str(result).split())
+        sections.append(header + _clip(body, budget // (fit - index) - separator - len(header)))
+        budget -= separator + len(sections[-1])
+    if fit < len(items):
+        sections.append(note)
+    return "\n\n".join(sections)
+
+
+_default_client: Optional[SearchClient] = None
+_default_lock = threading.Lock()
+
+
+def get_search_client() -> SearchClient:
+    """Process-wide search client configured from the environment"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            cache = None
+            if os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true":
+                cache = SearchCache(
+                    os.getenv("SEARCH_CACHE_DIR", "data/search_cache"),
+                    ttl=int(os.getenv("SEARCH_CACHE_TTL", "604800")),
+                    size_limit_mb=int(os.getenv("SEARCH_CACHE_SIZE_MB", "64")),
+                )
+            _default_client = SearchClient(cache=cache)
+        return _default_client
+
 
 def web_search(query):
-    url = "https://api.perplexity.ai/chat/completions"
-
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
-
-    payload = {
-        "model": "sonar-pro",
-        "messages": [
-            {"role": "user", "content": f"Search and summarize: {query}"}
-        ]
-    }
-
-    response = requests.post(url, headers=headers, json=payload)
-    return response.json()["choices"][0]["message"]["content"]
+    return get_search_client().search(query)
+
+
+async def web_search_async(query):
+    return await get_search_client().asearch(query)
+
+
+def batch_web_search(queries, max_concurrency=None, max_chars=None):
+    results = get_search_client().batch_search(
+        queries, max_concurrency or int(os.getenv("SEARCH_BATCH_CONCURRENCY", "4"))
+    )
+    return format_batch_results(results, max_chars or int(os.getenv("SEARCH_BATCH_MAX_CHARS", "6000")))
@@ -0,0 +1,105 @@
+"""
+OpenTelemetry tracing for the Academic AI Assistant
+Spans for requests, crew runs, LLM and tool calls, storage and cache, exported to OTLP, console or a local file
+"""
+
+import contextvars
+import functools
+import os
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor, SpanExporter
+)
+
+# Session being served, attached to every span started underneath it
+current_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_session", default=None)
+
+_provider: Optional[TracerProvider] = None
+_tracer: trace.Tracer = trace.NoOpTracer()
+
+
+def _exporter_from_env() -> Optional[SpanExporter]:
+    """Exporter named by TRACING_EXPORTER: none, console, file or otlp"""
+    kind = os.getenv("TRACING_EXPORTER", "none").lower()
+    if kind == "console":
+        return ConsoleSpanExporter()
+    if kind == "file":
+        path = os.getenv("TRACING_FILE", "logs/traces.jsonl")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # One JSON span per line so the file can be grepped or loaded into a trace viewer
+        return ConsoleSpanExporter(out=open(path, "a", encoding="utf-8"),
+                                   formatter=lambda span: span.to_json(indent=None) + "\n")
+    if kind == "otlp":
+        # Endpoint and headers come from the standard OTEL_EXPORTER_OTLP_* variables
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    return None
+
+
+def configure_tracing(exporter: Optional[SpanExporter] = None, batch: bool = True):
+    """Start exporting spans to the given exporter, or the one configured in the environment"""
+    global _provider, _tracer
+    exporter = exporter or _exporter_from_env()
+    shutdown_tracing()
+    if exporter is None:
+        return
+
+    # A private provider: CrewAI installs its own global one for its telemetry
+    _provider = TracerProvider(resource=Resource.create({
+        "service.name": os.getenv("OTEL_SERVICE_NAME", "academic-ai-assistant")
+    }))
+    _provider.add_span_processor(BatchSpanProcessor(exporter) if batch else SimpleSpanProcessor(exporter))
+    _tracer = _provider.get_tracer("academic-ai-assistant")
+
+
+def shutdown_tracing():
+    """Export buffered spans and stop tracing"""
+    global _provider, _tracer
+    if _provider is not None:
+        _provider.shutdown()
+    _provider, _tracer = None, trace.NoOpTracer()
+
+
+def tag_session(session_id: str):
+    """Mark the current request as serving a session and label its span"""
+    current_session.set(session_id)
+    annotate(**{"session.id": session_id})
+
+
+def annotate(**attributes: Any):
+    """Add attributes to the span that is currently open"""
+    trace.get_current_span().set_attributes(attributes)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[trace.Span]:
+    """Context manager for a span carrying the current session id"""
+    session_id = current_session.get()
+    if session_id and "session.id" not in attributes:
+        attributes["session.id"] = session_id
+    with _tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+def traced(name: str, **attributes: Any) -> Callable:
+    """Decorator running a function inside a span"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_tool(session_id: str, tool_name: str) -> Callable:
+    """Decorator giving each agent tool invocation its own span"""
+    return traced("tool.call", **{"tool.name": tool_name, "session.id": session_id})
+
+
+configure_tracing()
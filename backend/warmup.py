@@ -0,0 +1,118 @@
+"""
+Lazy agent stack for the Academic AI Assistant
+Defers CrewAI and the Gemini SDK to first agent use, or warms them on a background thread after startup
+"""
+
+import asyncio
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+try:
+    from .logger import AgentLogger
+except ImportError:
+    # Handle case when run as standalone script
+    from logger import AgentLogger
+
+
+def configure_gemini(logger: AgentLogger):
+    """Hand the API key to whichever Gemini SDK is installed"""
+    api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        return
+    try:
+        # The current SDK has no global configure; its clients read GEMINI_API_KEY / GOOGLE_API_KEY
+        import google.genai  # noqa: F401
+        logger.info("Google Generative AI configured successfully")
+    except ImportError:
+        try:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            logger.info("Google Generative AI configured successfully (using deprecated package)")
+        except ImportError:
+            logger.warning("google-generativeai package not available")
+        except Exception as e:
+            logger.error(f"Failed to configure Google Generative AI: {e}")
+
+
+class AgentStack:
+    """CrewAI classes, agent factories and the parallel orchestrator, imported once on first use"""
+
+    def __init__(self, logger: Optional[AgentLogger] = None):
+        self.logger = logger or AgentLogger()
+        self._lock = threading.Lock()
+        self._stack: Optional[SimpleNamespace] = None
+        self._thread: Optional[threading.Thread] = None
+        self.seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._stack is not None
+
+    def load(self) -> SimpleNamespace:
+        """Import the agent stack (blocking); concurrent callers wait for the first import"""
+        if self._stack is not None:
+            return self._stack
+        with self._lock:
+            if self._stack is not None:
+                return self._stack
+            start = time.perf_counter()
+            try:
+                from crewai import Crew, Task
+                try:
+                    from .agents import get_academic_agent, create_task_for_message
+                    from .orchestrator import ParallelOrchestrator, build_study_graph
+                except ImportError:
+                    from agents import get_academic_agent, create_task_for_message
+                    from orchestrator import ParallelOrchestrator, build_study_graph
+                configure_gemini(self.logger)
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                self.logger.error(f"Failed to load agent stack: {self.error}")
+                raise
+            self._stack = SimpleNamespace(
+                Crew=Crew,
+                Task=Task,
+                get_academic_agent=get_academic_agent,
+                create_task_for_message=create_task_for_message,
+                build_study_graph=build_study_graph,
+                orchestrator=ParallelOrchestrator(),
+            )
+            self.seconds = time.perf_counter() - start
+            self.error = None
+            self.logger.info(f"Agent stack loaded in {self.seconds:.2f}s")
+            return self._stack
+
+    async def get(self) -> SimpleNamespace:
+        """The agent stack, imported on a worker thread if it is not loaded yet"""
+        return self._stack or await asyncio.to_thread(self.load)
+
+    def warm_in_background(self):
+        """Start importing the stack without holding up startup"""
+        if self._stack is not None or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._warm, name="agent-stack-warmup", daemon=True)
+        self._thread.start()
+
+    def _warm(self):
+        try:
+            self.load()
+        except Exception:
+            pass  # recorded in self.error; the next request retries the import
+
+    def status(self) -> Dict[str, Any]:
+        if self.ready:
+            state = "ready"
+        elif self.error:
+            state = "failed"
+        elif self._thread is not None and self._thread.is_alive():
+            state = "loading"
+        else:
+            state = "not_loaded"
+        return {"state": state, "seconds": self.seconds, "error": self.error}
+
+
+agent_stack = AgentStack()